@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+导出性能对比 - 比较旧的逐像素导出与新的渲染引擎
+
+用法:
+    python benchmarks/compare_export.py [--tiers 20] [--images 2000] [--source-size 512]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiermaker.thumbnail_cache import ThumbnailCache
+from tiermaker.export_renderer import TierListRenderer
+
+COLORS = ["#FF7F7F", "#FFBF7F", "#FFFF7F", "#7FFF7F", "#7FBFFF", "#7F7FFF", "#FF7FFF"]
+
+
+def make_tierlist(images_dir, tier_count, image_count, source_size):
+    """生成合成的排行榜和源图片"""
+    tiers = [{"name": f"T{i}", "color": COLORS[i % len(COLORS)], "images": []} for i in range(tier_count)]
+    for i in range(image_count):
+        filename = f"{i}_img.png"
+        color = ((i * 37) % 256, (i * 91) % 256, (i * 53) % 256, 255)
+        Image.new("RGBA", (source_size, source_size), color).save(os.path.join(images_dir, filename))
+        tiers[i % tier_count]["images"].append({"filename": filename, "original_name": "img.png"})
+    return tiers
+
+
+def legacy_export(tiers, images_dir, width):
+    """旧版 ImageProcessor.export_tierlist_as_image 的绘制部分"""
+    def hex_to_rgb(hex_color):
+        hex_color = hex_color.lstrip('#')
+        return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+    tier_height = 80
+    img = Image.new("RGB", (width, tier_height * len(tiers)), color="white")
+    draw_y = 0
+    for tier in tiers:
+        for y in range(draw_y, draw_y + tier_height):
+            for x in range(0, 50):
+                r, g, b = hex_to_rgb(tier["color"])
+                img.putpixel((x, y), (r, g, b))
+        draw = ImageDraw.Draw(img)
+        try:
+            font = ImageFont.truetype("arial.ttf", 20)
+        except Exception:
+            font = ImageFont.load_default()
+        text_width = font.getsize(tier["name"])[0] if hasattr(font, 'getsize') else 20
+        draw.text(((50 - text_width) // 2, draw_y + (tier_height - 20) // 2), tier["name"], fill="black", font=font)
+        draw_x = 70
+        for img_info in tier.get("images", []):
+            img_path = os.path.join(images_dir, img_info["filename"])
+            if os.path.exists(img_path):
+                tier_img = Image.open(img_path)
+                tier_img = tier_img.resize((70, 70), Image.LANCZOS)
+                img.paste(tier_img, (draw_x, draw_y + (tier_height - 70) // 2))
+                draw_x += 80
+        draw_y += tier_height
+    return img
+
+
+def timed(fn):
+    """执行函数并返回耗时（秒）"""
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较旧版导出与新渲染引擎的耗时")
+    parser.add_argument("--tiers", type=int, default=20)
+    parser.add_argument("--images", type=int, default=2000)
+    parser.add_argument("--source-size", type=int, default=512, help="源图片边长")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="tiermaker-bench-")
+    try:
+        images_dir = os.path.join(work_dir, "images")
+        os.makedirs(images_dir)
+        tiers = make_tierlist(images_dir, args.tiers, args.images, args.source_size)
+        # 宽度足够容纳最长的一行，保证两种实现绘制相同数量的图片
+        width = 70 + 80 * max(len(t["images"]) for t in tiers)
+
+        cache = ThumbnailCache(os.path.join(work_dir, "thumbnails"))
+
+        def loader(img_info, size):
+            return cache.get_thumbnail(os.path.join(images_dir, img_info["filename"]), size)
+
+        renderer = TierListRenderer(loader)
+
+        legacy = timed(lambda: legacy_export(tiers, images_dir, width))
+        cold = timed(lambda: renderer.render(tiers, width))  # 首次渲染需要生成缩略图
+        warm = timed(lambda: renderer.render(tiers, width))  # 导入时已生成缩略图的常见情况
+
+        print(f"{args.tiers} 个等级, {args.images} 张 {args.source_size}x{args.source_size} 图片, 宽度 {width}")
+        print(f"旧版导出:            {legacy:8.3f} s")
+        print(f"新渲染（冷缓存）:    {cold:8.3f} s  ({legacy / cold:5.1f}x)")
+        print(f"新渲染（缩略图已有）:{warm:8.3f} s  ({legacy / warm:5.1f}x)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
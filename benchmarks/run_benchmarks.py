@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+性能基准测试 - 在合成的排行榜上测量主要操作的耗时
+
+界面相关的测试（等级区域和仓库的刷新、移动图片）需要图形显示；没有 DISPLAY 时
+如果系统中有 Xvfb，会自动启动一个虚拟显示，否则跳过这些测试。
+
+用法:
+    python benchmarks/run_benchmarks.py [--tiers 8] [--images 500] [--sizes 256x256,800x600]
+                                        [--formats png,jpg] [--repeat 5] [--output result.json]
+                                        [--baseline baseline.json] [--threshold 0.2]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+import PIL
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiermaker.config_manager import ConfigManager
+from tiermaker.image_utils import ImageProcessor
+
+COLORS = ["#FF7F7F", "#FFBF7F", "#FFFF7F", "#7FFF7F", "#7FBFFF", "#7F7FFF", "#FF7FFF"]
+
+# 合成图片的格式：扩展名 -> (PIL 格式, 颜色模式)
+FORMATS = {
+    "png": ("PNG", "RGBA"),
+    "jpg": ("JPEG", "RGB"),
+    "gif": ("GIF", "P"),
+    "bmp": ("BMP", "RGB"),
+}
+
+# 启动界面时等待图片全部加载的最长时间（秒）
+UI_STARTUP_TIMEOUT = 120
+
+
+def parse_sizes(text):
+    """解析 "宽x高,宽x高" 形式的尺寸列表"""
+    sizes = []
+    for part in text.split(","):
+        width, _, height = part.strip().lower().partition("x")
+        sizes.append((int(width), int(height or width)))
+    return sizes
+
+
+def make_source_images(source_dir, count, sizes, formats):
+    """生成内容各不相同的源图片（存储按内容去重，相同内容的图片只会保存一次）
+
+    Returns:
+        list: 源图片路径
+    """
+    paths = []
+    for i in range(count):
+        width, height = sizes[i % len(sizes)]
+        ext = formats[i % len(formats)]
+        pil_format, mode = FORMATS[ext]
+        color = (i % 256, (i // 256) % 256, (i * 97) % 256)
+        img = Image.new("RGB", (width, height), color)
+        # 右下角画一块对比色，让缩放时有实际内容可处理
+        img.paste((255 - color[0], 255 - color[1], 255 - color[2]), (width // 2, height // 2, width, height))
+        if mode == "RGBA":
+            img = img.convert("RGBA")
+        elif mode == "P":
+            img = img.convert("P")
+        path = os.path.join(source_dir, f"img_{i}.{ext}")
+        img.save(path, pil_format)
+        paths.append(path)
+    return paths
+
+
+def summarize(runs):
+    """把一组耗时（秒）汇总为毫秒统计"""
+    ms = [run * 1000 for run in runs]
+    return {
+        "runs": len(ms),
+        "min_ms": round(min(ms), 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "mean_ms": round(statistics.mean(ms), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+def timed(fn, repeat, setup=None):
+    """重复执行函数并记录每次的耗时（setup 不计入耗时）
+
+    Returns:
+        list: 每次的耗时（秒）
+    """
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def build_config(img_infos, tier_count, repository_share, rng):
+    """把图片随机分配到仓库和各等级，生成配置字典"""
+    tiers = [{"name": f"T{i}", "color": COLORS[i % len(COLORS)], "images": []} for i in range(tier_count)]
+    repository = []
+    for img_info in img_infos:
+        if rng.random() < repository_share:
+            repository.append(img_info)
+        else:
+            tiers[rng.randrange(tier_count)]["images"].append(img_info)
+    return {"version": 2, "tiers": tiers, "repository_images": repository, "settings": {}}
+
+
+def bench_core(args, data_dir, source_paths, rng):
+    """不需要图形显示的测试：导入图片、保存和加载配置、导出图片"""
+    results = {}
+    config_manager = ConfigManager(data_dir)
+    processor = ImageProcessor(config_manager.images_dir, config_manager.thumbnails_dir)
+
+    # 每张图片只能导入一次（之后会被去重），因此每张图片的耗时作为一次测量
+    img_infos = []
+    add_runs = []
+    for path in source_paths:
+        start = time.perf_counter()
+        img_info = processor.add_image_from_path(path)
+        add_runs.append(time.perf_counter() - start)
+        if img_info is not None:
+            img_infos.append(img_info)
+    processor.flush_caches()
+    results["add_image_from_path"] = summarize(add_runs)
+
+    config = build_config(img_infos, args.tiers, args.repository_share, rng)
+    results["save_config"] = summarize(timed(lambda: config_manager.save_config(config), args.repeat))
+    results["load_config"] = summarize(timed(config_manager.load_config, args.repeat))
+
+    width = args.export_width
+    output = os.path.join(os.path.dirname(data_dir), "export.png")
+    results["export_tierlist_as_image"] = summarize(
+        timed(lambda: processor.save_tierlist_image(config["tiers"], width, output), args.repeat))
+
+    config_manager.close()
+    return results
+
+
+def start_virtual_display():
+    """没有图形显示时启动 Xvfb 虚拟显示
+
+    Returns:
+        subprocess.Popen: Xvfb 进程，不需要或无法启动时返回None
+    """
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        return None
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        return None
+    for number in range(99, 110):
+        if os.path.exists(f"/tmp/.X11-unix/X{number}"):
+            continue
+        proc = subprocess.Popen([xvfb, f":{number}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and proc.poll() is None:
+            if os.path.exists(f"/tmp/.X11-unix/X{number}"):
+                os.environ["DISPLAY"] = f":{number}"
+                return proc
+            time.sleep(0.05)
+        proc.kill()
+    return None
+
+
+def bench_ui(args, data_dir, rng):
+    """界面测试：等级区域刷新、仓库刷新和移动图片（包括布局计算）"""
+    import tkinter as tk
+    from tiermaker.main import TierMaker
+
+    try:
+        app = TierMaker(data_dir)
+    except tk.TclError as e:
+        print(f"无法创建窗口，跳过界面测试: {str(e)}")
+        return {}
+
+    results = {}
+    try:
+        # 等待启动的第二阶段完成（图片处理器、拖放支持和分批显示的图片）
+        deadline = time.monotonic() + UI_STARTUP_TIMEOUT
+        while not app.startup.reported and time.monotonic() < deadline:
+            app.update()
+        results["startup_first_paint"] = {"runs": 1, "median_ms": app.startup.elapsed("first_paint")}
+
+        def settle():
+            app.update_idletasks()
+
+        # 等级区域：从只有等级行的状态创建全部图片控件，以及没有变化时的刷新
+        def clear_tiers():
+            app.tier_frame.refresh_tiers(app.tiers, limit=0)
+            settle()
+
+        def refresh_tiers():
+            app.tier_frame.refresh_tiers(app.tiers)
+            settle()
+
+        results["refresh_tiers"] = summarize(timed(refresh_tiers, args.repeat, setup=clear_tiers))
+        results["refresh_tiers_unchanged"] = summarize(timed(refresh_tiers, args.repeat))
+
+        # 仓库：从空仓库刷新为全部图片
+        def clear_repository():
+            app.repository_frame.refresh_repository([])
+            settle()
+
+        def refresh_repository():
+            app.repository_frame.refresh_repository(app.repository_images)
+            settle()
+
+        results["refresh_repository"] = summarize(timed(refresh_repository, args.repeat, setup=clear_repository))
+
+        # 随机移动图片（包括界面刷新）
+        images = app.all_images()
+        if images and app.tiers:
+            def move():
+                img_info = rng.choice(images)
+                tier_index = rng.randrange(len(app.tiers))
+                position = rng.randint(0, len(app.tiers[tier_index].get("images", [])))
+                app.move_image_to_tier(img_info, tier_index, position)
+                settle()
+
+            results["move_image_to_tier"] = summarize(timed(move, max(args.repeat, args.moves)))
+    finally:
+        app.autosaver.shutdown()
+        app.config_manager.close()
+        app.image_processor.shutdown()
+        app.destroy()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """与基准结果比较中位数
+
+    Returns:
+        list: 变慢超过阈值的测试名
+    """
+    regressions = []
+    print(f"\n{'测试':<28}{'基准(ms)':>12}{'本次(ms)':>12}{'比值':>8}")
+    for name, stats in sorted(results.items()):
+        base = baseline.get("results", {}).get(name)
+        current = stats.get("median_ms")
+        if not base or not base.get("median_ms") or current is None:
+            print(f"{name:<28}{'-':>12}{current or 0:>12.3f}{'-':>8}")
+            continue
+        ratio = current / base["median_ms"]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  变慢"
+        print(f"{name:<28}{base['median_ms']:>12.3f}{current:>12.3f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在合成的排行榜上测量主要操作的耗时")
+    parser.add_argument("--tiers", type=int, default=8, help="等级数")
+    parser.add_argument("--images", type=int, default=500, help="图片数")
+    parser.add_argument("--sizes", default="256x256", help="源图片尺寸，逗号分隔，如 256x256,1920x1080")
+    parser.add_argument("--formats", default="png,jpg", help=f"源图片格式，逗号分隔，可选 {','.join(FORMATS)}")
+    parser.add_argument("--repository-share", type=float, default=0.5, help="放在仓库中的图片比例")
+    parser.add_argument("--export-width", type=int, default=1200, help="导出图片的宽度")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测试的重复次数")
+    parser.add_argument("--moves", type=int, default=50, help="移动图片测试的次数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--skip-ui", action="store_true", help="跳过需要图形显示的测试")
+    parser.add_argument("--output", help="结果JSON文件")
+    parser.add_argument("--baseline", help="用于比较的基准结果JSON文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="中位数超过基准多少比例视为变慢")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip().lower() for f in args.formats.split(",")]
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        parser.error(f"不支持的格式: {', '.join(unknown)}")
+    sizes = parse_sizes(args.sizes)
+    rng = random.Random(args.seed)
+
+    work_dir = tempfile.mkdtemp(prefix="tiermaker-bench-")
+    xvfb = None
+    try:
+        source_dir = os.path.join(work_dir, "sources")
+        data_dir = os.path.join(work_dir, "tiermaker_data")
+        os.makedirs(source_dir)
+        source_paths = make_source_images(source_dir, args.images, sizes, formats)
+
+        results = bench_core(args, data_dir, source_paths, rng)
+        if not args.skip_ui:
+            xvfb = start_virtual_display()
+            if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+                results.update(bench_ui(args, data_dir, rng))
+            else:
+                print("没有图形显示，也找不到 Xvfb，跳过界面测试")
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "time": time.time(),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "tiers": args.tiers,
+            "images": args.images,
+            "sizes": [list(size) for size in sizes],
+            "formats": formats,
+            "repository_share": args.repository_share,
+            "export_width": args.export_width,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    for name, stats in sorted(results.items()):
+        print(f"{name:<28}{stats['median_ms'] or 0:>12.3f} ms (中位数, {stats['runs']} 次)")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 项测试变慢超过 {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
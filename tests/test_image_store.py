@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+图片存储测试
+"""
+
+import io
+import os
+
+from PIL import Image
+
+from tiermaker.image_store import ImageStore
+from tiermaker.normalize import ImportNormalizer
+
+
+def png_bytes(color, size=(8, 8)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def add(store, data, name="a.png"):
+    return store.add_stream(io.BytesIO(data), os.path.splitext(name)[1], name)
+
+
+def test_same_content_is_stored_once_and_refcounted(tmp_path):
+    store = ImageStore(str(tmp_path))
+    first = add(store, png_bytes("red"), "a.png")
+    second = add(store, png_bytes("red"), "b.png")
+    assert first["id"] != second["id"]
+    assert first["filename"] == second["filename"]
+    assert second["original_name"] == "b.png"
+    path = tmp_path / first["filename"]
+
+    # 第一个引用被释放时文件仍然保留，最后一个引用被释放时删除
+    assert store.release(first["id"]) is None
+    assert path.exists()
+    assert store.release(second["id"]) == path.stem
+    assert not path.exists()
+    assert store.release(second["id"]) is None
+
+
+def test_manifest_round_trip(tmp_path):
+    store = ImageStore(str(tmp_path))
+    img_info = add(store, png_bytes("blue"))
+    store.flush()
+    reloaded = ImageStore(str(tmp_path))
+    assert reloaded.contains(img_info["id"])
+    assert reloaded.content_hash(img_info) == store.content_hash(img_info)
+
+
+def test_normalized_copy_keeps_original(tmp_path):
+    store = ImageStore(str(tmp_path), ImportNormalizer(max_edge=16), keep_originals=True)
+    data = png_bytes("green", (64, 32))
+    img_info = add(store, data)
+    with Image.open(tmp_path / img_info["filename"]) as img:
+        assert img.size == (16, 8)
+    with open(store.original_path(img_info), "rb") as f:
+        assert f.read() == data
+
+
+def test_migrate_legacy_entries(tmp_path):
+    data = png_bytes("red")
+    (tmp_path / "0_a.png").write_bytes(data)
+    (tmp_path / "1_copy.png").write_bytes(data)
+    entries = [{"filename": "0_a.png"},
+               {"id": "dup", "filename": "1_copy.png"},
+               {"id": "dup", "filename": "0_a.png"},
+               {"id": "lost", "filename": "missing.png"}]
+    store = ImageStore(str(tmp_path))
+    assert store.migrate_entries(entries)
+
+    # 缺少ID和ID重复的项分配了新ID；内容相同的文件合并为一份
+    assert len({img_info["id"] for img_info in entries}) == 4
+    assert entries[0]["filename"] == entries[1]["filename"] == entries[2]["filename"]
+    assert not (tmp_path / "0_a.png").exists() and not (tmp_path / "1_copy.png").exists()
+    assert (tmp_path / entries[0]["filename"]).read_bytes() == data
+    assert entries[3] == {"id": "lost", "filename": "missing.png"}
+
+    # 再次迁移不做任何修改，三个引用都释放后才删除文件
+    assert not store.migrate_entries(entries)
+    for img_info in entries[:2]:
+        assert store.release(img_info["id"]) is None
+    assert store.release(entries[2]["id"]) is not None
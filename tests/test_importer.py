@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+批量导入测试
+"""
+
+import io
+import zipfile
+
+from PIL import Image
+
+from tiermaker.image_store import ImageStore
+from tiermaker.importer import BulkImporter, collect_sources, sniff_image_type
+
+
+def png_bytes(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def make_sources(tmp_path):
+    folder = tmp_path / "src"
+    (folder / "sub").mkdir(parents=True)
+    (folder / "a.png").write_bytes(png_bytes("red"))
+    (folder / "sub" / "b.png").write_bytes(png_bytes("green"))
+    (folder / "notes.txt").write_text("不是图片", encoding="utf-8")
+    archive = tmp_path / "more.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("dir/", b"")
+        zf.writestr("dir/c.png", png_bytes("blue"))
+    return [str(folder), str(archive)]
+
+
+def make_store(tmp_path):
+    images_dir = tmp_path / "images"
+    images_dir.mkdir()
+    return ImageStore(str(images_dir))
+
+
+def test_sniff_image_type():
+    assert sniff_image_type(png_bytes("red")[:8]) == ("PNG", ".png")
+    assert sniff_image_type(b"\xff\xd8\xff\xe0") == ("JPEG", ".jpg")
+    assert sniff_image_type(b"hello") is None
+
+
+def test_collect_sources_expands_folders_and_zips(tmp_path):
+    names = [source.name for source in collect_sources(make_sources(tmp_path))]
+    assert names == ["a.png", "notes.txt", "b.png", "c.png"]
+
+
+def test_import_keeps_source_order_and_reports_skipped(tmp_path):
+    store = make_store(tmp_path)
+    result = BulkImporter(store, max_workers=4).run(make_sources(tmp_path))
+    assert [img_info["original_name"] for img_info in result.imported] == ["a.png", "b.png", "c.png"]
+    assert [name.endswith("notes.txt") for name, _ in result.skipped] == [True]
+    assert not result.cancelled
+    assert all(store.contains(img_info["id"]) for img_info in result.imported)
+
+
+def test_thumbnail_failure_releases_image(tmp_path):
+    store = make_store(tmp_path)
+
+    def broken_thumbnail(img_info):
+        raise OSError("无法解码")
+
+    result = BulkImporter(store, thumbnail_fn=broken_thumbnail).run(make_sources(tmp_path))
+    assert result.imported == []
+    assert [error for _, error in result.skipped].count("无法解码") == 3
+    assert not any(path.suffix == ".png" for path in (tmp_path / "images").rglob("*"))
+
+
+def test_cancel_rolls_back_imported_images(tmp_path):
+    store = make_store(tmp_path)
+    copied = []
+    importer = BulkImporter(store, thumbnail_fn=copied.append, max_workers=1)
+
+    def progress(done, total):
+        importer.cancel()
+
+    result = importer.run(make_sources(tmp_path), progress)
+    assert result.cancelled
+    assert result.imported == []
+    assert importer.done == 1
+    assert len(copied) == 1 and not store.contains(copied[0]["id"])
+    assert not any(path.suffix == ".png" for path in (tmp_path / "images").rglob("*"))
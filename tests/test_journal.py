@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+修改日志测试
+"""
+
+from tiermaker.journal import ChangeJournal, replay
+
+
+def image(image_id):
+    return {"id": image_id, "filename": f"{image_id}.png"}
+
+
+def make_config():
+    return {"tiers": [{"name": "S", "color": "#ff0000", "images": [image("a")]},
+                      {"name": "A", "color": "#00ff00", "images": []}],
+            "repository_images": [image("b"), image("c")]}
+
+
+def ids(config):
+    return ([i["id"] for i in config["repository_images"]],
+            [(t["name"], [i["id"] for i in t["images"]]) for t in config["tiers"]])
+
+
+def test_replay_move_add_and_tiers():
+    config = make_config()
+    records = [{"op": "move", "id": "b", "tier": 0, "pos": 0},
+               {"op": "add", "tier": 1, "pos": None, "images": [image("d"), image("e")]},
+               {"op": "move", "id": "e", "tier": None, "pos": None},
+               # 删除等级 S（图片回到仓库），保留 A 并新建 B
+               {"op": "tiers", "tiers": [{"from": 1, "name": "A", "color": "#00ff00"},
+                                         {"from": None, "name": "B", "color": "#0000ff"}]}]
+    assert replay(config, records) == 4
+    assert ids(config) == (["c", "e", "b", "a"], [("A", ["d"]), ("B", [])])
+
+
+def test_replay_stops_at_invalid_record():
+    config = make_config()
+    records = [{"op": "clear"}, {"op": "unknown"}, {"op": "move", "id": "b", "tier": 0}]
+    assert replay(config, records) == 1
+    assert ids(config) == (["b", "c"], [("S", []), ("A", [])])
+
+
+def test_append_read_and_rotate(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = ChangeJournal(path)
+    for n in range(3):
+        journal.append({"op": "clear", "n": n})
+    snapshot_seq = journal.rotate()
+    journal.append({"op": "clear", "n": 3})
+    journal.close()
+
+    reader = ChangeJournal(path)
+    assert [r["n"] for r in reader.read_records()] == [0, 1, 2, 3]
+    assert [r["n"] for r in reader.read_records(after_seq=snapshot_seq)] == [3]
+    assert reader.seq == 4
+
+    reader.discard_segments(snapshot_seq)
+    assert reader.segment_paths() == []
+
+
+def test_incomplete_last_line_is_ignored_and_truncated(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"op":"clear","seq":1}\n{"op":"cl', encoding="utf-8")
+    journal = ChangeJournal(str(path))
+    assert [r["seq"] for r in journal.read_records()] == [1]
+    assert not journal.corrupt
+    assert journal.append({"op": "clear"}) == 2
+    journal.close()
+    assert path.read_text(encoding="utf-8").splitlines()[-1] == '{"op":"clear","seq":2}'
+
+
+def test_corrupt_record_stops_replay_but_keeps_seq(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"op":"clear","seq":1}\nnot json\n{"op":"clear","seq":5}\n', encoding="utf-8")
+    journal = ChangeJournal(str(path))
+    assert [r["seq"] for r in journal.read_records()] == [1]
+    assert journal.corrupt
+    # 新记录的序号接在被忽略的记录之后
+    assert journal.seq == 5
+    journal.rotate()
+    assert not journal.corrupt
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+图片元数据索引测试
+"""
+
+import os
+
+from PIL import Image
+
+from tiermaker.metadata_index import MetadataIndex
+
+
+def make_index(tmp_path):
+    images_dir = tmp_path / "images"
+    (images_dir / "ab").mkdir(parents=True)
+    return MetadataIndex(str(tmp_path / "metadata.json"), str(images_dir)), images_dir
+
+
+def test_record_reads_header_fields(tmp_path):
+    index, images_dir = make_index(tmp_path)
+    Image.new("RGBA", (40, 30)).save(images_dir / "ab" / "a.png")
+    index.record("ab/a.png", "hash-a")
+    meta = index.get("ab/a.png")
+    assert (meta["width"], meta["height"], meta["mode"], meta["format"], meta["frames"]) == (40, 30, "RGBA", "PNG", 1)
+    assert meta["hash"] == "hash-a"
+
+
+def test_changed_file_drops_stale_hash(tmp_path):
+    index, images_dir = make_index(tmp_path)
+    path = images_dir / "ab" / "a.png"
+    Image.new("RGB", (10, 10)).save(path)
+    index.record("ab/a.png", "hash-a")
+    index.flush()
+
+    Image.new("RGB", (20, 20), "red").save(path)
+    os.utime(path, ns=(1, 1))
+    reopened = MetadataIndex(index.index_file, index.images_dir)
+    assert reopened.validate()["changed"] == 1
+    meta = reopened.get("ab/a.png")
+    assert meta["hash"] is None
+    assert (meta["width"], meta["height"]) == (20, 20)
+
+
+def test_validate_counts_added_and_removed(tmp_path):
+    index, images_dir = make_index(tmp_path)
+    Image.new("RGB", (10, 10)).save(images_dir / "ab" / "a.png")
+    index.record("ab/a.png", "hash-a")
+    index.flush()
+
+    os.remove(images_dir / "ab" / "a.png")
+    Image.new("RGB", (10, 10)).save(images_dir / "ab" / "b.png")
+    (images_dir / "originals").mkdir()
+    Image.new("RGB", (10, 10)).save(images_dir / "originals" / "c.png")
+    reopened = MetadataIndex(index.index_file, index.images_dir)
+    counts = reopened.validate()
+    assert (counts["added"], counts["removed"], counts["unchanged"]) == (1, 1, 0)
+    assert not reopened.exists("ab/a.png")
+    assert reopened.exists("ab/b.png")
+    assert not reopened.exists("originals/c.png")
+    # 只校验一次
+    assert reopened.validate() is None
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+界面协调测试
+"""
+
+import random
+
+import pytest
+
+from tiermaker.reconcile import diff_sequence
+
+
+def apply(old, removals, insertions):
+    """按 diff_sequence 的约定应用差异"""
+    result = list(old)
+    for index in removals:
+        del result[index]
+    for index, key in insertions:
+        result.insert(index, key)
+    return result
+
+
+def test_equal_sequences_have_no_operations():
+    assert diff_sequence(["a", "b"], ["a", "b"]) == ([], [])
+
+
+def test_single_move_is_one_operation_per_row():
+    source = ["a", "b", "c", "d"]
+    target = ["x", "y"]
+    assert diff_sequence(source, ["a", "b", "d"]) == ([2], [])
+    assert diff_sequence(target, target + ["c"]) == ([], [(2, "c")])
+
+
+def test_reorder_within_row():
+    old = ["a", "b", "c", "d", "e"]
+    new = ["a", "d", "b", "c", "e"]
+    removals, insertions = diff_sequence(old, new)
+    assert len(removals) + len(insertions) == 2
+    assert apply(old, removals, insertions) == new
+
+
+def test_removals_are_descending_and_insertions_ascending():
+    removals, insertions = diff_sequence(list("abcdef"), list("xbydez"))
+    assert removals == sorted(removals, reverse=True)
+    assert [index for index, _ in insertions] == sorted(index for index, _ in insertions)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_sequences_round_trip(seed):
+    rng = random.Random(seed)
+    old = rng.sample(range(30), rng.randint(0, 20))
+    new = rng.sample(range(30), rng.randint(0, 20))
+    assert apply(old, *diff_sequence(old, new)) == new
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+搜索索引测试
+"""
+
+from tiermaker.search_index import SearchIndex, tokenize
+
+
+def image(image_id, name, tags=()):
+    return {"id": image_id, "filename": f"{image_id}.png", "original_name": name, "tags": list(tags)}
+
+
+IMAGES = [image("1", "黑柴犬01.png"), image("2", "Shiba_Inu.JPG", ["可爱"]),
+          image("3", "柴.png"), image("4", "golden retriever.png", ["犬"])]
+
+
+def make_index():
+    index = SearchIndex()
+    index.rebuild(IMAGES)
+    return index
+
+
+def test_tokenize_splits_scripts_and_normalizes_width():
+    assert tokenize("Ｓｈｉｂａ_Inu黑柴犬01.png") == ["shiba", "inu", "黑柴犬", "01", "png"]
+
+
+def test_cjk_substring_matching():
+    index = make_index()
+    assert index.search("柴犬") == {"1"}
+    assert index.search("犬柴") == set()
+    assert index.search("黑柴犬") == {"1"}
+    assert index.search("黑犬") == set()
+    assert index.search("柴") == {"1", "3"}
+
+
+def test_prefix_tags_and_extension():
+    index = make_index()
+    assert index.search("shi") == {"2"}
+    assert index.search("SHIBA inu") == {"2"}
+    assert index.search("gold retr") == {"4"}
+    assert index.search("可爱") == {"2"}
+    assert index.search("犬") == {"1", "4"}
+    # 扩展名不参与搜索
+    assert index.search("png") == set()
+
+
+def test_empty_query_does_not_filter():
+    index = make_index()
+    assert index.search("  _ ") is None
+    assert index.filter(IMAGES, "") is IMAGES
+
+
+def test_filter_keeps_order():
+    index = make_index()
+    assert [img_info["id"] for img_info in index.filter(IMAGES[::-1], "犬")] == ["4", "1"]
+
+
+def test_remove_and_update():
+    index = make_index()
+    index.remove(IMAGES[0])
+    assert index.search("柴") == {"3"}
+    assert len(index) == 3
+    index.add(image("3", "秋田犬.png"))
+    assert index.search("柴") == set()
+    assert index.search("秋田") == {"3"}
+    assert len(index) == 3
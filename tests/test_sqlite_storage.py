@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+SQLite存储测试
+"""
+
+from tiermaker.sqlite_storage import SQLiteStorage
+
+
+def image(image_id, **extra):
+    return dict({"id": image_id, "filename": f"{image_id}.png", "original_name": f"{image_id}.png"}, **extra)
+
+
+def make_config(repository, *tiers):
+    return {"version": 3, "journal_seq": 0, "settings": {},
+            "repository_images": repository,
+            "tiers": [{"name": name, "color": "#ff0000", "images": images} for name, images in tiers]}
+
+
+def ids(config):
+    return ([i["id"] for i in config["repository_images"]],
+            [(t["name"], [i["id"] for i in t["images"]]) for t in config["tiers"]])
+
+
+def save(storage, list_id, config):
+    """保存并返回改写的行数"""
+    before = storage._conn.total_changes
+    storage.save_tierlist(list_id, config)
+    return storage._conn.total_changes - before
+
+
+def test_round_trip_keeps_order_and_extra_fields(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "tierlists.db"))
+    list_id = storage.create_tierlist("test")
+    config = make_config([image("r1", tags=["柴犬"])], ("S", [image("a"), image("b")]), ("A", []))
+    storage.save_tierlist(list_id, config)
+    loaded = storage.load_tierlist(list_id, page_size=1)
+    assert ids(loaded) == (["r1"], [("S", ["a", "b"]), ("A", [])])
+    assert loaded["repository_images"][0]["tags"] == ["柴犬"]
+
+
+def test_unchanged_save_writes_only_the_list_row(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "tierlists.db"))
+    list_id = storage.create_tierlist("test")
+    config = make_config([image(f"r{n}") for n in range(50)], ("S", [image("a"), image("b")]))
+    storage.save_tierlist(list_id, config)
+    # lists 行和 meta 中的 version、settings
+    assert save(storage, list_id, config) == 3
+
+
+def test_move_updates_only_shifted_memberships(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "tierlists.db"))
+    list_id = storage.create_tierlist("test")
+    repository = [image(f"r{n}") for n in range(50)]
+    config = make_config(repository, ("S", [image("a")]))
+    storage.save_tierlist(list_id, config)
+
+    # 把仓库末尾的图片移到等级开头：只改写它和 "a" 的成员关系
+    config = make_config(repository[:-1], ("S", [repository[-1], image("a")]))
+    assert save(storage, list_id, config) == 3 + 2
+    assert ids(storage.load_tierlist(list_id)) == ([f"r{n}" for n in range(49)], [("S", ["r49", "a"])])
+
+
+def test_removed_tier_and_images(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "tierlists.db"))
+    list_id = storage.create_tierlist("test")
+    storage.save_tierlist(list_id, make_config([], ("S", [image("a")]), ("A", [image("b"), image("c")])))
+
+    # 删除等级 A：b 回到仓库，c 被删除
+    storage.save_tierlist(list_id, make_config([image("b")], ("S", [image("a")])))
+    assert ids(storage.load_tierlist(list_id)) == (["b"], [("S", ["a"])])
+    remaining = {row[0] for row in storage._conn.execute("SELECT id FROM images")}
+    assert remaining == {"a", "b"}
+
+
+def test_changed_image_info_and_tier_name(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "tierlists.db"))
+    list_id = storage.create_tierlist("test")
+    storage.save_tierlist(list_id, make_config([image("a")], ("S", [])))
+    storage.save_tierlist(list_id, make_config([image("a", tags=["新"])], ("SS", [])))
+    loaded = storage.load_tierlist(list_id)
+    assert loaded["repository_images"][0]["tags"] == ["新"]
+    assert loaded["tiers"][0]["name"] == "SS"
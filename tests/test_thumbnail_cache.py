@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+缩略图缓存测试
+"""
+
+import os
+
+from PIL import Image
+
+from tiermaker.thumbnail_cache import ThumbnailCache
+
+
+def make_source(tmp_path, name="a.png", color="red"):
+    path = str(tmp_path / name)
+    Image.new("RGB", (300, 200), color).save(path)
+    return path
+
+
+def test_flush_is_atomic_and_reloads(tmp_path):
+    cache = ThumbnailCache(str(tmp_path / "thumbnails"))
+    src = make_source(tmp_path)
+    content_hash = cache.content_hash(src)
+    cache.flush()
+    assert not [name for name in os.listdir(cache.cache_dir) if name.endswith(".tmp")]
+
+    reopened = ThumbnailCache(cache.cache_dir)
+    assert reopened._index[os.path.abspath(src)]["hash"] == content_hash
+
+
+def test_thumbnail_sizes_and_discard(tmp_path):
+    cache = ThumbnailCache(str(tmp_path / "thumbnails"))
+    src = make_source(tmp_path)
+    other = make_source(tmp_path, "b.png", "blue")
+    assert cache.get_thumbnail(src, (70, 70)).size == (70, 70)
+    assert cache.get_thumbnail(src, (128, 128)).size == (128, 128)
+    cache.get_thumbnail(other, (70, 70))
+
+    content_hash = cache.content_hash(src)
+    cache.discard(content_hash)
+    names = os.listdir(cache.cache_dir)
+    assert not [name for name in names if name.startswith(content_hash)]
+    assert [name for name in names if name.startswith(cache.content_hash(other))]
+    assert not cache.has_file(cache.cached_path(content_hash, (70, 70)))
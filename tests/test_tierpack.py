@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+排行榜包测试
+"""
+
+import os
+
+import pytest
+from PIL import Image
+
+from tiermaker.image_store import new_image_id
+from tiermaker.image_utils import ImageProcessor
+from tiermaker.tierpack import pack_entries, write_tierpack
+from tiermaker.thumbnail_cache import ThumbnailCache
+
+
+def make_processor(root, tile_size, keep_originals=False):
+    images_dir = os.path.join(root, "images")
+    os.makedirs(images_dir)
+    processor = ImageProcessor(images_dir, keep_originals=keep_originals)
+    processor.tile_size = tile_size
+    return processor
+
+
+def import_image(processor, path, color):
+    Image.new("RGB", (400, 300), color).save(path)
+    img_info = processor.store.add(path, os.path.basename(path))
+    img_info.setdefault("id", new_image_id())
+    return img_info
+
+
+@pytest.mark.parametrize("edge", [96, 128])
+def test_round_trip_uses_packed_thumbnails(tmp_path, monkeypatch, edge):
+    source = make_processor(str(tmp_path / "source"), (edge, edge))
+    images = [import_image(source, str(tmp_path / f"{i}.jpg"), color)
+              for i, color in enumerate(["red", "blue"])]
+    config = {"tiers": [{"name": "S", "color": "#ff7f7f", "images": images[:1]}],
+              "repository_images": images[1:]}
+    pack_path = str(tmp_path / "list.tierpack")
+    assert write_tierpack(pack_path, config, source.images_dir, source.thumbnail_file, source.pack_sizes()) == 2
+
+    target = make_processor(str(tmp_path / "target"), (edge, edge))
+    pack = target.open_tierpack(pack_path)
+    entries = pack_entries(pack.config())
+    for img_info in entries:
+        img_info["id"] = new_image_id()
+    missing, renamed = target.extract_tierpack(entries)
+    target.close_tierpack()
+    assert missing == []
+
+    def no_pyramid(*args, **kwargs):
+        raise AssertionError("包中的缩略图没有被使用")
+
+    monkeypatch.setattr(ThumbnailCache, "ensure_pyramid", no_pyramid)
+    for img_info in entries:
+        img_info = dict(img_info, filename=renamed.get(img_info["id"], img_info["filename"]))
+        assert target.load_thumbnail(img_info, (edge, edge)).size == (edge, edge)
+        preview, final = target.load_preview(img_info, (edge, edge))
+        assert final and preview.size == (edge, edge)
+
+
+def test_extract_does_not_modify_entries(tmp_path):
+    source = make_processor(str(tmp_path / "source"), (70, 70))
+    img_info = import_image(source, str(tmp_path / "a.jpg"), "green")
+    pack_path = str(tmp_path / "list.tierpack")
+    write_tierpack(pack_path, {"tiers": [], "repository_images": [img_info]},
+                   source.images_dir, source.thumbnail_file, source.pack_sizes())
+
+    target = make_processor(str(tmp_path / "target"), (70, 70))
+    pack = target.open_tierpack(pack_path)
+    entries = pack_entries(pack.config())
+    entries[0]["id"] = new_image_id()
+    before = [dict(entry) for entry in entries]
+    missing, renamed = target.extract_tierpack(entries)
+    target.close_tierpack()
+    assert entries == before
+    filename = renamed.get(entries[0]["id"], entries[0]["filename"])
+    assert os.path.exists(os.path.join(target.images_dir, filename))
+
+
+def test_packs_kept_originals(tmp_path):
+    source = make_processor(str(tmp_path / "source"), (70, 70), keep_originals=True)
+    src_path = str(tmp_path / "big.jpg")
+    Image.new("RGB", (3000, 2000), "purple").save(src_path, quality=95)
+    img_info = source.store.add(src_path, "big.jpg")
+    pack_path = str(tmp_path / "list.tierpack")
+    write_tierpack(pack_path, {"tiers": [], "repository_images": [img_info]},
+                   source.images_dir, source.thumbnail_file, source.pack_sizes(), source.store.original_path)
+
+    target = make_processor(str(tmp_path / "target"), (70, 70), keep_originals=True)
+    pack = target.open_tierpack(pack_path)
+    entries = pack_entries(pack.config())
+    entries[0]["id"] = new_image_id()
+    missing, renamed = target.extract_tierpack(entries)
+    target.close_tierpack()
+    assert missing == [] and renamed == {}
+
+    # 原图完整地到达另一方，工作副本按同一个内容哈希命名
+    with open(src_path, "rb") as f, open(target.store.original_path(entries[0]), "rb") as g:
+        assert f.read() == g.read()
+    with Image.open(os.path.join(target.images_dir, entries[0]["filename"])) as work:
+        assert max(work.size) == 1024
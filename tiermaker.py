@@ -6,13 +6,12 @@ TierMaker - 排行榜制作工具
 启动脚本 - 应用程序入口点
 """
 
-from tiermaker.main import TierMaker
+from tiermaker.main import main as run
 
 
 def main():
     """启动TierMaker应用程序"""
-    app = TierMaker()
-    app.mainloop()
+    run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+后台加载模块 - 在线程池中解码和缩放图片，并把结果批量交回主线程
+"""
+
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LoadTicket:
+    """一次后台加载请求"""
+    __slots__ = ("future", "callback", "cancelled")
+
+    def __init__(self, callback):
+        self.future = None
+        self.callback = callback
+        self.cancelled = False
+
+
+class AsyncImageLoader:
+    """后台图片加载类
+
+    工作线程只做PIL的解码和缩放（Pillow在这些操作中会释放GIL），
+    完成的结果放入队列，由主线程通过 after() 定时批量取出并回调，
+    因此所有Tk操作仍然只在主线程中进行。
+    """
+
+    def __init__(self, root, max_workers=None, batch_interval=16):
+        """初始化后台加载器
+
+        Args:
+            root: Tk根窗口，用于在主线程中调度回调
+            max_workers: 工作线程数，默认为CPU核心数（最多4个）
+            batch_interval: 主线程取回结果的间隔（毫秒）
+        """
+        self.root = root
+        self.batch_interval = batch_interval
+        if max_workers is None:
+            max_workers = min(4, os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tiermaker-decode")
+        self._results = queue.SimpleQueue()
+        self._outstanding = 0
+        self._pending = set()  # 结果尚未被主线程取回的请求（关闭时取消）
+        self._poll_id = None
+
+    def submit(self, fn, callback):
+        """提交一个后台任务
+
+        Args:
+            fn: 在工作线程中执行的函数（不能访问Tk）
+            callback: 在主线程中调用的回调，参数为 (结果, 异常)
+
+        Returns:
+            LoadTicket: 可用于取消的请求
+        """
+        ticket = LoadTicket(callback)
+        ticket.future = self._executor.submit(self._run, ticket, fn)
+        self._pending.add(ticket)
+        self._outstanding += 1
+        self._schedule_poll()
+        return ticket
+
+    def cancel(self, ticket):
+        """取消请求；已经开始执行的任务会在完成后被丢弃"""
+        if ticket is None or ticket.cancelled:
+            return
+        ticket.cancelled = True
+        if ticket.future.cancel():
+            self._pending.discard(ticket)
+            self._outstanding -= 1
+
+    def shutdown(self):
+        """停止工作线程并丢弃尚未开始的任务"""
+        if self._poll_id is not None:
+            try:
+                self.root.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+        # 逐个取消尚未开始的任务（shutdown 的 cancel_futures 参数需要 Python 3.9）
+        for ticket in self._pending:
+            ticket.cancelled = True
+            ticket.future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=False)
+
+    def _run(self, ticket, fn):
+        """在工作线程中执行任务并把结果放入队列"""
+        if ticket.cancelled:
+            self._results.put((ticket, None, None))
+            return
+        try:
+            self._results.put((ticket, fn(), None))
+        except Exception as e:
+            self._results.put((ticket, None, e))
+
+    def _schedule_poll(self):
+        """在主线程中安排下一次结果取回"""
+        if self._poll_id is None and self._outstanding > 0:
+            self._poll_id = self.root.after(self.batch_interval, self._drain)
+
+    def _drain(self):
+        """在主线程中批量处理已完成的结果"""
+        self._poll_id = None
+        while True:
+            try:
+                ticket, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending.discard(ticket)
+            self._outstanding -= 1
+            if not ticket.cancelled:
+                ticket.cancelled = True  # 回调只执行一次
+                try:
+                    ticket.callback(result, error)
+                except Exception as e:
+                    print(f"图片加载回调错误: {str(e)}")
+        self._schedule_poll()
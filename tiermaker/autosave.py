@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+自动保存模块 - 合并连续的修改，在后台线程中延迟写入配置
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AutoSaver:
+    """延迟写入（write-behind）的自动保存类
+
+    每次修改只调用 mark_dirty()，在安静期（delay 毫秒内没有新的修改）结束后
+    才在主线程中取一次快照，序列化和写盘交给单个后台线程完成。
+    后台线程正忙时产生的快照只保留最新的一份，连续的修改最终只写入一次。
+    """
+
+    def __init__(self, root, snapshot_fn, write_fn, delay=500):
+        """初始化自动保存器
+
+        Args:
+            root: Tk根窗口，用于在主线程中调度延迟保存
+            snapshot_fn: 在主线程中调用，返回要保存的数据（不能与之后的修改共享可变列表）
+            write_fn: 在后台线程中调用，把快照写入磁盘
+            delay: 安静期长度（毫秒）
+        """
+        self.root = root
+        self.snapshot_fn = snapshot_fn
+        self.write_fn = write_fn
+        self.delay = delay
+        self.dirty = False
+        self.last_error = None
+        self.saves = 0
+        self._holds = 0
+        self._after_id = None
+        self._lock = threading.Lock()
+        self._pending = None  # 等待后台线程写入的最新快照
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tiermaker-save")
+
+    def mark_dirty(self):
+        """标记有未保存的修改，并重新开始安静期计时"""
+        self.dirty = True
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(self.delay, self._on_quiet)
+
+    def hold(self):
+        """暂停写入（修改仍然被记录），与 release() 成对调用
+
+        例如排行榜包还在后台导入时，配置引用的图片还不在存储中，不能写入磁盘。
+        """
+        self._holds += 1
+
+    def release(self):
+        """取消一次暂停，全部取消后写入暂停期间的修改"""
+        self._holds = max(0, self._holds - 1)
+        if not self._holds and self.dirty:
+            self.mark_dirty()
+
+    def _on_quiet(self):
+        """安静期结束，提交保存"""
+        self._after_id = None
+        self._submit()
+
+    def _submit(self):
+        """在主线程中取快照并交给后台线程写入"""
+        if not self.dirty or self._holds:
+            return
+        snapshot = self.snapshot_fn()
+        self.dirty = False
+        with self._lock:
+            queued = self._pending is not None
+            self._pending = snapshot
+        if not queued:
+            self._executor.submit(self._write_pending)
+
+    def _write_pending(self):
+        """后台线程：写入最新的快照"""
+        with self._lock:
+            snapshot, self._pending = self._pending, None
+        if snapshot is None:
+            return
+        try:
+            self.write_fn(snapshot)
+            self.last_error = None
+            self.saves += 1
+        except Exception as e:
+            self.last_error = e
+            print(f"自动保存错误: {str(e)}")
+
+    def flush(self):
+        """立即保存所有未保存的修改并等待写入完成
+
+        Returns:
+            bool: 最后一次写入是否成功
+        """
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self._submit()
+        # 单线程执行器按顺序执行，空任务完成时之前的写入也已完成
+        self._executor.submit(lambda: None).result()
+        return self.last_error is None
+
+    def shutdown(self):
+        """保存未保存的修改并停止后台线程
+
+        Returns:
+            bool: 最后一次写入是否成功
+        """
+        ok = self.flush()
+        self._executor.shutdown(wait=True)
+        return ok
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+单画布等级区域 - 在一个Canvas上绘制所有等级行和图片
+"""
+
+from bisect import bisect_right
+import tkinter as tk
+from tkinter import ttk
+
+from tiermaker.instrumentation import PERF
+
+LABEL_WIDTH = 50  # 等级标签宽度
+TILE_GAP = 4  # 图片之间的间距（左右各2像素）
+IMAGES_LEFT = LABEL_WIDTH + 4  # 图片区域的左边界
+TOP_PADDING = 5  # 图片区域的上下边距
+ROW_GAP = 2  # 等级行之间的间距
+
+
+class CanvasTierFrame(ttk.Frame):
+    """单画布等级区域框架（TierFrame 的替代实现）
+
+    所有等级行都绘制在同一个Canvas上：标签是矩形和文字，图片是图像项，
+    图片按画布宽度自动换行，布局在Python中计算。无论有多少等级和图片，
+    控件数都是常数；点击和放置通过标签（tag）和布局数据命中测试。
+    只有可见区域内的图片绑定真实的缩略图，其余显示占位图片。
+    """
+
+    def __init__(self, parent, app, tiers, images_dir, tkdnd_available, dnd_files):
+        super().__init__(parent)
+        self.app = app
+        self.tiers = tiers
+        self.images_dir = images_dir
+        self.tkdnd_available = tkdnd_available
+        self.dnd_files = dnd_files
+
+        self._tiles = {}  # 图片ID -> 图片项记录
+        self._item_images = {}  # 画布图像项 -> 图片信息
+        self._headers = []  # 每个等级行的 (背景项, 标签矩形项, 文字项, (名称, 颜色))
+        self._row_tops = []  # 各行顶部的y坐标
+        self._cols = 1  # 每行的图片列数
+        self._width = 0
+        self._limit = None  # 每个等级最多显示的图片数（启动时分批加载用）
+        self.set_tile_metrics(app.tile_size)
+
+        self.setup_tiers_area()
+
+    def set_tile_metrics(self, size):
+        """根据图片大小计算图片间距和等级行的最小高度"""
+        self.tile_size = tuple(size)
+        self.tile_pitch = self.tile_size[0] + TILE_GAP
+        self.row_min_height = self.tile_size[1] + 2 * TOP_PADDING
+
+    def set_tile_size(self, size):
+        """图片大小改变后删除所有图像项并重新布局（图片由之后的刷新按新尺寸重新创建）
+
+        Args:
+            size: 新的图片大小
+        """
+        for tile in self._tiles.values():
+            self.remove_tile(tile)
+        self._tiles = {}
+        self.set_tile_metrics(size)
+        self.refresh_tiers(self.tiers, limit=0)
+
+    def setup_tiers_area(self):
+        """设置等级区域"""
+        self.tiers_canvas = tk.Canvas(self, bg="white", highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tiers_canvas.yview)
+        # 任何视图变化都会经过这里，从而更新可见图片
+        self.tiers_canvas.configure(yscrollcommand=self.on_yview)
+
+        self.scrollbar.pack(side="right", fill="y")
+        self.tiers_canvas.pack(side="left", fill="both", expand=True)
+
+        self.tiers_canvas.bind("<Configure>", self.on_canvas_configure)
+        self.tiers_canvas.tag_bind("tile", "<ButtonPress-1>", self.on_tile_press)
+
+        # 设置为可放置区域，放置的等级按鼠标位置计算
+        if self.tkdnd_available:
+            self.enable_drop_targets(self.dnd_files)
+
+        # 先只绘制等级行，图片由应用在首帧显示之后分批加载
+        self.refresh_tiers(self.tiers, limit=0)
+
+    def enable_drop_targets(self, dnd_files):
+        """把画布设置为可放置区域（拖放支持加载完成后调用）
+
+        Args:
+            dnd_files: tkinterdnd2 的文件拖放类型
+        """
+        self.tkdnd_available = True
+        self.dnd_files = dnd_files
+        self.tiers_canvas.drop_target_register(self.dnd_files)
+        self.tiers_canvas.dnd_bind("<<Drop>>", self.on_drop_files)
+
+    def on_yview(self, first, last):
+        """画布视图变化时同步滚动条并更新可见图片，滚动期间推迟缩略图细化"""
+        self.scrollbar.set(first, last)
+        self.app.defer_refinement()
+        self.update_visible_tiles()
+
+    def on_canvas_configure(self, event):
+        """画布宽度改变时重新计算换行"""
+        if event.width != self._width:
+            self.layout()
+        else:
+            self.update_visible_tiles()
+
+    def refresh_tiers(self, tiers, limit=None):
+        """刷新等级区域（重新计算布局，只移动位置发生变化的图像项）
+
+        Args:
+            tiers: 等级列表
+            limit: 每个等级最多显示的图片数，None 表示全部
+        """
+        self.tiers = tiers
+        self._limit = limit
+        with PERF.measure("refresh.tiers"):
+            self.layout()
+
+    def layout(self):
+        """计算所有等级行和图片的位置并更新画布项"""
+        canvas = self.tiers_canvas
+        self._width = canvas.winfo_width()
+        pitch = self.tile_pitch
+        width = max(self._width, IMAGES_LEFT + pitch)
+        cols = max(1, (width - IMAGES_LEFT) // pitch)
+        self._cols = cols
+
+        seen = set()
+        tops = []
+        created_header = False
+        y = 0
+        for index, tier in enumerate(self.tiers):
+            images = tier.get("images", [])
+            if self._limit is not None:
+                images = images[:self._limit]
+            lines = max(1, (len(images) + cols - 1) // cols)
+            height = max(self.row_min_height, 2 * TOP_PADDING + lines * pitch - TILE_GAP)
+            tops.append(y)
+            if index >= len(self._headers):
+                self._headers.append(self.create_header())
+                created_header = True
+            self.place_header(index, tier, y, width, height)
+
+            for position, img_info in enumerate(images):
+                x = IMAGES_LEFT + (position % cols) * pitch
+                tile_y = y + TOP_PADDING + (position // cols) * pitch
+                tile = self._tiles.get(img_info["id"])
+                if tile is None:
+                    placeholder = self.app.image_processor.registry.placeholder(self.tile_size)
+                    item = canvas.create_image(x, tile_y, anchor="nw", image=placeholder, tags=("tile",))
+                    tile = self._tiles[img_info["id"]] = {"item": item, "img_info": img_info, "pos": (x, tile_y),
+                                                          "photo": None, "request": None}
+                    self._item_images[item] = img_info
+                else:
+                    if tile["img_info"] is not img_info:
+                        # 图片信息被替换（例如存储路径改变），按新的信息重新请求缩略图
+                        self.unbind_tile(tile)
+                        tile["img_info"] = self._item_images[tile["item"]] = img_info
+                    if tile["pos"] != (x, tile_y):
+                        canvas.coords(tile["item"], x, tile_y)
+                        tile["pos"] = (x, tile_y)
+                seen.add(img_info["id"])
+            y += height + ROW_GAP
+
+        # 删除多余的等级行和已不在任何等级中的图片
+        for header in self._headers[len(self.tiers):]:
+            canvas.delete(*header[:3])
+        del self._headers[len(self.tiers):]
+        for image_id in [image_id for image_id in self._tiles if image_id not in seen]:
+            self.remove_tile(self._tiles.pop(image_id))
+        if created_header:
+            canvas.tag_raise("tile")
+
+        self._row_tops = tops
+        canvas.configure(scrollregion=(0, 0, width, max(y, 1)))
+        self.update_visible_tiles()
+
+    def create_header(self):
+        """创建一个等级行的背景、标签矩形和文字项"""
+        canvas = self.tiers_canvas
+        background = canvas.create_rectangle(0, 0, 0, 0, fill="#f0f0f0", outline="")
+        label = canvas.create_rectangle(0, 0, 0, 0, outline="")
+        text = canvas.create_text(0, 0, font=("Arial", 12, "bold"))
+        return [background, label, text, None]
+
+    def place_header(self, index, tier, top, width, height):
+        """更新等级行的位置、名称和颜色"""
+        canvas = self.tiers_canvas
+        background, label, text, shown = self._headers[index]
+        canvas.coords(background, LABEL_WIDTH, top, width, top + height)
+        canvas.coords(label, 0, top, LABEL_WIDTH, top + height)
+        canvas.coords(text, LABEL_WIDTH / 2, top + height / 2)
+        header = (tier["name"], tier["color"])
+        if shown != header:
+            canvas.itemconfigure(label, fill=header[1])
+            canvas.itemconfigure(text, text=header[0])
+            self._headers[index][3] = header
+
+    def update_visible_tiles(self):
+        """只为可见区域内的图片绑定缩略图，移出可见区域的图片改回占位图片"""
+        canvas = self.tiers_canvas
+        top = canvas.canvasy(0)
+        bottom = top + max(canvas.winfo_height(), self.row_min_height)
+        visible = set(canvas.find_overlapping(0, top, max(self._width, IMAGES_LEFT + self.tile_pitch), bottom))
+
+        for tile in self._tiles.values():
+            bound = tile["photo"] is not None or tile["request"] is not None
+            if tile["item"] in visible:
+                if not bound:
+                    self.bind_tile(tile)
+            elif bound:
+                self.unbind_tile(tile)
+
+    def bind_tile(self, tile):
+        """请求图片项的缩略图，加载完成后替换占位图片"""
+        registry = self.app.image_processor.registry
+
+        def on_loaded(photo):
+            tile["request"] = None
+            if photo:
+                tile["photo"] = photo
+                self.tiers_canvas.itemconfigure(tile["item"], image=photo)
+
+        tile["request"] = registry.request(tile["img_info"], self.tile_size, on_loaded)
+
+    def unbind_tile(self, tile):
+        """取消或释放图片项的缩略图"""
+        registry = self.app.image_processor.registry
+        if not registry.cancel(tile["request"]) and tile["photo"]:
+            self.tiers_canvas.itemconfigure(tile["item"], image=registry.placeholder(self.tile_size))
+            registry.release(tile["img_info"], self.tile_size)
+        tile["photo"] = None
+        tile["request"] = None
+
+    def remove_tile(self, tile):
+        """删除图片项"""
+        self.unbind_tile(tile)
+        self._item_images.pop(tile["item"], None)
+        self.tiers_canvas.delete(tile["item"])
+
+    def on_tile_press(self, event):
+        """按下图片项时开始拖动"""
+        items = self.tiers_canvas.find_withtag("current")
+        img_info = self._item_images.get(items[0]) if items else None
+        if img_info is not None:
+            self.app.start_drag(event, None, img_info)
+
+    def drop_target(self, x_root, y_root):
+        """计算屏幕坐标处的放置目标（直接使用布局数据，不查询控件位置）
+
+        Returns:
+            tuple: (等级索引, 插入位置)，不在等级区域内时返回None
+        """
+        canvas = self.tiers_canvas
+        left, top = canvas.winfo_rootx(), canvas.winfo_rooty()
+        if not self._row_tops or not (left <= x_root < left + canvas.winfo_width() and
+                                      top <= y_root < top + canvas.winfo_height()):
+            return None
+
+        x = canvas.canvasx(x_root - left)
+        y = canvas.canvasy(y_root - top)
+        tier_index = max(0, bisect_right(self._row_tops, y) - 1)
+        images = self.tiers[tier_index].get("images", [])
+
+        # 在换行的网格中定位：先确定第几行，再按图片中心确定插入的列
+        lines = max(1, (len(images) + self._cols - 1) // self._cols)
+        pitch = self.tile_pitch
+        line = min(lines - 1, max(0, int((y - self._row_tops[tier_index] - TOP_PADDING) // pitch)))
+        col = min(self._cols, max(0, int((x - IMAGES_LEFT + pitch / 2) // pitch)))
+        return tier_index, min(len(images), line * self._cols + col)
+
+    def on_drop_files(self, event):
+        """处理拖放到等级的外部文件（支持文件、文件夹和压缩包）"""
+        try:
+            if isinstance(event.data, str):
+                files = event.data.split('} {')
+                # 修复路径格式
+                files = [f.replace('{', '').replace('}', '') for f in files]
+            else:
+                files = event.data
+
+            target = self.drop_target(event.x_root, event.y_root)
+            self.app.import_paths(files, target[0] if target else None)
+        except Exception as e:
+            print(f"处理拖放文件错误: {str(e)}")
@@ -10,39 +10,232 @@ import os
 import json
 from tkinter import messagebox
 
+from tiermaker.journal import ChangeJournal, replay
+from tiermaker.sqlite_storage import SQLiteStorage
+from tiermaker.instrumentation import PERF
+
 
 class ConfigManager:
     """配置管理类，负责处理配置文件的加载和保存"""
     
-    def __init__(self):
-        """初始化配置管理器"""
+    def __init__(self, app_dir=None):
+        """初始化配置管理器
+        
+        Args:
+            app_dir: 数据存储目录，默认为程序目录下的 tiermaker_data
+        """
         # 创建数据存储目录
-        self.app_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tiermaker_data")
+        if app_dir is None:
+            app_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tiermaker_data")
+        self.app_dir = app_dir
         self.images_dir = os.path.join(self.app_dir, "images")
+        self.thumbnails_dir = os.path.join(self.app_dir, "thumbnails")
+        self.metadata_file = os.path.join(self.app_dir, "metadata.json")
         self.config_file = os.path.join(self.app_dir, "config.json")
+        self.journal_file = os.path.join(self.app_dir, "config.journal")
+        self.database_file = os.path.join(self.app_dir, "tiermaker.db")
         
         self.ensure_directories()
+        
+        # 修改日志：日志模式下每次修改追加一条记录，快照只在压缩时保存
+        self.journal = ChangeJournal(self.journal_file)
+        
+        # 可选的SQLite存储（环境变量 TIERMAKER_STORAGE=sqlite）：一个数据库保存多个排行榜
+        self.storage = None
+        self.current_list = None
+        if os.environ.get("TIERMAKER_STORAGE") == "sqlite":
+            self.storage = SQLiteStorage(self.database_file)
     
     def ensure_directories(self):
         """确保应用所需的目录存在"""
         os.makedirs(self.app_dir, exist_ok=True)
         os.makedirs(self.images_dir, exist_ok=True)
+        os.makedirs(self.thumbnails_dir, exist_ok=True)
     
     def load_config(self):
-        """加载配置文件"""
+        """加载配置（SQLite模式下为当前排行榜），并重放快照之后的修改日志"""
+        if self.storage is not None:
+            return self._load_current_tierlist()
+        return self._load_config_file()
+    
+    def _load_config_file(self):
+        """加载 config.json 并重放修改日志"""
+        config = None
         if os.path.exists(self.config_file):
             try:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    config = json.load(f)
             except Exception as e:
                 messagebox.showerror("加载错误", f"无法加载配置文件: {str(e)}")
-        return None
+                return None
+        
+        # 无论是否启用日志模式都重放遗留的日志，保证上次的修改不会丢失
+        records = self._read_changes((config or {}).get("journal_seq", 0))
+        if records:
+            if config is None:
+                config = {}
+            if replay(config, records) < len(records):
+                self.journal.corrupt = True
+        return config
+    
+    def _read_changes(self, after_seq):
+        """读取属于当前排行榜的日志记录（SQLite模式的记录带有排行榜ID）"""
+        return [record for record in self.journal.read_records(after_seq)
+                if record.get("list") == self.current_list]
+    
+    def _load_current_tierlist(self):
+        """SQLite模式：加载上次打开的排行榜，数据库为空时从 config.json 导入"""
+        list_id = self.storage.get_meta("current_list")
+        if list_id is None or self.storage.list_name(list_id) is None:
+            lists = self.storage.list_tierlists()
+            if lists:
+                list_id = lists[0][0]
+            else:
+                config = self._load_config_file()
+                list_id = self.storage.create_tierlist("我的排行榜")
+                if config:
+                    config["journal_seq"] = self.journal.seq
+                    self.storage.save_tierlist(list_id, config)
+        return self.open_tierlist(list_id)
+    
+    @property
+    def multiple_lists(self):
+        """是否支持多个排行榜（SQLite模式）"""
+        return self.storage is not None
+    
+    def list_tierlists(self):
+        """获取所有排行榜 (ID, 名称, 图片数量)"""
+        return self.storage.list_tierlists()
+    
+    def current_list_name(self):
+        """获取当前排行榜的名称（JSON模式下返回None）"""
+        if self.storage is None:
+            return None
+        return self.storage.list_name(self.current_list)
+    
+    def create_tierlist(self, name, tiers):
+        """创建新的排行榜，返回其ID"""
+        return self.storage.create_tierlist(name, tiers)
+    
+    def rename_tierlist(self, list_id, name):
+        """重命名排行榜"""
+        self.storage.rename_tierlist(list_id, name)
+    
+    def delete_tierlist(self, list_id):
+        """删除排行榜（不能删除当前排行榜）
+        
+        Returns:
+            list: 被删除排行榜中的图片信息
+        """
+        if list_id == self.current_list:
+            raise ValueError("不能删除当前打开的排行榜")
+        return self.storage.delete_tierlist(list_id)
+    
+    def rename_images(self, renamed):
+        """更新数据库中图片的存储路径（SQLite模式；图片ID在所有排行榜中唯一）
+        
+        Args:
+            renamed: {图片ID: 新文件名}
+        """
+        if self.storage is not None:
+            self.storage.rename_images(renamed)
+    
+    def open_tierlist(self, list_id):
+        """打开排行榜（调用前应先保存当前排行榜）
+        
+        只读取该排行榜的行，并重放日志中属于它的记录。
+        
+        Returns:
+            dict: 配置字典
+        """
+        config = self.storage.load_tierlist(list_id)
+        self.current_list = list_id
+        self.storage.set_meta("current_list", list_id)
+        records = self._read_changes(config.get("journal_seq", 0))
+        if records and replay(config, records) < len(records):
+            self.journal.corrupt = True
+        return config
+    
+    def append_change(self, record):
+        """向修改日志追加一条记录
+        
+        Returns:
+            bool: 是否成功写入（失败时调用方应改为保存完整快照）
+        """
+        if self.current_list is not None:
+            record["list"] = self.current_list
+        try:
+            self.journal.append(record)
+            return True
+        except Exception as e:
+            print(f"写入修改日志错误: {str(e)}")
+            return False
+    
+    def write_config(self, config):
+        """把配置原子地写入文件（可在后台线程中调用）
+        
+        先写入临时文件并 fsync，再用 os.replace 替换原文件，
+        写入过程中崩溃时原配置文件保持完整。SQLite模式下在一个事务中改写当前排行榜。
+        
+        Args:
+            config: 配置字典
+        
+        Raises:
+            OSError: 写入失败
+            sqlite3.Error: 数据库写入失败
+        """
+        with PERF.measure("save"):
+            if self.storage is not None:
+                self.storage.save_tierlist(self.current_list, config)
+            else:
+                self._write_config_file(config)
+        
+        # 快照已包含的日志分段不再需要
+        if "journal_seq" in config:
+            self.journal.discard_segments(config["journal_seq"])
+    
+    def _write_config_file(self, config):
+        """原子地写入 config.json"""
+        # 不缩进，使用C实现的编码器，大列表序列化时占用GIL的时间更短
+        data = json.dumps(config, ensure_ascii=False, separators=(",", ":"))
+        tmp_path = self.config_file + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.config_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._fsync_dir()
+    
+    def _fsync_dir(self):
+        """同步数据目录，保证重命名本身已落盘（不支持的平台上忽略）"""
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        try:
+            fd = os.open(self.app_dir, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    
+    def close(self):
+        """关闭修改日志和数据库"""
+        self.journal.close()
+        if self.storage is not None:
+            self.storage.close()
     
     def save_config(self, config):
-        """保存配置到文件"""
+        """立即保存配置到文件"""
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            self.write_config(config)
             return True
         except Exception as e:
             messagebox.showerror("保存错误", f"无法保存配置文件: {str(e)}")
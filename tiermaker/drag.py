@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+拖动模块 - 在仓库和等级之间拖动图片
+"""
+
+import tkinter as tk
+
+from tiermaker.sizes import DRAG_ICON_SIZE
+
+# 拖动图标相对于鼠标指针的偏移
+ICON_OFFSET = 30
+
+
+class DragController:
+    """拖动控制器
+
+    整个应用只使用一个拖动预览窗口，拖动结束时隐藏而不是销毁；预览图片从共享注册表获取。
+    鼠标移动事件只记录位置，每个显示帧（默认16毫秒）最多移动一次预览窗口。
+    放置位置由等级区域的 drop_target() 根据缓存的行边界计算。
+    """
+
+    def __init__(self, app, frame_interval=16):
+        """初始化拖动控制器
+
+        Args:
+            app: 主应用
+            frame_interval: 预览窗口位置的最短更新间隔（毫秒）
+        """
+        self.app = app
+        self.frame_interval = frame_interval
+        self._window = None
+        self._label = None
+        self._img_info = None
+        self._photo = None
+        self._pointer = None
+        self._motion_id = None
+
+    @property
+    def active(self):
+        """是否正在拖动"""
+        return self._img_info is not None
+
+    def _ensure_window(self):
+        """创建（只创建一次）拖动预览窗口"""
+        if self._window is None:
+            self._window = tk.Toplevel(self.app)
+            self._window.withdraw()
+            self._window.overrideredirect(True)  # 无边框窗口
+            self._window.attributes("-topmost", True)  # 置顶
+            self._window.attributes("-alpha", 0.7)  # 半透明
+            self._label = tk.Label(self._window, bd=0)
+            self._label.pack()
+        return self._window
+
+    def start(self, event, img_info):
+        """开始拖动图片"""
+        if self.active:
+            self._end()
+        self._img_info = img_info
+        # 拖动期间暂停缩略图细化，把主线程留给预览窗口
+        self.app.image_processor.registry.pause_refinement()
+        try:
+            # 从共享注册表获取拖动图标（通常已在内存或缩略图缓存中）
+            self._photo = self.app.image_processor.registry.acquire(img_info, DRAG_ICON_SIZE)
+            window = self._ensure_window()
+            self._label.configure(image=self._photo)
+            self._move_to(event.x_root, event.y_root)
+            window.deiconify()
+        except Exception as e:
+            print(f"创建拖动图标错误: {str(e)}")
+            self._end()
+            return
+
+        # 绑定鼠标移动和释放事件
+        self.app.bind("<B1-Motion>", self.on_motion)
+        self.app.bind("<ButtonRelease-1>", self.on_release)
+
+    def _move_to(self, x_root, y_root):
+        """移动预览窗口到鼠标位置"""
+        self._window.geometry(f"+{x_root - ICON_OFFSET}+{y_root - ICON_OFFSET}")
+
+    def on_motion(self, event):
+        """记录鼠标位置，在下一帧更新预览窗口"""
+        self._pointer = (event.x_root, event.y_root)
+        if self._motion_id is None:
+            self._motion_id = self.app.after(self.frame_interval, self._apply_motion)
+
+    def _apply_motion(self):
+        """把预览窗口移动到最后记录的鼠标位置"""
+        self._motion_id = None
+        if self.active and self._pointer is not None:
+            self._move_to(*self._pointer)
+
+    def on_release(self, event):
+        """释放拖动，把图片放到鼠标下的等级和位置"""
+        img_info = self._img_info
+        self._end()
+        if img_info is None:
+            return
+
+        target = self.app.tier_frame.drop_target(event.x_root, event.y_root)
+        if target is None:
+            return
+        tier_index, position = target
+
+        # 在同一等级中向后移动时，位置按移除自身之后的列表计算
+        location = self.app.locations.locate(img_info["id"])
+        if location is not None:
+            container, current = location
+            if container is self.app.tiers[tier_index].get("images") and current < position:
+                position -= 1
+        self.app.move_image_to_tier(img_info, tier_index, position)
+
+    def _end(self):
+        """结束拖动：隐藏预览窗口并释放图标"""
+        if self._motion_id is not None:
+            self.app.after_cancel(self._motion_id)
+            self._motion_id = None
+        if self._window is not None:
+            self._window.withdraw()
+            self._label.configure(image="")
+        if self._photo is not None:
+            self.app.image_processor.registry.release(self._img_info, DRAG_ICON_SIZE)
+            self._photo = None
+        if self._img_info is not None:
+            self.app.image_processor.registry.resume_refinement()
+        self._img_info = None
+        self._pointer = None
+        self.app.unbind("<B1-Motion>")
+        self.app.unbind("<ButtonRelease-1>")
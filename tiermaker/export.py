@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+命令行批量导出 - 不依赖图形界面，使用进程池并行渲染多个排行榜
+
+用法:
+    python -m tiermaker.export config.json [更多配置或目录 ...] [-o 输出目录] [-w 宽度] [--scale 倍数] [-j 进程数]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from tiermaker.thumbnail_cache import ThumbnailCache
+from tiermaker.metadata_index import MetadataIndex
+from tiermaker.export_renderer import TierListRenderer
+from tiermaker.sizes import TILE_EDGES, HIDPI_SCALE, tile_size as tile_size_setting
+
+# 每个工作进程内复用的缩略图缓存（缓存目录 -> ThumbnailCache）
+_caches = {}
+# 每个工作进程内复用的图片元数据索引（图片目录 -> MetadataIndex）
+_indexes = {}
+
+
+def collect_configs(paths):
+    """展开命令行给出的文件和目录
+
+    Args:
+        paths: 配置文件或目录列表，目录中的所有 .json 文件都会被导出
+
+    Returns:
+        list: 配置文件路径
+    """
+    configs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                full_path = os.path.join(path, name)
+                if name.lower().endswith(".json") and os.path.isfile(full_path):
+                    configs.append(full_path)
+        else:
+            configs.append(path)
+    return configs
+
+
+def output_path_for(config_path, output_dir, image_format):
+    """计算配置文件对应的输出图片路径"""
+    stem = os.path.splitext(os.path.basename(config_path))[0]
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(config_path))
+        if stem == "config":
+            # tiermaker_data/config.json 默认导出为 tiermaker_data/tierlist.png
+            stem = "tierlist"
+    return os.path.join(output_dir, f"{stem}.{image_format}")
+
+
+def _thumbnail_loader(images_dir, thumbnails_dir):
+    """创建缩略图加载函数，thumbnails_dir 为 None 时直接从原图缩放"""
+    cache = None
+    if thumbnails_dir is not None:
+        cache = _caches.get(thumbnails_dir)
+        if cache is None:
+            cache = _caches[thumbnails_dir] = ThumbnailCache(thumbnails_dir)
+    # 图片是否存在只查询元数据索引（一次目录扫描），不逐个 stat；索引文件只读不写
+    index = _indexes.get(images_dir)
+    if index is None:
+        index = _indexes[images_dir] = MetadataIndex(
+            os.path.join(os.path.dirname(os.path.abspath(images_dir)), "metadata.json"), images_dir)
+
+    def loader(img_info, size):
+        meta = index.get(img_info["filename"], read_header=False)
+        if meta is None:
+            return None
+        img_path = os.path.join(images_dir, img_info["filename"])
+        if cache is not None:
+            # 索引中记录的是存储使用的内容哈希，与界面生成的缩略图一致
+            return cache.get_thumbnail(img_path, size, content_hash=meta.get("hash"))
+        with Image.open(img_path) as img:
+            return img.convert("RGBA").resize(size, Image.LANCZOS)
+
+    return loader, cache
+
+
+def render_config(job):
+    """渲染一个配置文件（在工作进程中执行）
+
+    Args:
+        job: dict，包含 config、output、width、images_dir、thumbnails_dir、tile_size、scale
+
+    工作进程不写缩略图索引：多个进程同时改写 index.json 时后写入的会覆盖
+    其他进程的记录，新计算的哈希随结果返回，由主进程合并后写入一次。
+
+    Returns:
+        tuple: (配置文件路径, 输出路径, 错误信息或None, 耗时秒数,
+                {缩略图缓存目录: 新计算的哈希记录})
+    """
+    start = time.perf_counter()
+    config_path = job["config"]
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        if not isinstance(config, dict) or not isinstance(config.get("tiers"), list):
+            raise ValueError("不是有效的排行榜配置（缺少 tiers 列表）")
+
+        config_dir = os.path.dirname(os.path.abspath(config_path))
+        images_dir = job["images_dir"] or os.path.join(config_dir, "images")
+        thumbnails_dir = job["thumbnails_dir"]
+        if thumbnails_dir == "":
+            thumbnails_dir = os.path.join(config_dir, "thumbnails")
+
+        loader, cache = _thumbnail_loader(images_dir, thumbnails_dir)
+        tile_size = job.get("tile_size") or tile_size_setting((config.get("settings") or {}).get("tile_size"))
+        img = TierListRenderer(loader, tile_size, job.get("scale", 1)).render(config["tiers"], job["width"])
+        os.makedirs(os.path.dirname(os.path.abspath(job["output"])), exist_ok=True)
+        img.save(job["output"])
+        return config_path, job["output"], None, time.perf_counter() - start, _take_updates()
+    except Exception as e:
+        return config_path, job["output"], f"{type(e).__name__}: {e}", time.perf_counter() - start, _take_updates()
+
+
+def _take_updates():
+    """取出本进程中所有缩略图缓存新计算的哈希记录"""
+    updates = {}
+    for thumbnails_dir, cache in _caches.items():
+        entries = cache.take_updates()
+        if entries:
+            updates[thumbnails_dir] = entries
+    return updates
+
+
+def _flush_updates(updates):
+    """在主进程中合并所有任务新计算的哈希记录，每个缩略图目录只写入一次索引
+
+    Args:
+        updates: {缩略图缓存目录: [哈希记录, ...]}
+    """
+    for thumbnails_dir, entries_list in updates.items():
+        cache = ThumbnailCache(thumbnails_dir)
+        for entries in entries_list:
+            cache.merge(entries)
+        cache.flush()
+
+
+def build_parser():
+    """创建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="python -m tiermaker.export",
+        description="不启动图形界面，批量把排行榜配置导出为图片")
+    parser.add_argument("paths", nargs="+", help="配置文件（config.json 格式）或包含配置文件的目录")
+    parser.add_argument("-o", "--output-dir", help="输出目录，默认与配置文件放在一起")
+    parser.add_argument("-w", "--width", type=int, default=800, help="图片宽度（默认 800）")
+    parser.add_argument("-f", "--format", default="png", help="输出格式扩展名（默认 png）")
+    parser.add_argument("--tile-size", type=int, choices=TILE_EDGES,
+                        help="图片边长，默认使用配置中的图片大小")
+    parser.add_argument("--scale", type=int, default=1,
+                        help=f"缩放倍数，例如 {HIDPI_SCALE} 导出高分辨率图片（默认 1）")
+    parser.add_argument("--images-dir", help="图片目录，默认为配置文件旁的 images 目录")
+    parser.add_argument("--thumbnails-dir", default="",
+                        help="缩略图缓存目录，默认为配置文件旁的 thumbnails 目录")
+    parser.add_argument("--no-cache", action="store_true", help="不使用缩略图缓存，直接从原图缩放")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="并行进程数（默认 CPU 核心数）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="只输出错误")
+    return parser
+
+
+def main(argv=None):
+    """命令行入口
+
+    Returns:
+        int: 退出码，全部成功为0，有失败为1
+    """
+    args = build_parser().parse_args(argv)
+    configs = collect_configs(args.paths)
+    if not configs:
+        print("没有找到需要导出的配置文件", file=sys.stderr)
+        return 1
+
+    jobs = [{
+        "config": config_path,
+        "output": output_path_for(config_path, args.output_dir, args.format),
+        "width": max(args.width, 1),
+        "images_dir": args.images_dir,
+        "thumbnails_dir": None if args.no_cache else args.thumbnails_dir,
+        "tile_size": (args.tile_size, args.tile_size) if args.tile_size else None,
+        "scale": max(args.scale, 1),
+    } for config_path in configs]
+
+    workers = max(1, min(args.jobs, len(jobs)))
+    if workers == 1:
+        results = map(render_config, jobs)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(render_config, jobs)
+
+    failures = 0
+    updates = {}
+    try:
+        for config_path, output, error, seconds, job_updates in results:
+            for thumbnails_dir, entries in job_updates.items():
+                updates.setdefault(thumbnails_dir, []).append(entries)
+            if error is None:
+                if not args.quiet:
+                    print(f"已导出 {config_path} -> {output} ({seconds:.2f}s)")
+            else:
+                failures += 1
+                print(f"导出失败 {config_path}: {error}", file=sys.stderr)
+    finally:
+        if workers > 1:
+            executor.shutdown()
+        _flush_updates(updates)
+
+    if not args.quiet:
+        print(f"完成: {len(jobs) - failures} 个成功, {failures} 个失败")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    # 通过包名重新导入，使工作进程能按 tiermaker.export.render_config 找到任务函数
+    from tiermaker.export import main as _main
+    sys.exit(_main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+导出渲染模块 - 把排行榜绘制为图片（不依赖tkinter）
+"""
+
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+
+@lru_cache(maxsize=None)
+def load_font(size):
+    """加载并缓存字体，无法加载时使用默认字体（新版PIL的默认字体支持指定大小）"""
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except Exception:
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:
+            return ImageFont.load_default()
+
+
+@lru_cache(maxsize=4096)
+def text_width(text, size):
+    """计算并缓存文本宽度"""
+    font = load_font(size)
+    if hasattr(font, 'getbbox'):
+        left, _, right, _ = font.getbbox(text)
+        return right - left
+    if hasattr(font, 'getsize'):
+        return font.getsize(text)[0]
+    return 20
+
+
+@lru_cache(maxsize=256)
+def hex_to_rgb(hex_color):
+    """将十六进制颜色转换为RGB"""
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+
+class TierListRenderer:
+    """排行榜渲染类，负责把等级和图片绘制到一张图片上
+
+    等级标签用矩形整块填充，图片使用预先缩放好的缩略图并按透明通道合成，
+    同一张图片在一次渲染中只加载一次。scale 大于1时（高分辨率导出）
+    所有尺寸按倍数放大，缩略图直接以放大后的尺寸加载。
+    """
+
+    tile_padding = 10  # 等级高度和图片间距比图片多出的部分
+    label_width = 50  # 等级标签宽度（与界面一致）
+    images_gap = 20  # 标签与第一张图片之间的距离
+    font_size = 20
+
+    def __init__(self, thumbnail_loader, tile_size=(70, 70), scale=1):
+        """初始化渲染器
+
+        Args:
+            thumbnail_loader: 缩略图加载函数，接收 (img_info, size)，返回PIL图片或None
+            tile_size: 图片大小（缩放前）
+            scale: 缩放倍数
+        """
+        self.thumbnail_loader = thumbnail_loader
+        self.scale = max(1, int(scale))
+        self.tile_size = (tile_size[0] * self.scale, tile_size[1] * self.scale)
+        self.tier_height = (tile_size[1] + self.tile_padding) * self.scale  # 每个等级的高度
+        self.image_pitch = (tile_size[0] + self.tile_padding) * self.scale  # 相邻图片的间距
+        self.label_width = self.label_width * self.scale
+        self.images_left = self.label_width + self.images_gap * self.scale  # 第一张图片的横坐标
+        self.font_size = self.font_size * self.scale
+
+    def render(self, tiers, width=800):
+        """渲染排行榜
+
+        Args:
+            tiers: 等级列表
+            width: 图片宽度（缩放前）
+
+        Returns:
+            Image: 渲染结果（RGB）
+        """
+        width *= self.scale
+        tier_height = self.tier_height
+        total_height = tier_height * len(tiers)  # 精确计算总高度，不添加额外空间
+        img = Image.new("RGB", (width, max(total_height, 1)), color="white")
+        draw = ImageDraw.Draw(img)
+        font = load_font(self.font_size)
+
+        tiles = {}
+        tile_y_offset = (tier_height - self.tile_size[1]) // 2  # 垂直居中
+        draw_y = 0
+        for tier in tiers:
+            # 绘制等级标签背景
+            img.paste(hex_to_rgb(tier["color"]), (0, draw_y, self.label_width, draw_y + tier_height))
+
+            # 绘制等级名称，使其居中
+            text_x = (self.label_width - text_width(tier["name"], self.font_size)) // 2
+            text_y = draw_y + (tier_height - self.font_size) // 2
+            draw.text((text_x, text_y), tier["name"], fill="black", font=font)
+
+            # 绘制该等级的图片
+            draw_x = self.images_left
+            for img_info in tier.get("images", []):
+                if draw_x >= width:
+                    break  # 超出图片宽度的部分不可见
+                tile = self._load_tile(img_info, tiles)
+                if tile is None:
+                    continue
+                if tile.mode == "RGBA":
+                    img.paste(tile, (draw_x, draw_y + tile_y_offset), tile)
+                else:
+                    img.paste(tile, (draw_x, draw_y + tile_y_offset))
+                draw_x += self.image_pitch
+
+            # 移动到下一个等级位置，不添加额外间距
+            draw_y += tier_height
+
+        return img
+
+    def _load_tile(self, img_info, tiles):
+        """加载一张缩略图，本次渲染中重复出现的图片直接复用"""
+        key = img_info["filename"]
+        if key in tiles:
+            return tiles[key]
+        try:
+            tile = self.thumbnail_loader(img_info, self.tile_size)
+            if tile is not None:
+                if tile.size != self.tile_size:
+                    tile = tile.resize(self.tile_size, Image.LANCZOS)
+                if tile.mode not in ("RGB", "RGBA"):
+                    tile = tile.convert("RGBA")
+        except Exception as e:
+            print(f"导出图片错误: {str(e)}")
+            tile = None
+        tiles[key] = tile
+        return tile
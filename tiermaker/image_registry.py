@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+图片注册表模块 - 在进程内共享 PhotoImage 并按内存预算淘汰
+"""
+
+from collections import OrderedDict
+from PIL import Image, ImageTk
+
+from tiermaker.instrumentation import PERF
+
+# 默认内存预算：64MB（按每像素4字节估算）
+DEFAULT_BUDGET_BYTES = 64 * 1024 * 1024
+
+
+def image_id(img_info):
+    """获取图片在注册表中的标识"""
+    return img_info["filename"]
+
+
+class _Entry:
+    """注册表中的一项"""
+    __slots__ = ("photo", "nbytes", "refs")
+
+    def __init__(self, photo, nbytes):
+        self.photo = photo
+        self.nbytes = nbytes
+        self.refs = 0
+
+
+class ImageRequest:
+    """一次异步图片请求"""
+    __slots__ = ("key", "callback", "done")
+
+    def __init__(self, key, callback):
+        self.key = key
+        self.callback = callback
+        self.done = False
+
+
+class ImageRegistry:
+    """图片注册表类，按 (图片标识, 大小) 共享带引用计数的 PhotoImage
+
+    被控件引用的项不会被淘汰；引用计数归零的项进入空闲队列，
+    当总内存超过预算时按最近最少使用的顺序释放。
+    设置了 async_loader 后，request() 会在后台线程中解码未缓存的图片；
+    同时设置了 refiner 时先用 preview_loader 得到快速缩放的预览，
+    之后由 RefineQueue 在空闲时把同一个 PhotoImage 原地替换为高质量图片。
+    """
+
+    def __init__(self, loader, budget_bytes=DEFAULT_BUDGET_BYTES, preview_loader=None):
+        """初始化图片注册表
+
+        Args:
+            loader: 加载函数，接收 (img_info, size)，返回PIL图片或None
+            budget_bytes: 内存预算（字节）
+            preview_loader: 预览加载函数，接收 (img_info, size)，返回 (PIL图片或None, 是否为最终质量)
+        """
+        self.loader = loader
+        self.preview_loader = preview_loader
+        self.budget_bytes = budget_bytes
+        self.async_loader = None
+        self.refiner = None
+        self._entries = {}
+        self._pending = {}  # 正在后台加载的键 -> {"ticket": 加载请求, "requests": [ImageRequest]}
+        self._placeholders = {}
+        self._idle = OrderedDict()  # 引用计数为0的项，按最近使用排序
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.previews = 0
+
+    def acquire(self, img_info, size):
+        """获取图片并增加引用计数
+
+        Args:
+            img_info: 图片信息字典
+            size: 图片大小
+
+        Returns:
+            PhotoImage: 共享的图片，如果加载失败则返回None
+        """
+        key = (image_id(img_info), tuple(size))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            img = self.loader(img_info, size)
+            if img is None:
+                return None
+            entry = self._create_entry(img)
+            self._entries[key] = entry
+            self.total_bytes += entry.nbytes
+
+        self._add_ref(key, entry)
+        self._evict()
+        return entry.photo
+
+    def request(self, img_info, size, callback):
+        """异步获取图片，完成后在主线程中以 callback(photo) 回调
+
+        已缓存的图片会立即回调。回调得到的图片与 acquire() 一样持有一次引用，
+        photo 为 None 表示加载失败（此时不持有引用）。
+
+        Returns:
+            ImageRequest: 未完成的请求（可传给 cancel()），已立即完成时返回None
+        """
+        key = (image_id(img_info), tuple(size))
+        if key in self._entries or self.async_loader is None:
+            try:
+                photo = self.acquire(img_info, size)
+            except Exception as e:
+                print(f"加载图片错误: {str(e)}")
+                photo = None
+            callback(photo)
+            return None
+
+        req = ImageRequest(key, callback)
+        pending = self._pending.get(key)
+        if pending is None:
+            # 同一张图片的并发请求只解码一次
+            pending = {"requests": [], "ticket": None}
+            self._pending[key] = pending
+            if self.refiner is not None and self.preview_loader is not None:
+                load = lambda: self.preview_loader(img_info, size)
+            else:
+                load = lambda: (self.loader(img_info, size), True)
+            pending["ticket"] = self.async_loader.submit(
+                load, lambda result, error: self._on_loaded(key, img_info, result, error))
+        pending["requests"].append(req)
+        return req
+
+    def cancel(self, req):
+        """取消尚未完成的异步请求
+
+        Returns:
+            bool: 请求是否在完成前被取消
+        """
+        if req is None or req.done:
+            return False
+        req.done = True
+        pending = self._pending.get(req.key)
+        if pending is not None:
+            pending["requests"].remove(req)
+            if not pending["requests"]:
+                # 没有控件再需要这张图片，取消后台解码
+                self.async_loader.cancel(pending["ticket"])
+                del self._pending[req.key]
+        return True
+
+    def placeholder(self, size):
+        """获取指定大小的占位图片"""
+        size = tuple(size)
+        photo = self._placeholders.get(size)
+        if photo is None:
+            photo = ImageTk.PhotoImage(Image.new("RGB", size, "#dddddd"))
+            self._placeholders[size] = photo
+        return photo
+
+    def _on_loaded(self, key, img_info, result, error):
+        """后台解码完成后在主线程中创建 PhotoImage 并回调，预览质量的图片加入细化队列"""
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        if error is not None:
+            print(f"加载图片错误: {str(error)}")
+        img, final = result if result is not None else (None, True)
+
+        entry = self._entries.get(key)
+        if entry is None and img is not None:
+            self.misses += 1
+            entry = self._create_entry(img)
+            self._entries[key] = entry
+            self.total_bytes += entry.nbytes
+            if not final:
+                self.previews += 1
+                self.refiner.add(key, img_info)
+
+        for req in pending["requests"]:
+            req.done = True
+            if entry is not None:
+                self._add_ref(key, entry)
+                req.callback(entry.photo)
+            else:
+                req.callback(None)
+        self._evict()
+
+    @staticmethod
+    def _create_entry(img):
+        """为解码好的图片创建 PhotoImage"""
+        with PERF.measure("photo"):
+            return _Entry(ImageTk.PhotoImage(img), img.width * img.height * 4)
+
+    def refine(self, key, img):
+        """用高质量图片原地替换预览（细化队列在主线程中调用），使用该图片的控件自动更新
+
+        Args:
+            key: 注册表中的键 (图片标识, 大小)
+            img: 高质量的PIL图片
+        """
+        entry = self._entries.get(key)
+        if entry is not None and img.size == key[1]:
+            entry.photo.paste(img)
+
+    def pause_refinement(self):
+        """暂停细化（拖动开始时调用），与 resume_refinement() 成对调用"""
+        if self.refiner is not None:
+            self.refiner.hold()
+
+    def resume_refinement(self):
+        """继续细化（拖动结束时调用）"""
+        if self.refiner is not None:
+            self.refiner.release()
+
+    def defer_refinement(self):
+        """推迟细化到滚动停止之后"""
+        if self.refiner is not None:
+            self.refiner.defer()
+
+    def _add_ref(self, key, entry):
+        """增加一次引用，被引用的项不再处于空闲队列中"""
+        if entry.refs == 0:
+            self._idle.pop(key, None)
+        entry.refs += 1
+
+    def release(self, img_info, size):
+        """释放一次引用，引用计数归零后图片可被淘汰"""
+        key = (image_id(img_info), tuple(size))
+        entry = self._entries.get(key)
+        if entry is None or entry.refs == 0:
+            return
+        entry.refs -= 1
+        if entry.refs == 0:
+            self._idle[key] = entry
+            self._evict()
+
+    def set_budget(self, budget_bytes):
+        """修改内存预算并立即按新预算淘汰"""
+        self.budget_bytes = budget_bytes
+        self._evict()
+
+    def discard(self, img_info):
+        """丢弃某张图片所有尺寸的空闲缓存（例如源文件被替换后）"""
+        ident = image_id(img_info)
+        for key in [k for k in self._idle if k[0] == ident]:
+            self._remove(key)
+
+    def stats(self):
+        """获取注册表统计信息
+
+        Returns:
+            dict: 命中、未命中、淘汰次数以及当前内存占用
+        """
+        return {
+            "entries": len(self._entries),
+            "idle": len(self._idle),
+            "bytes": self.total_bytes,
+            "budget": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "previews": self.previews,
+            "refining": len(self.refiner) if self.refiner is not None else 0,
+        }
+
+    def _evict(self):
+        """超出预算时淘汰最久未使用的空闲项"""
+        while self.total_bytes > self.budget_bytes and self._idle:
+            key = next(iter(self._idle))
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        """从注册表中移除一项"""
+        entry = self._entries.pop(key)
+        self._idle.pop(key, None)
+        self.total_bytes -= entry.nbytes
+        if self.refiner is not None:
+            self.refiner.discard(key)
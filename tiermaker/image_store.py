@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+图片存储模块 - 按内容寻址、自动去重的图片存储
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import threading
+
+from tiermaker.thumbnail_cache import file_hash
+from tiermaker.normalize import WORKING_EXT
+
+# 保留的原图所在的子目录
+ORIGINALS_DIR = "originals"
+
+
+def new_image_id():
+    """生成新的图片ID"""
+    return uuid.uuid4().hex
+
+
+class ImageStore:
+    """按内容寻址的图片存储类
+
+    图片文件以内容哈希命名，并按哈希的前两位分到子目录中
+    （例如 images/9f/9fb9c4....png）。manifest.json 记录图片ID到内容哈希的映射
+    以及每个文件的引用计数，因此添加、去重和查询都只需一次字典查找；
+    同一张图片添加多次只保存一份，最后一个引用被释放时才删除文件。
+    新导入的图片可以经过 ImportNormalizer 转换为尺寸受限的工作副本，
+    原图只在 keep_originals 为真时保留（images/originals/ 下，同样按哈希命名）。
+    设置了元数据索引时，新保存和删除的文件会同步登记到索引中。
+    """
+
+    def __init__(self, images_dir, normalizer=None, keep_originals=False, metadata=None):
+        """初始化图片存储
+
+        Args:
+            images_dir: 图片存储目录
+            normalizer: 导入规范化器，为None时按原样保存图片
+            keep_originals: 规范化时是否另外保留原图
+            metadata: MetadataIndex 元数据索引，为None时不登记
+        """
+        self.images_dir = images_dir
+        self.normalizer = normalizer
+        self.keep_originals = keep_originals
+        self.metadata = metadata
+        self.manifest_file = os.path.join(images_dir, "manifest.json")
+        self._images = {}  # 图片ID -> 内容哈希
+        self._blobs = {}  # 内容哈希 -> {"path": 相对路径, "refs": 引用计数}
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._load_manifest()
+
+    def _load_manifest(self):
+        """加载存储清单"""
+        if not os.path.exists(self.manifest_file):
+            return
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self._images = manifest.get("images", {})
+            self._blobs = manifest.get("blobs", {})
+        except Exception as e:
+            print(f"加载图片清单错误: {str(e)}")
+
+    def flush(self):
+        """把存储清单原子地写回磁盘（仅在有修改时）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            manifest = {"version": 1, "images": dict(self._images),
+                        "blobs": {h: dict(b) for h, b in self._blobs.items()}}
+            self._dirty = False
+        tmp_path = self.manifest_file + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_file)
+        except Exception as e:
+            print(f"保存图片清单错误: {str(e)}")
+
+    @staticmethod
+    def blob_path(content_hash, ext):
+        """计算内容哈希对应的相对存储路径（按哈希前两位分目录）"""
+        return f"{content_hash[:2]}/{content_hash}{ext.lower()}"
+
+    def add(self, file_path, original_name=None):
+        """把图片加入存储，内容相同的图片只保存一份
+
+        Args:
+            file_path: 源文件路径
+            original_name: 原始文件名，默认为源文件名
+
+        Returns:
+            dict: 图片信息 {"id", "filename", "original_name"}
+        """
+        with open(file_path, 'rb') as f:
+            return self.add_stream(f, os.path.splitext(file_path)[1],
+                                   original_name or os.path.basename(file_path))
+
+    def add_stream(self, stream, ext, original_name, image_id=None):
+        """从文件对象读取图片加入存储（例如压缩包中的文件）
+
+        读取时同时计算哈希并写入临时文件，内容已存在时丢弃临时文件。
+        设置了规范化器时，新内容会转换为工作副本后再保存（在锁外进行，
+        不阻塞其他导入线程），需要时把原图另存到 originals 目录。
+        去重按源文件内容的哈希进行，同一张原图只会被规范化一次。
+
+        Args:
+            stream: 可读取字节的文件对象
+            ext: 文件扩展名（例如 ".png"）
+            original_name: 原始文件名
+            image_id: 使用的图片ID（例如从排行榜包中恢复的图片），默认生成新ID
+
+        Returns:
+            dict: 图片信息 {"id", "filename", "original_name"}
+
+        Raises:
+            OSError: 需要规范化的图片无法解码
+        """
+        tmp_path = os.path.join(self.images_dir, f".import.{os.getpid()}.{threading.get_ident()}.tmp")
+        work_path = tmp_path + ".work"
+        digest = hashlib.sha1()
+        try:
+            with open(tmp_path, 'wb') as out:
+                for chunk in iter(lambda: stream.read(1 << 20), b""):
+                    digest.update(chunk)
+                    out.write(chunk)
+            content_hash = digest.hexdigest()
+
+            normalized = False
+            if self.normalizer is not None and not self.has_blob(content_hash):
+                normalized = self.normalizer.normalize(tmp_path, work_path)
+
+            created = False
+            with self._lock:
+                blob = self._blobs.get(content_hash)
+                if blob is None:
+                    created = True
+                    if normalized:
+                        rel_path = self.blob_path(content_hash, WORKING_EXT)
+                        blob = {"path": rel_path, "refs": 0}
+                        self._place(work_path, rel_path)
+                        if self.keep_originals:
+                            blob["original"] = f"{ORIGINALS_DIR}/{self.blob_path(content_hash, ext)}"
+                            self._place(tmp_path, blob["original"])
+                    else:
+                        rel_path = self.blob_path(content_hash, ext)
+                        blob = {"path": rel_path, "refs": 0}
+                        self._place(tmp_path, rel_path)
+                    self._blobs[content_hash] = blob
+
+                if image_id is None:
+                    image_id = new_image_id()
+                self._images[image_id] = content_hash
+                blob["refs"] += 1
+                self._dirty = True
+        finally:
+            for path in (tmp_path, work_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        if created and self.metadata is not None:
+            self.metadata.record(blob["path"], content_hash)
+        return {"id": image_id, "filename": blob["path"], "original_name": original_name}
+
+    def _place(self, src_path, rel_path):
+        """把临时文件移动到存储中的相对路径"""
+        dest_path = os.path.join(self.images_dir, rel_path)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        os.replace(src_path, dest_path)
+
+    def original_path(self, img_info):
+        """获取图片保留的原图路径，没有保留原图时返回工作副本的路径
+
+        Args:
+            img_info: 图片信息字典
+
+        Returns:
+            str: 文件路径，未登记的图片返回None
+        """
+        blob = self._blobs.get(self._images.get(img_info.get("id")))
+        if blob is None:
+            return None
+        return os.path.join(self.images_dir, blob.get("original", blob["path"]))
+
+    def contains(self, image_id):
+        """检查图片ID是否在存储中"""
+        return image_id in self._images
+
+    def has_blob(self, content_hash):
+        """检查某个内容是否已经存储"""
+        return content_hash in self._blobs
+
+    def content_hash(self, img_info):
+        """获取图片的内容哈希，未登记的图片返回None"""
+        return self._images.get(img_info.get("id"))
+
+    def release(self, image_id):
+        """释放图片ID，文件的最后一个引用被释放时删除文件
+
+        Returns:
+            str: 被删除文件的内容哈希，文件仍被引用时返回None
+        """
+        with self._lock:
+            content_hash = self._images.pop(image_id, None)
+            if content_hash is None:
+                return None
+            self._dirty = True
+            blob = self._blobs.get(content_hash)
+            if blob is None:
+                return None
+            blob["refs"] -= 1
+            if blob["refs"] > 0:
+                return None
+            del self._blobs[content_hash]
+        for rel_path in (blob["path"], blob.get("original")):
+            if rel_path is None:
+                continue
+            try:
+                os.remove(os.path.join(self.images_dir, rel_path))
+            except OSError:
+                pass
+        if self.metadata is not None:
+            self.metadata.discard(blob["path"])
+        return content_hash
+
+    def migrate_entries(self, entries):
+        """把配置中的图片登记到存储，并迁移旧的 "N_文件名" 格式文件
+
+        没有ID或ID重复的图片会分配新ID；尚未登记的文件会被移动到按内容寻址的位置
+        （内容重复的旧文件直接删除），图片信息中的 filename 随之更新。
+
+        Args:
+            entries: 图片信息字典列表（会被原地修改）
+
+        Returns:
+            bool: 是否修改了图片信息（需要重新保存配置）
+        """
+        changed = False
+        migrated = {}  # 旧文件名 -> 内容哈希，同一个旧文件可能被多项引用
+        seen = set()
+        with self._lock:
+            for img_info in entries:
+                if "id" not in img_info or img_info["id"] in seen:
+                    # 没有ID或ID重复的图片分配新ID，保证每一项都能被唯一定位
+                    img_info["id"] = new_image_id()
+                    changed = True
+                seen.add(img_info["id"])
+                if img_info["id"] in self._images:
+                    continue
+
+                filename = img_info["filename"]
+                content_hash = migrated.get(filename)
+                if content_hash is None:
+                    src_path = os.path.join(self.images_dir, filename)
+                    if not os.path.isfile(src_path):
+                        continue  # 文件已丢失，保留原样
+                    content_hash = file_hash(src_path)
+                    blob = self._blobs.get(content_hash)
+                    if blob is None:
+                        rel_path = self.blob_path(content_hash, os.path.splitext(filename)[1])
+                        if rel_path != filename:
+                            self._place(src_path, rel_path)
+                        self._blobs[content_hash] = {"path": rel_path, "refs": 0}
+                        if self.metadata is not None:
+                            self.metadata.discard(filename)
+                            self.metadata.record(rel_path, content_hash)
+                    elif blob["path"] != filename:
+                        os.remove(src_path)  # 内容已在存储中，删除重复的旧文件
+                        if self.metadata is not None:
+                            self.metadata.discard(filename)
+                    migrated[filename] = content_hash
+
+                blob = self._blobs[content_hash]
+                self._images[img_info["id"]] = content_hash
+                blob["refs"] += 1
+                self._dirty = True
+                if img_info["filename"] != blob["path"]:
+                    img_info["filename"] = blob["path"]
+                    changed = True
+        return changed
@@ -7,21 +7,54 @@ TierMaker - 排行榜制作工具
 """
 
 import os
-import shutil
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+from PIL import ImageTk
+
+from tiermaker.thumbnail_cache import ThumbnailCache
+from tiermaker.image_store import ImageStore
+from tiermaker.normalize import ImportNormalizer, DEFAULT_MAX_EDGE
+from tiermaker.importer import BulkImporter, sniff_image_type, HEADER_SIZE
+from tiermaker.metadata_index import MetadataIndex
+from tiermaker.image_registry import ImageRegistry, DEFAULT_BUDGET_BYTES
+from tiermaker.async_loader import AsyncImageLoader
+from tiermaker.refine import RefineQueue
+from tiermaker.export_renderer import TierListRenderer, hex_to_rgb
+from tiermaker.tierpack import TierPack, write_tierpack
+from tiermaker.sizes import TILE_SIZE, DRAG_ICON_SIZE
+from tiermaker.instrumentation import PERF
 
 
 class ImageProcessor:
     """图片处理类，负责处理图片的加载、保存和操作"""
     
-    def __init__(self, images_dir):
+    def __init__(self, images_dir, thumbnails_dir=None, cache_budget=DEFAULT_BUDGET_BYTES,
+                 max_edge=DEFAULT_MAX_EDGE, keep_originals=False, metadata_file=None):
         """初始化图片处理器
         
         Args:
             images_dir: 图片存储目录
+            thumbnails_dir: 缩略图缓存目录，默认为图片目录旁的 thumbnails
+            cache_budget: 共享图片注册表的内存预算（字节）
+            max_edge: 导入图片工作副本的最长边（像素），0 表示不缩小
+            keep_originals: 导入时是否另外保留原图
+            metadata_file: 图片元数据索引文件，默认为图片目录旁的 metadata.json
         """
         self.images_dir = images_dir
+        if metadata_file is None:
+            metadata_file = os.path.join(os.path.dirname(images_dir), "metadata.json")
+        # 图片文件的大小、尺寸和格式，界面和导出查询索引而不是逐个 stat 文件
+        self.metadata = MetadataIndex(metadata_file, images_dir)
+        # 导入的图片统一转换为尺寸受限的 RGBA 工作副本
+        self.store = ImageStore(images_dir, ImportNormalizer(max_edge), keep_originals, self.metadata)
+        if thumbnails_dir is None:
+            thumbnails_dir = os.path.join(os.path.dirname(images_dir), "thumbnails")
+        self.thumbnail_cache = ThumbnailCache(thumbnails_dir)
+        # 所有界面共享的 PhotoImage 注册表
+        self.registry = ImageRegistry(self.load_thumbnail, cache_budget, self.load_preview)
+        # 正在提取的排行榜包，提取完成前缩略图直接从包中读取
+        self.pack = None
+        # 界面当前的图片大小（视图 > 图片大小），导入时预先生成该尺寸的缩略图
+        self.tile_size = TILE_SIZE
     
     def is_valid_image(self, file_path):
         """检查文件是否为有效的图片文件
@@ -33,7 +66,14 @@ class ImageProcessor:
             bool: 是否为有效的图片文件
         """
         valid_extensions = (".png", ".jpg", ".jpeg", ".gif", ".bmp")
-        return file_path.lower().endswith(valid_extensions)
+        if not file_path.lower().endswith(valid_extensions):
+            return False
+        # 扩展名正确时再检查文件头，避免把改了扩展名的其他文件加入存储
+        try:
+            with open(file_path, 'rb') as f:
+                return sniff_image_type(f.read(HEADER_SIZE)) is not None
+        except OSError:
+            return False
     
     def add_image_from_path(self, file_path):
         """从文件路径添加图片到仓库
@@ -50,42 +90,149 @@ class ImageProcessor:
                 messagebox.showerror("添加图片错误", f"不支持的图片格式: {file_path}")
                 return None
                 
-            # 生成唯一文件名
-            base_name = os.path.basename(file_path)
-            # 获取当前图片数量作为前缀
-            existing_images = [f for f in os.listdir(self.images_dir) if os.path.isfile(os.path.join(self.images_dir, f))]
-            new_filename = f"{len(existing_images)}_{base_name}"
-            dest_path = os.path.join(self.images_dir, new_filename)
-            
-            # 复制文件到应用目录
-            shutil.copy2(file_path, dest_path)
+            with PERF.measure("import"):
+                # 规范化后保存到按内容寻址的存储中，相同内容的图片只保存一份
+                img_info = self.store.add(file_path)
+                
+                # 导入时预先生成界面所需的缩略图
+                self.make_thumbnails(img_info)
             
             # 返回图片信息
-            return {"filename": new_filename, "original_name": base_name}
+            return img_info
         except Exception as e:
             messagebox.showerror("添加图片错误", f"无法添加图片 {file_path}: {str(e)}")
             return None
     
-    def load_image(self, img_info, size=(70, 70)):
+    def make_thumbnails(self, img_info):
+        """为存储中的图片生成缩略图金字塔和界面所需的尺寸（可在工作线程中调用）
+        
+        源文件只解码一次，各尺寸都从金字塔中缩放。
+        
+        Args:
+            img_info: 图片信息字典
+        """
+        img_path = os.path.join(self.images_dir, img_info["filename"])
+        content_hash = self.thumbnail_cache.ensure_pyramid(img_path, self.store.content_hash(img_info))
+        for size in (self.tile_size, DRAG_ICON_SIZE):
+            self.thumbnail_cache.ensure_thumbnail(img_path, size, content_hash=content_hash)
+    
+    def create_importer(self):
+        """创建批量导入器，导入的图片会规范化后保存到存储并生成缩略图
+        
+        Returns:
+            BulkImporter: 批量导入器
+        """
+        return BulkImporter(self.store, self.make_thumbnails)
+    
+    def load_thumbnail(self, img_info, size=TILE_SIZE):
+        """从缩略图缓存读取调整好大小的图片
+        
+        Args:
+            img_info: 图片信息字典
+            size: 图片大小，默认为 TILE_SIZE
+            
+        Returns:
+            Image: 缩略图，如果源文件不存在则返回None
+        """
+        if self.pack is not None:
+            # 包中没有的尺寸从最接近的预生成尺寸缩放
+            thumb = self.pack.thumbnail(img_info["filename"], size)
+            if thumb is not None:
+                return thumb
+        
+        if not self.metadata.exists(img_info["filename"]):
+            return None
+        img_path = os.path.join(self.images_dir, img_info["filename"])
+        # 存储中的文件以内容哈希命名，无需重新计算哈希
+        return self.thumbnail_cache.get_thumbnail(img_path, size,
+                                                  content_hash=self.store.content_hash(img_info))
+    
+    def load_preview(self, img_info, size=TILE_SIZE):
+        """快速读取缩略图，缓存中没有时返回低成本滤镜生成的预览（可在工作线程中调用）
+        
+        Args:
+            img_info: 图片信息字典
+            size: 图片大小
+            
+        Returns:
+            tuple: (图片或None, 是否为最终质量)
+        """
+        if self.pack is not None:
+            thumb = self.pack.thumbnail(img_info["filename"], size)
+            if thumb is not None:
+                return thumb, True
+            # 包中没有这张图片的缩略图，从存储读取
+            return self.load_thumbnail(img_info, size), True
+        
+        if not self.metadata.exists(img_info["filename"]):
+            return None, True
+        img_path = os.path.join(self.images_dir, img_info["filename"])
+        return self.thumbnail_cache.get_preview(img_path, size, content_hash=self.store.content_hash(img_info))
+    
+    def thumbnail_file(self, img_info, size):
+        """获取缩略图文件路径（必要时生成）"""
+        img_path = os.path.join(self.images_dir, img_info["filename"])
+        return self.thumbnail_cache.ensure_thumbnail(img_path, size,
+                                                     content_hash=self.store.content_hash(img_info))
+    
+    def load_image(self, img_info, size=TILE_SIZE):
         """加载图片并调整大小
         
         Args:
             img_info: 图片信息字典
-            size: 图片大小，默认为(70, 70)
+            size: 图片大小，默认为 TILE_SIZE
             
         Returns:
             PhotoImage: 加载的图片，如果加载失败则返回None
         """
         try:
-            img_path = os.path.join(self.images_dir, img_info["filename"])
-            if os.path.exists(img_path):
-                img = Image.open(img_path)
-                img = img.resize(size, Image.LANCZOS)
+            img = self.load_thumbnail(img_info, size)
+            if img is not None:
                 return ImageTk.PhotoImage(img)
         except Exception as e:
             print(f"加载图片错误: {str(e)}")
         return None
     
+    def start_background_loading(self, root, max_workers=None):
+        """启用后台线程池解码，界面中的图片将异步加载
+        
+        Args:
+            root: Tk根窗口
+            max_workers: 工作线程数
+        """
+        self.registry.async_loader = AsyncImageLoader(root, max_workers)
+        # 以预览质量显示的图片在空闲时细化为 LANCZOS 质量
+        self.registry.refiner = RefineQueue(root, self.registry.async_loader, self.load_thumbnail,
+                                            self.registry.refine)
+    
+    def shutdown(self):
+        """停止后台加载并写回缓存索引"""
+        if self.registry.refiner is not None:
+            self.registry.refiner.cancel()
+            self.registry.refiner = None
+        if self.registry.async_loader is not None:
+            self.registry.async_loader.shutdown()
+            self.registry.async_loader = None
+        self.flush_caches()
+    
+    def release_images(self, img_infos):
+        """释放不再使用的图片，没有其他引用的文件及其缩略图会被删除
+        
+        Args:
+            img_infos: 图片信息字典列表
+        """
+        for img_info in img_infos:
+            content_hash = self.store.release(img_info.get("id"))
+            if content_hash is not None:
+                self.registry.discard(img_info)
+                self.thumbnail_cache.discard(content_hash)
+    
+    def flush_caches(self):
+        """将存储清单、元数据索引和缓存索引写回磁盘"""
+        self.store.flush()
+        self.metadata.flush()
+        self.thumbnail_cache.flush()
+    
     def hex_to_rgb(self, hex_color):
         """将十六进制颜色转换为RGB
         
@@ -95,15 +242,15 @@ class ImageProcessor:
         Returns:
             tuple: RGB颜色元组
         """
-        hex_color = hex_color.lstrip('#')
-        return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+        return hex_to_rgb(hex_color)
     
-    def export_tierlist_as_image(self, tiers, tiers_canvas):
+    def export_tierlist_as_image(self, tiers, tiers_canvas, scale=1):
         """导出排行榜为图片
         
         Args:
             tiers: 等级列表
             tiers_canvas: 等级区域画布
+            scale: 缩放倍数（高分辨率导出时为 HIDPI_SCALE）
         """
         # 获取保存路径
         filetypes = [("PNG图片", "*.png")]
@@ -117,60 +264,82 @@ class ImageProcessor:
             return
         
         try:
-            # 计算实际需要的高度
-            tier_height = 80  # 每个等级的高度
-            total_height = tier_height * len(tiers)  # 精确计算总高度，不添加额外空间
-            
-            # 创建一个新的图像
-            width = tiers_canvas.winfo_width()
-            
-            # 确保有最小尺寸
-            width = max(width, 800)
-            
-            img = Image.new("RGB", (width, total_height), color="white")
-            
-            # 在图像上绘制每个等级
-            draw_y = 0
-            for tier in tiers:
-                # 绘制等级标签背景
-                for y in range(draw_y, draw_y + tier_height):
-                    for x in range(0, 50):  # 减小宽度与界面一致
-                        r, g, b = self.hex_to_rgb(tier["color"])
-                        img.putpixel((x, y), (r, g, b))
-                
-                # 绘制等级名称
-                draw = ImageDraw.Draw(img)
-                try:
-                    # 尝试加载字体
-                    font = ImageFont.truetype("arial.ttf", 20)
-                except:
-                    # 如果无法加载，使用默认字体
-                    font = ImageFont.load_default()
-                
-                # 计算文本位置，使其居中
-                text_width = font.getsize(tier["name"])[0] if hasattr(font, 'getsize') else 20
-                text_x = (50 - text_width) // 2  # 调整为新的宽度
-                text_y = draw_y + (tier_height - 20) // 2  # 垂直居中
-                draw.text((text_x, text_y), tier["name"], fill="black", font=font)
-                
-                # 加载并绘制该等级的图片
-                draw_x = 70
-                for img_info in tier.get("images", []):
-                    try:
-                        img_path = os.path.join(self.images_dir, img_info["filename"])
-                        if os.path.exists(img_path):
-                            tier_img = Image.open(img_path)
-                            tier_img = tier_img.resize((70, 70), Image.LANCZOS)  # 调整为新的图片大小
-                            img.paste(tier_img, (draw_x, draw_y + (tier_height - 70) // 2))  # 垂直居中
-                            draw_x += 80  # 减小间距
-                    except Exception as e:
-                        print(f"导出图片错误: {str(e)}")
-                
-                # 移动到下一个等级位置，不添加额外间距
-                draw_y += tier_height
-            
-            # 保存图像
-            img.save(filename)
+            # 创建一个新的图像，确保有最小尺寸
+            self.save_tierlist_image(tiers, max(tiers_canvas.winfo_width(), 800), filename, scale)
             messagebox.showinfo("导出成功", f"排行榜已成功导出为图片: {filename}")
         except Exception as e:
-            messagebox.showerror("导出错误", f"导出图片时出错: {str(e)}")
\ No newline at end of file
+            messagebox.showerror("导出错误", f"导出图片时出错: {str(e)}")
+    
+    def save_tierlist_image(self, tiers, width, filename, scale=1):
+        """使用缓存的缩略图渲染排行榜并保存（不显示对话框）
+        
+        图片大小与界面当前的图片大小一致；scale 大于1时所有尺寸按倍数放大，
+        图片使用缩略图金字塔中更高的一级缩放，不读取原图。
+        
+        Args:
+            tiers: 等级列表
+            width: 图片宽度（缩放前）
+            filename: 输出文件路径
+            scale: 缩放倍数
+        """
+        with PERF.measure("export"):
+            renderer = TierListRenderer(self.load_thumbnail, self.tile_size, scale)
+            img = renderer.render(tiers, width)
+            img.save(filename)
+        self.flush_caches()
+    
+    def export_tierpack(self, config):
+        """把排行榜（配置、原图和界面尺寸的缩略图）导出为 .tierpack 文件
+        
+        Args:
+            config: 配置字典（tiers 和 repository_images）
+        """
+        filename = filedialog.asksaveasfilename(
+            title="导出排行榜包",
+            defaultextension=".tierpack",
+            filetypes=[("排行榜包", "*.tierpack")]
+        )
+        
+        if not filename:
+            return
+        
+        try:
+            with PERF.measure("export.tierpack"):
+                # 保留了原图时打包原图，打开排行榜包的一方不会只得到缩小的工作副本
+                count = write_tierpack(filename, config, self.images_dir, self.thumbnail_file, self.pack_sizes(),
+                                       self.store.original_path)
+            self.flush_caches()
+            messagebox.showinfo("导出成功", f"已导出 {count} 张图片到排行榜包: {filename}")
+        except Exception as e:
+            messagebox.showerror("导出错误", f"导出排行榜包时出错: {str(e)}")
+    
+    def pack_sizes(self):
+        """排行榜包中预生成的缩略图尺寸：界面当前的图片大小和拖动图标"""
+        return list(dict.fromkeys([tuple(self.tile_size), DRAG_ICON_SIZE]))
+    
+    def open_tierpack(self, path):
+        """打开排行榜包，提取完成前界面直接使用包中的缩略图
+        
+        Args:
+            path: .tierpack 文件路径
+            
+        Returns:
+            TierPack: 打开的排行榜包
+        """
+        self.close_tierpack()
+        self.pack = TierPack(path)
+        return self.pack
+    
+    def extract_tierpack(self, entries, cancel_event=None, progress=None):
+        """把当前排行榜包中的图片加入存储（在后台线程中调用）
+        
+        Returns:
+            tuple: (包中缺少原图的图片信息列表, 存储路径改变的图片 {图片ID: 新文件名})
+        """
+        return self.pack.extract(entries, self.store, self.thumbnail_cache, cancel_event, progress)
+    
+    def close_tierpack(self):
+        """关闭排行榜包，之后缩略图从存储读取"""
+        pack, self.pack = self.pack, None
+        if pack is not None:
+            pack.close()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+批量导入模块 - 从文件、文件夹和压缩包中并行导入图片
+"""
+
+import os
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 文件头魔数 -> (格式, 扩展名)
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "PNG", ".png"),
+    (b"\xff\xd8\xff", "JPEG", ".jpg"),
+    (b"GIF87a", "GIF", ".gif"),
+    (b"GIF89a", "GIF", ".gif"),
+    (b"BM", "BMP", ".bmp"),
+)
+HEADER_SIZE = 8
+
+
+def sniff_image_type(header):
+    """根据文件头判断图片格式
+
+    Args:
+        header: 文件开头的若干字节
+
+    Returns:
+        tuple: (格式, 扩展名)，不是支持的图片时返回None
+    """
+    for signature, image_format, ext in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_format, ext
+    return None
+
+
+class ImportSource:
+    """一个待导入的文件（普通文件或压缩包中的文件）"""
+    __slots__ = ("path", "member")
+
+    def __init__(self, path, member=None):
+        self.path = path
+        self.member = member
+
+    @property
+    def name(self):
+        """原始文件名"""
+        return os.path.basename(self.member if self.member else self.path)
+
+    @property
+    def display_name(self):
+        """用于报告的完整名称"""
+        return f"{self.path}!{self.member}" if self.member else self.path
+
+
+class ImportResult:
+    """一次批量导入的结果"""
+
+    def __init__(self):
+        self.imported = []  # 成功导入的图片信息（按来源顺序）
+        self.skipped = []  # (来源名称, 原因)
+        self.cancelled = False
+
+
+def collect_sources(paths):
+    """展开文件、文件夹（递归）和zip压缩包
+
+    Args:
+        paths: 路径列表
+
+    Returns:
+        list: ImportSource 列表
+    """
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    sources.extend(_expand_file(os.path.join(root, name)))
+        elif os.path.isfile(path):
+            sources.extend(_expand_file(path))
+    return sources
+
+
+def _expand_file(path):
+    """普通文件直接返回，zip压缩包展开为其中的文件"""
+    if path.lower().endswith(".zip") and zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            return [ImportSource(path, info.filename) for info in archive.infolist() if not info.is_dir()]
+    return [ImportSource(path)]
+
+
+class BulkImporter:
+    """批量导入类
+
+    在线程池中按文件头校验、复制到图片存储并生成缩略图，提供进度和取消。
+    导入的图片只在全部完成后一次性返回，由调用方在一个事务中加入模型并保存；
+    被取消时已复制的图片会被回滚。
+    """
+
+    def __init__(self, store, thumbnail_fn=None, max_workers=None):
+        """初始化批量导入器
+
+        Args:
+            store: ImageStore 图片存储
+            thumbnail_fn: 为新图片生成缩略图的函数，接收图片信息
+            max_workers: 工作线程数
+        """
+        self.store = store
+        self.thumbnail_fn = thumbnail_fn
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 1) + 2)
+        self.cancel_event = threading.Event()
+        self.total = 0
+        self.done = 0
+        self._local = threading.local()
+        self._archives = []
+        self._archives_lock = threading.Lock()
+
+    def cancel(self):
+        """请求取消导入"""
+        self.cancel_event.set()
+
+    def run(self, paths, progress=None):
+        """执行导入（阻塞，通常在后台线程中调用）
+
+        Args:
+            paths: 文件、文件夹或zip压缩包路径列表
+            progress: 进度回调，参数为 (已完成数, 总数)，在工作线程中调用
+
+        Returns:
+            ImportResult: 导入结果
+        """
+        result = ImportResult()
+        sources = collect_sources(paths)
+        self.total = len(sources)
+        self.done = 0
+        lock = threading.Lock()
+        outcomes = [None] * len(sources)
+
+        def task(index, source):
+            if self.cancel_event.is_set():
+                return
+            try:
+                outcomes[index] = (self._import_one(source), None)
+            except Exception as e:
+                outcomes[index] = (None, str(e))
+            with lock:
+                self.done += 1
+                done = self.done
+            if progress is not None:
+                progress(done, self.total)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tiermaker-import") as executor:
+            for index, source in enumerate(sources):
+                executor.submit(task, index, source)
+        self._close_archives()
+
+        for source, outcome in zip(sources, outcomes):
+            if outcome is None:
+                continue
+            img_info, error = outcome
+            if img_info is not None:
+                result.imported.append(img_info)
+            else:
+                result.skipped.append((source.display_name, error))
+
+        if self.cancel_event.is_set():
+            # 取消时回滚已经复制的图片，保证导入要么全部生效要么不生效
+            for img_info in result.imported:
+                self.store.release(img_info["id"])
+            result.imported = []
+            result.cancelled = True
+        self.store.flush()
+        return result
+
+    def _import_one(self, source):
+        """导入一个文件
+
+        Returns:
+            dict: 图片信息
+
+        Raises:
+            ValueError: 文件不是支持的图片格式
+        """
+        with self._open(source) as stream:
+            header = stream.read(HEADER_SIZE)
+            detected = sniff_image_type(header)
+            if detected is None:
+                raise ValueError("不是支持的图片格式")
+            stream = _PrefixedStream(header, stream)
+            img_info = self.store.add_stream(stream, detected[1], source.name)
+        if self.thumbnail_fn is not None:
+            try:
+                self.thumbnail_fn(img_info)
+            except Exception:
+                # 文件头正确但无法解码，撤销这张图片
+                self.store.release(img_info["id"])
+                raise
+        return img_info
+
+    def _open(self, source):
+        """打开来源文件，压缩包在每个线程中只打开一次"""
+        if source.member is None:
+            return open(source.path, 'rb')
+        archives = getattr(self._local, "archives", None)
+        if archives is None:
+            archives = self._local.archives = {}
+        archive = archives.get(source.path)
+        if archive is None:
+            archive = archives[source.path] = zipfile.ZipFile(source.path)
+            with self._archives_lock:
+                self._archives.append(archive)
+        return archive.open(source.member)
+
+    def _close_archives(self):
+        """关闭导入过程中打开的压缩包"""
+        with self._archives_lock:
+            archives, self._archives = self._archives, []
+        for archive in archives:
+            archive.close()
+
+
+class _PrefixedStream:
+    """把已读取的文件头和剩余内容拼接为一个可读取的流"""
+
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size=-1):
+        if self._prefix:
+            data = self._prefix
+            self._prefix = b""
+            if size is None or size < 0:
+                return data + self._stream.read()
+            if len(data) < size:
+                data += self._stream.read(size - len(data))
+            return data
+        return self._stream.read(size)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+性能记录模块 - 可选地记录各操作的耗时、次数，并在指定操作周围采集 cProfile 或 tracemalloc 数据
+"""
+
+import io
+import os
+import sys
+import time
+import json
+import threading
+from collections import deque
+
+# 启用性能记录的环境变量（也可以使用命令行参数 --perf）
+ENV_ENABLE = "TIERMAKER_PERF"
+ENV_PROFILE_OP = "TIERMAKER_PERF_PROFILE"  # 要采集的操作名
+ENV_PROFILER = "TIERMAKER_PERF_PROFILER"  # cprofile 或 tracemalloc
+ENV_REPORT = "TIERMAKER_PERF_REPORT"  # 退出时写入报告的文件路径
+
+PROFILERS = ("cprofile", "tracemalloc")
+
+# 每个操作保留最近多少次耗时用于计算百分位数
+DEFAULT_WINDOW = 1000
+# 每次启用（或重置）后最多采集的次数
+MAX_CAPTURES = 5
+# 采集结果中显示的条目数
+CAPTURE_TOP = 25
+
+
+class _NullSpan:
+    """未启用时使用的空计时区间"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """一次操作的计时区间，需要时在区间内采集 cProfile 或 tracemalloc 数据"""
+
+    def __init__(self, recorder, op):
+        self.recorder = recorder
+        self.op = op
+        self.capture = None
+
+    def __enter__(self):
+        self.capture = self.recorder._start_capture(self.op)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.capture is not None:
+            self.recorder._finish_capture(self.op, self.capture, elapsed)
+        self.recorder.record(self.op, elapsed)
+        return False
+
+
+class OpStats:
+    """一个操作的统计：总次数、总耗时和最近若干次耗时"""
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        """记录一次耗时（秒）"""
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self):
+        """汇总为毫秒统计，百分位数按最近的耗时计算"""
+        recent = sorted(self.recent)
+
+        def percentile(p):
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))] * 1000
+
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(percentile(0.50), 3),
+            "p90_ms": round(percentile(0.90), 3),
+            "p99_ms": round(percentile(0.99), 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class Instrumentation:
+    """性能记录类
+
+    默认不启用，此时 measure() 返回共享的空区间，开销只有一次属性判断。
+    启用后按操作名记录耗时（任意线程中都可以调用），并可以在指定操作的前几次
+    出现时采集 cProfile（只包括执行该操作的线程）或 tracemalloc 的数据。
+    cProfile、pstats 和 tracemalloc 只在需要时导入，不影响启动时间。
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.enabled = False
+        self.window = window
+        self.profile_op = None
+        self.profiler = "cprofile"
+        self.report_path = None
+        self.captures = []  # (操作名, 耗时毫秒, 文本)
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._capturing = False
+        self._started = time.time()
+
+    def enable(self, profile_op=None, profiler="cprofile", report_path=None):
+        """启用性能记录
+
+        Args:
+            profile_op: 需要采集的操作名，None 表示不采集
+            profiler: 采集方式，cprofile 或 tracemalloc
+            report_path: 退出时写入报告的文件路径，None 时打印到标准输出
+        """
+        if profiler not in PROFILERS:
+            raise ValueError(f"未知的采集方式: {profiler}")
+        self.enabled = True
+        self.profile_op = profile_op
+        self.profiler = profiler
+        self.report_path = report_path
+        self._started = time.time()
+
+    def enable_from_env(self):
+        """根据环境变量启用性能记录
+
+        Returns:
+            bool: 是否已启用
+        """
+        if os.environ.get(ENV_ENABLE, "") not in ("", "0"):
+            self.enable(os.environ.get(ENV_PROFILE_OP) or None,
+                        os.environ.get(ENV_PROFILER) or "cprofile",
+                        os.environ.get(ENV_REPORT) or None)
+        return self.enabled
+
+    def measure(self, op):
+        """记录一次操作的耗时
+
+        用法:
+            with PERF.measure("save"):
+                ...
+
+        Args:
+            op: 操作名
+
+        Returns:
+            上下文管理器
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, op)
+
+    def record(self, op, seconds):
+        """直接记录一次操作的耗时（秒）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stats.get(op)
+            if stats is None:
+                stats = self._stats[op] = OpStats(self.window)
+            stats.add(seconds)
+
+    def reset(self):
+        """清空已记录的统计和采集结果"""
+        with self._lock:
+            self._stats = {}
+            self.captures.clear()
+        self._started = time.time()
+
+    def summary(self):
+        """获取所有操作的统计
+
+        Returns:
+            dict: 操作名 -> 毫秒统计，按总耗时从大到小排列
+        """
+        with self._lock:
+            items = [(op, stats.summary()) for op, stats in self._stats.items()]
+        items.sort(key=lambda item: item[1]["total_ms"], reverse=True)
+        return dict(items)
+
+    def memory(self):
+        """获取 tracemalloc 统计的当前和峰值内存（字节），未跟踪时返回None"""
+        if "tracemalloc" not in sys.modules:
+            return None
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        return {"current": current, "peak": peak}
+
+    def _start_capture(self, op):
+        """指定的操作开始时开始采集（同一时刻只采集一个操作）"""
+        if op != self.profile_op:
+            return None
+        with self._lock:
+            if self._capturing or len(self.captures) >= MAX_CAPTURES:
+                return None
+            self._capturing = True
+        if self.profiler == "tracemalloc":
+            import tracemalloc
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            return ("tracemalloc", tracemalloc.take_snapshot(), started_tracing)
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+        return ("cprofile", profile, False)
+
+    def _finish_capture(self, op, capture, elapsed):
+        """指定的操作结束时保存采集结果"""
+        kind, data, started_tracing = capture
+        try:
+            if kind == "cprofile":
+                data.disable()
+                import pstats
+                out = io.StringIO()
+                pstats.Stats(data, stream=out).sort_stats("cumulative").print_stats(CAPTURE_TOP)
+                text = out.getvalue()
+            else:
+                import tracemalloc
+                snapshot = tracemalloc.take_snapshot()
+                lines = [str(stat) for stat in snapshot.compare_to(data, "lineno")[:CAPTURE_TOP]]
+                current, peak = tracemalloc.get_traced_memory()
+                lines.append(f"当前 {current / 1024:.1f} KiB, 峰值 {peak / 1024:.1f} KiB")
+                text = "\n".join(lines)
+                if started_tracing:
+                    tracemalloc.stop()
+            with self._lock:
+                self.captures.append((op, round(elapsed * 1000, 3), text))
+        except Exception as e:
+            print(f"性能采集错误: {str(e)}")
+        finally:
+            with self._lock:
+                self._capturing = False
+
+    def report(self):
+        """生成报告字典"""
+        return {
+            "duration_s": round(time.time() - self._started, 3),
+            "operations": self.summary(),
+            "memory": self.memory(),
+            "captures": [{"op": op, "elapsed_ms": elapsed, "text": text} for op, elapsed, text in self.captures],
+        }
+
+    def report_text(self):
+        """生成文本报告（操作统计表和采集结果）"""
+        report = self.report()
+        lines = [f"性能记录（{report['duration_s']:.1f} 秒）",
+                 f"{'操作':<22}{'次数':>8}{'总计ms':>12}{'平均':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'最大':>10}"]
+        for op, s in report["operations"].items():
+            lines.append(f"{op:<22}{s['count']:>8}{s['total_ms']:>12.1f}{s['mean_ms']:>10.2f}"
+                         f"{s['p50_ms']:>10.2f}{s['p90_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+        if report["memory"]:
+            lines.append(f"tracemalloc: 当前 {report['memory']['current'] / 1024:.1f} KiB, "
+                         f"峰值 {report['memory']['peak'] / 1024:.1f} KiB")
+        for capture in report["captures"]:
+            lines.append("")
+            lines.append(f"== {capture['op']} ({capture['elapsed_ms']:.1f} ms) ==")
+            lines.append(capture["text"])
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        """输出报告：写入文件（.json 后缀时为JSON），没有文件路径时打印
+
+        Args:
+            path: 报告文件路径，默认为启用时指定的 report_path
+        """
+        if not self.enabled:
+            return
+        path = path or self.report_path
+        try:
+            if path is None:
+                sys.stdout.write(self.report_text() + "\n")
+            elif path.endswith(".json"):
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(self.report(), f, ensure_ascii=False, indent=2)
+            else:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(self.report_text() + "\n")
+        except Exception as e:
+            print(f"写入性能报告错误: {str(e)}")
+
+
+# 进程内共享的性能记录器
+PERF = Instrumentation()
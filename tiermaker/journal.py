@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+修改日志模块 - 以追加方式记录每次修改，启动时在快照上重放
+"""
+
+import os
+import json
+
+from tiermaker.location_index import LocationIndex
+
+
+class ChangeJournal:
+    """追加写入的修改日志类
+
+    每条记录是一行JSON，带有递增的序号 seq。保存快照时当前日志文件被改名为
+    "日志文件名.<seq>" 的分段，快照写入成功后删除序号不大于快照 journal_seq 的分段，
+    因此任何时刻崩溃都能通过"快照 + 剩余分段 + 当前日志"恢复到最后一条记录。
+    """
+
+    def __init__(self, path, compact_threshold=1000):
+        """初始化修改日志
+
+        Args:
+            path: 日志文件路径
+            compact_threshold: 自上次快照以来记录数超过该值时需要压缩
+        """
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self.seq = 0  # 最后一条记录的序号
+        self.count = 0  # 自上次快照以来的记录数
+        self.corrupt = False  # 读取时遇到损坏的记录，需要保存快照以丢弃损坏的日志
+        self._file = None
+
+    @property
+    def needs_compaction(self):
+        """是否应该保存快照以压缩日志"""
+        return self.count >= self.compact_threshold
+
+    def segment_paths(self):
+        """获取已轮转的日志分段
+
+        Returns:
+            list: (分段序号, 路径)，按序号排列
+        """
+        directory, name = os.path.split(self.path)
+        segments = []
+        try:
+            entries = os.listdir(directory or ".")
+        except OSError:
+            return segments
+        for entry in entries:
+            if entry.startswith(name + "."):
+                suffix = entry[len(name) + 1:]
+                if suffix.isdigit():
+                    segments.append((int(suffix), os.path.join(directory, entry)))
+        segments.sort()
+        return segments
+
+    def read_records(self, after_seq=0):
+        """读取序号大于 after_seq 的记录（按顺序）
+
+        最后一行不完整（写入时崩溃）时忽略该行；遇到损坏的记录时不再返回之后的记录，
+        因为它们可能依赖损坏的记录，并设置 corrupt。之后的行仍然会被扫描，
+        seq 取整个日志中能解析的最大序号，新记录不会与被忽略的记录重复。
+
+        Args:
+            after_seq: 快照中已包含的最后一条记录序号
+
+        Returns:
+            list: 记录字典列表
+        """
+        records = []
+        self.corrupt = False
+        self.seq = max(self.seq, after_seq)
+        paths = [path for _, path in self.segment_paths()]
+        if os.path.exists(self.path):
+            paths.append(self.path)
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    lines = f.read().split("\n")
+            except Exception as e:
+                print(f"读取修改日志错误: {str(e)}")
+                self.corrupt = True
+                continue
+            # 文件以换行结尾时最后一项为空；否则最后一项是写入时被中断的不完整行
+            lines.pop()
+            for line in lines:
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    seq = int(record["seq"])
+                except Exception:
+                    if not self.corrupt:
+                        print(f"修改日志 {path} 中有损坏的记录，之后的记录被忽略")
+                    self.corrupt = True
+                    continue
+                if self.corrupt:
+                    self.seq = max(self.seq, seq)
+                elif seq > after_seq:
+                    records.append(record)
+                    self.seq = max(self.seq, seq)
+        self.count = len(records)
+        return records
+
+    def append(self, record):
+        """追加一条记录（写入操作系统缓冲区，不等待落盘）
+
+        Args:
+            record: 记录字典，会被加上 seq 字段
+
+        Returns:
+            int: 记录的序号
+        """
+        if self._file is None:
+            self._open()
+        self.seq += 1
+        record["seq"] = self.seq
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self.count += 1
+        return self.seq
+
+    def _open(self):
+        """打开当前日志文件，截掉上次崩溃时留下的不完整行"""
+        if os.path.exists(self.path):
+            with open(self.path, 'rb+') as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def rotate(self):
+        """为保存快照轮转日志（在取快照的同一时刻于主线程中调用）
+
+        Returns:
+            int: 快照包含的最后一条记录序号（写入快照的 journal_seq）
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.{self.seq}")
+        self.count = 0
+        # 快照写入成功后损坏的分段随之删除
+        self.corrupt = False
+        return self.seq
+
+    def discard_segments(self, seq):
+        """删除已经包含在快照中的分段（快照写入成功后调用，可在后台线程中执行）
+
+        Args:
+            seq: 快照的 journal_seq
+        """
+        for segment_seq, path in self.segment_paths():
+            if segment_seq > seq:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def close(self):
+        """关闭当前日志文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def apply_record(record, tiers, repository_images, locations):
+    """把一条记录应用到模型上
+
+    Args:
+        record: 记录字典
+        tiers: 等级列表（会被原地修改）
+        repository_images: 仓库图片列表
+        locations: 与模型对应的 LocationIndex
+    """
+    op = record["op"]
+    if op == "move":
+        target = _container(record.get("tier"), tiers, repository_images)
+        locations.move(record["id"], target, record.get("pos"))
+    elif op == "add":
+        target = _container(record.get("tier"), tiers, repository_images)
+        position = record.get("pos")
+        for offset, img_info in enumerate(record["images"]):
+            locations.insert(img_info, target, None if position is None else position + offset)
+    elif op == "tiers":
+        # 等级编辑：from 为原等级的索引（None 表示新等级），未被引用的原等级视为删除
+        old_tiers = list(tiers)
+        used = set()
+        new_tiers = []
+        for spec in record["tiers"]:
+            source = spec.get("from")
+            if source is not None and 0 <= source < len(old_tiers) and source not in used:
+                tier = old_tiers[source]
+                used.add(source)
+            else:
+                tier = {"images": []}
+            tier["name"] = spec["name"]
+            tier["color"] = spec["color"]
+            new_tiers.append(tier)
+        for index, tier in enumerate(old_tiers):
+            if index not in used:
+                repository_images.extend(tier.get("images", []))
+        tiers[:] = new_tiers
+        locations.rebuild(repository_images, tiers)
+    elif op == "clear":
+        for tier in tiers:
+            tier["images"] = []
+        locations.rebuild(repository_images, tiers)
+    else:
+        raise ValueError(f"未知的修改记录类型: {op}")
+
+
+def _container(tier_index, tiers, repository_images):
+    """根据记录中的等级索引获取容器，None 表示仓库"""
+    if tier_index is None:
+        return repository_images
+    return tiers[tier_index].setdefault("images", [])
+
+
+def replay(config, records):
+    """在配置快照上重放修改记录
+
+    Args:
+        config: 配置字典（会被原地修改）
+        records: 记录列表
+
+    Returns:
+        int: 成功应用的记录数
+    """
+    tiers = config.setdefault("tiers", [])
+    repository_images = config.setdefault("repository_images", [])
+    locations = LocationIndex()
+    locations.rebuild(repository_images, tiers)
+    applied = 0
+    for record in records:
+        try:
+            apply_record(record, tiers, repository_images, locations)
+        except Exception as e:
+            print(f"重放修改记录 {record.get('seq')} 错误: {str(e)}")
+            break
+        applied += 1
+    return applied
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+位置索引模块 - 维护图片ID到所在容器和位置的映射
+"""
+
+
+class LocationIndex:
+    """图片位置索引类
+
+    容器是存放图片信息的列表（仓库或某个等级的 images）。索引记录
+    图片ID -> [容器, 位置]，查找、移除和移动都不需要遍历其他容器。
+    从容器中间移除或插入图片后，同一容器中后面图片记录的位置会过期；
+    查找时先校验记录的位置，过期时只重建该容器的位置（一次重建修正所有过期项）。
+    """
+
+    def __init__(self):
+        """初始化位置索引"""
+        self._locations = {}  # 图片ID -> [容器, 位置]
+
+    def rebuild(self, repository_images, tiers):
+        """根据当前模型重建整个索引（等级被增删或整体替换后调用）
+
+        Args:
+            repository_images: 仓库图片列表
+            tiers: 等级列表
+        """
+        self._locations = {}
+        self._index_container(repository_images)
+        for tier in tiers:
+            self._index_container(tier.setdefault("images", []))
+
+    def __contains__(self, image_id):
+        return image_id in self._locations
+
+    def __len__(self):
+        return len(self._locations)
+
+    def locate(self, image_id):
+        """查找图片所在的容器和位置
+
+        Returns:
+            tuple: (容器, 位置)，图片不在索引中时返回None
+        """
+        location = self._locations.get(image_id)
+        if location is None:
+            return None
+        container, position = location
+        if position >= len(container) or container[position]["id"] != image_id:
+            # 记录的位置已过期，重建该容器的位置
+            self._index_container(container)
+            container, position = self._locations[image_id]
+        return container, position
+
+    def get(self, image_id):
+        """根据ID获取图片信息，不存在时返回None"""
+        location = self.locate(image_id)
+        if location is None:
+            return None
+        container, position = location
+        return container[position]
+
+    def insert(self, img_info, container, position=None):
+        """把图片插入容器并登记位置
+
+        Args:
+            img_info: 图片信息字典（必须有 id）
+            container: 目标容器
+            position: 插入位置，为None时追加到末尾
+        """
+        if position is None or position >= len(container):
+            position = len(container)
+            container.append(img_info)
+        else:
+            position = max(0, position)
+            container.insert(position, img_info)
+        self._locations[img_info["id"]] = [container, position]
+
+    def remove(self, image_id):
+        """把图片从所在容器中移除
+
+        Returns:
+            dict: 被移除的图片信息，图片不在索引中时返回None
+        """
+        location = self.locate(image_id)
+        if location is None:
+            return None
+        container, position = location
+        del self._locations[image_id]
+        return container.pop(position)
+
+    def move(self, image_id, container, position=None):
+        """把图片移动到另一个容器（或同一容器的另一个位置）
+
+        Returns:
+            dict: 被移动的图片信息，图片不在索引中时返回None
+        """
+        img_info = self.remove(image_id)
+        if img_info is not None:
+            self.insert(img_info, container, position)
+        return img_info
+
+    def _index_container(self, container):
+        """登记一个容器中所有图片的位置"""
+        for position, img_info in enumerate(container):
+            self._locations[img_info["id"]] = [container, position]
@@ -6,31 +6,87 @@ TierMaker - 排行榜制作工具
 主模块 - 包含主应用类和程序入口点
 """
 
+# 最先导入启动计时模块，启动耗时从这里开始计算
+from tiermaker.startup import StartupTimer
+
+import os
+import argparse
+import threading
 import tkinter as tk
 from tkinter import messagebox
-import os
 
-# 导入自定义模块
+# 导入自定义模块（PIL、图片处理模块和tkinterdnd2在窗口显示之后才加载）
 from tiermaker.config_manager import ConfigManager
-from tiermaker.ui_components import TierFrame, RepositoryFrame
+from tiermaker.ui_components import (TierFrame, RepositoryFrame, ImportProgressDialog, TierListsDialog,
+                                     PerformanceDialog)
+from tiermaker.canvas_tiers import CanvasTierFrame
 from tiermaker.tier_manager import TierManagerDialog
-from tiermaker.image_utils import ImageProcessor
+from tiermaker.drag import DragController
+from tiermaker.location_index import LocationIndex
+from tiermaker.search_index import SearchIndex
+from tiermaker.autosave import AutoSaver
+from tiermaker.scheduler import RefreshScheduler
+from tiermaker.instrumentation import PERF, PROFILERS
+from tiermaker.sizes import TILE_EDGES, TILE_EDGE_LABELS, HIDPI_SCALE, tile_size
+
+# 配置文件格式版本：2 起每张图片都带有唯一的 id
+CONFIG_VERSION = 2
+
+# 新排行榜的默认等级
+DEFAULT_TIERS = [
+    {"name": "S", "color": "#FF7F7F"},
+    {"name": "A", "color": "#FFBF7F"},
+    {"name": "B", "color": "#FFFF7F"},
+    {"name": "C", "color": "#7FFF7F"},
+    {"name": "D", "color": "#7FBFFF"},
+    {"name": "E", "color": "#7F7FFF"},
+    {"name": "F", "color": "#FF7FFF"}
+]
+
+# 首帧显示之后每批为每个等级创建的图片控件数
+STREAM_CHUNK = 100
 
-# 尝试导入tkinterdnd2库，如果不可用则使用基本的tk功能
-try:
-    from tkinterdnd2 import TkinterDnD, DND_FILES
-    TkinterDnDClass = TkinterDnD.Tk
-    TKDND_AVAILABLE = True
-except ImportError:
-    messagebox.showwarning("功能受限", "未安装tkinterdnd2库，拖放功能将不可用。\n请使用pip install tkinterdnd2安装。")
-    DND_FILES = "DND_Files"  # 仅用作占位符
-    TkinterDnDClass = tk.Tk
-    TKDND_AVAILABLE = False
+# 窗口没有收到映射事件（例如启动时最小化）时，最多等待这么久再加载图片（毫秒）
+FIRST_FRAME_TIMEOUT = 500
 
 
-class TierMaker(TkinterDnDClass):
-    """TierMaker主应用类"""
-    def __init__(self):
+def load_dnd(root):
+    """加载tkinterdnd2拖放支持
+    
+    Args:
+        root: 已创建的 Tk 根窗口
+    
+    Returns:
+        str: 文件拖放类型，拖放不可用时返回None
+    """
+    try:
+        from tkinterdnd2 import TkinterDnD, DND_FILES
+    except ImportError:
+        messagebox.showwarning("功能受限", "未安装tkinterdnd2库，拖放功能将不可用。\n请使用pip install tkinterdnd2安装。")
+        return None
+    try:
+        # 与 TkinterDnD.Tk 的初始化相同：在已有的解释器中加载 tkdnd 扩展
+        root.TkdndVersion = TkinterDnD._require(root)
+    except (RuntimeError, tk.TclError) as e:
+        print(f"加载拖放支持错误: {str(e)}")
+        return None
+    return DND_FILES
+
+
+class TierMaker(tk.Tk):
+    """TierMaker主应用类
+    
+    启动分为两个阶段：先读取配置并创建只有等级行的空界面，窗口显示之后
+    再加载图片处理模块（PIL）和拖放支持，并分批创建图片控件。
+    """
+    def __init__(self, app_dir=None):
+        """初始化应用
+        
+        Args:
+            app_dir: 数据存储目录，默认为程序目录下的 tiermaker_data
+        """
+        self.startup = StartupTimer()
+        self.startup.mark("imports")
         super().__init__()
         self.title("TierMaker - 排行榜制作工具")
         self.geometry("1200x800")
@@ -38,55 +94,250 @@ class TierMaker(TkinterDnDClass):
         
         # 设置应用图标
         self.iconbitmap(default="")
+        self.startup.mark("window")
         
         # 初始化配置管理器
-        self.config_manager = ConfigManager()
-        
-        # 初始化图片处理器
-        self.image_processor = ImageProcessor(self.config_manager.images_dir)
+        self.config_manager = ConfigManager(app_dir)
+        # 修改后延迟保存：连续的修改合并为一次，序列化和写盘在后台线程中进行
+        self.autosaver = AutoSaver(self, self.config_snapshot, self.config_manager.write_config)
+        
+        # 修改只标记视图需要更新，事件循环空闲时每个视图刷新一次、配置保存只标记一次
+        self.scheduler = RefreshScheduler(self)
+        self.scheduler.register("tiers", self.refresh_tiers_view)
+        self.scheduler.register("repository", self.refresh_repository_view)
+        self.scheduler.register("config", self.autosaver.mark_dirty)
+        
+        # 图片处理器和拖放支持在首帧显示之后创建
+        self.image_processor = None
+        # 图片处理器创建之前触发的菜单操作，启动完成后依次执行
+        self._ready_actions = []
+        self.tkdnd_available = False
+        self.dnd_files = "DND_Files"  # 仅用作占位符
         
         # 初始化数据
         self.tiers = []
         self.repository_images = []
-        self.load_config()
+        self.settings = {}
+        self.config_version = CONFIG_VERSION
+        self._created = self.load_config()
+        # 等级行和仓库中的图片大小（视图 > 图片大小）
+        self.tile_size = tile_size(self.settings.get("tile_size"))
+        
+        # 图片ID -> (容器, 位置) 索引，移动和查找不需要遍历列表（补全图片ID之后建立）
+        self.locations = LocationIndex()
+        # 按文件名和标签搜索图片的倒排索引（包含仓库和所有等级中的图片）
+        self.search_index = SearchIndex()
+        
+        # 日志模式（设置 journal 或环境变量 TIERMAKER_JOURNAL=1）：每次修改只追加一条记录
+        self.journal_enabled = bool(self.settings.get("journal")) or os.environ.get("TIERMAKER_JOURNAL") == "1"
+        journal = self.config_manager.journal
+        if journal.corrupt or (journal.count and (not self.journal_enabled or journal.needs_compaction)):
+            # 启动时重放了日志：非日志模式或日志过长时保存快照；
+            # 日志损坏时必须保存快照，否则新记录追加在损坏的记录之后，下次启动时会被忽略
+            self.save_config()
         
-        # 创建UI
+        self.startup.mark("config")
+        
+        # 创建UI（等级行先不显示图片，仓库为空）
         self.create_menu()
         self.create_main_layout()
         
         # 绑定事件
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        # 初始化拖放数据
-        self._drag_data = None
-        self._drag_icon = None
+        # 拖动控制器（复用一个预览窗口，按缓存的行边界计算放置位置）
+        self.drag = DragController(self)
+        
+        # 正在后台提取的排行榜包
+        self._pack_thread = None
+        self._pack_result = None
+        self._pack_list = None  # 排行榜包导入到的排行榜ID（SQLite模式）
+        self._pack_released = []  # 被排行榜包替换的图片，包导入完成并保存后再释放
+        self.startup.mark("layout")
+        
+        # 窗口第一次显示后再加载图片
+        self._stream_id = None
+        self._first_frame_pending = True
+        self.bind("<Map>", self.on_first_map)
+        self.after(FIRST_FRAME_TIMEOUT, self.on_first_frame)
+    
+    def on_first_map(self, event):
+        """主窗口被映射（第一次显示）"""
+        if event.widget is self:
+            # 处理完等待中的绘制后再开始加载图片
+            self.update_idletasks()
+            self.on_first_frame()
+    
+    def on_first_frame(self):
+        """首帧已显示：记录首帧时间，在下一次事件循环中加载图片"""
+        if not self._first_frame_pending:
+            return
+        self._first_frame_pending = False
+        self.unbind("<Map>")
+        self.startup.mark("first_paint")
+        self.after(0, self.finish_startup)
+    
+    def finish_startup(self):
+        """启动的第二阶段：创建图片处理器、加载拖放支持，然后分批显示图片"""
+        from tiermaker.image_utils import ImageProcessor
+        from tiermaker.normalize import DEFAULT_MAX_EDGE
+        
+        # 初始化图片处理器（导入图片的最长边和是否保留原图可以在设置中修改）
+        self.image_processor = ImageProcessor(self.config_manager.images_dir,
+                                              self.config_manager.thumbnails_dir,
+                                              max_edge=self.settings.get("import_max_edge", DEFAULT_MAX_EDGE),
+                                              keep_originals=bool(self.settings.get("keep_originals")),
+                                              metadata_file=self.config_manager.metadata_file)
+        self.image_processor.tile_size = self.tile_size
+        # 图片在后台线程中解码，避免加载大量图片时界面卡住
+        self.image_processor.start_background_loading(self)
+        
+        # 把配置中的图片登记到按内容寻址的存储（迁移旧的 "N_文件名" 文件并补全图片ID）
+        # 新建的排行榜也保存一次快照，之后的日志记录都以它为基础
+        if (self.image_processor.store.migrate_entries(self.all_images()) or self.config_version < CONFIG_VERSION
+                or self._created):
+            self.save_config()
+        self.image_processor.flush_caches()
+        self.locations.rebuild(self.repository_images, self.tiers)
+        self.search_index.rebuild(self.all_images())
+        
+        # 应用图片注册表的内存预算设置
+        cache_mb = self.settings.get("image_cache_mb")
+        if cache_mb:
+            self.image_processor.registry.set_budget(int(cache_mb) * 1024 * 1024)
+        self.startup.mark("image_processor")
+        
+        # 加载拖放支持并注册放置区域
+        dnd_files = load_dnd(self)
+        if dnd_files is not None:
+            self.tkdnd_available = True
+            self.dnd_files = dnd_files
+            self.tier_frame.enable_drop_targets(dnd_files)
+            self.repository_frame.enable_drop_targets(dnd_files)
+        self.startup.mark("dnd")
+        
+        # 仓库是虚拟滚动的，一次刷新即可；等级中的图片分批创建
+        self.repository_frame.refresh_repository(self.repository_images)
+        self.startup.mark("repository")
+        self.stream_tier_images(STREAM_CHUNK)
+        
+        # 执行启动期间推迟的菜单操作（可能打开对话框，不在启动过程中直接调用）
+        for action in self._ready_actions:
+            self.after_idle(action)
+        self._ready_actions = []
+    
+    def defer_until_ready(self, action):
+        """启动的第二阶段完成之前推迟需要图片处理器的操作
+        
+        Args:
+            action: 无参数的函数，启动完成后执行
+            
+        Returns:
+            bool: 是否被推迟（调用方应直接返回）
+        """
+        if self.image_processor is not None:
+            return False
+        self._ready_actions.append(action)
+        return True
+    
+    def stream_tier_images(self, limit):
+        """分批显示等级中的图片，每批之间让界面处理事件
+        
+        Args:
+            limit: 这一批之后每个等级显示的图片数，None 表示全部
+        """
+        self._stream_id = None
+        if limit is not None and any(len(tier.get("images", [])) > limit for tier in self.tiers):
+            self.tier_frame.refresh_tiers(self.tiers, limit)
+            self._stream_id = self.after(1, self.stream_tier_images, limit + STREAM_CHUNK)
+            return
+        
+        self.tier_frame.refresh_tiers(self.tiers)
+        self.startup.mark("tiles")
+        self.startup.report()
     
     def load_config(self):
-        """加载配置"""
-        config = self.config_manager.load_config()
+        """加载配置
+        
+        Returns:
+            bool: 是否使用了默认等级（新的排行榜）
+        """
+        return self.apply_config(self.config_manager.load_config())
+    
+    def apply_config(self, config):
+        """使用加载的配置替换当前数据
+        
+        Returns:
+            bool: 是否使用了默认等级（新的排行榜）
+        """
         if config:
             self.tiers = config.get('tiers', [])
             self.repository_images = config.get('repository_images', [])
+            self.settings = config.get('settings', {})
+            self.config_version = config.get('version', 1)
         
         # 如果没有等级，添加默认等级
-        if not self.tiers:
-            self.tiers = [
-                {"name": "S", "color": "#FF7F7F", "images": []},
-                {"name": "A", "color": "#FFBF7F", "images": []},
-                {"name": "B", "color": "#FFFF7F", "images": []},
-                {"name": "C", "color": "#7FFF7F", "images": []},
-                {"name": "D", "color": "#7FBFFF", "images": []},
-                {"name": "E", "color": "#7F7FFF", "images": []},
-                {"name": "F", "color": "#FF7FFF", "images": []}
-            ]
+        created = not self.tiers
+        if created:
+            self.tiers = [dict(tier, images=[]) for tier in DEFAULT_TIERS]
+        
+        self.update_title()
+        return created
     
-    def save_config(self):
-        """保存配置"""
-        config = {
-            'tiers': self.tiers,
-            'repository_images': self.repository_images
+    def update_title(self):
+        """更新窗口标题，SQLite模式下显示当前排行榜的名称"""
+        list_name = self.config_manager.current_list_name()
+        self.title(f"TierMaker - 排行榜制作工具 - {list_name}" if list_name else "TierMaker - 排行榜制作工具")
+    
+    def all_images(self):
+        """获取仓库和所有等级中的图片"""
+        images = list(self.repository_images)
+        for tier in self.tiers:
+            images.extend(tier.get("images", []))
+        return images
+    
+    def config_snapshot(self):
+        """生成用于保存的配置快照
+        
+        只复制列表和等级字典（图片信息字典创建后不再修改，可以共享），
+        后台线程序列化快照时主线程可以继续修改模型。
+        """
+        return {
+            'version': CONFIG_VERSION,
+            'tiers': [dict(tier, images=list(tier.get('images', []))) for tier in self.tiers],
+            'repository_images': list(self.repository_images),
+            'settings': dict(self.settings),
+            # 快照包含到此为止的所有日志记录，写入成功后对应的日志分段会被删除
+            'journal_seq': self.config_manager.journal.rotate()
         }
-        self.config_manager.save_config(config)
+    
+    def save_config(self):
+        """标记配置已修改，安静一段时间后在后台自动保存"""
+        self.scheduler.invalidate("config")
+    
+    def record_change(self, record):
+        """记录一次修改
+        
+        日志模式下追加一条日志记录（日志过长时在后台保存快照压缩日志），
+        否则标记整个配置需要保存。
+        
+        Args:
+            record: 修改记录字典（见 journal.apply_record）
+        """
+        # 排行榜包导入期间配置暂停写入，日志也不能追加在上一个快照之后
+        if self.journal_enabled and self._pack_thread is None and self.config_manager.append_change(record):
+            if self.config_manager.journal.needs_compaction:
+                self.save_config()
+        else:
+            self.save_config()
+    
+    def save_config_now(self):
+        """立即保存配置"""
+        self.scheduler.flush("config")
+        self.autosaver.dirty = True
+        if not self.autosaver.flush():
+            # 后台写入失败时再同步保存一次，并向用户显示错误
+            self.config_manager.save_config(self.config_snapshot())
     
     def create_menu(self):
         """创建菜单栏"""
@@ -95,8 +346,14 @@ class TierMaker(TkinterDnDClass):
         # 文件菜单
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label="新建排行榜", command=self.new_tierlist)
-        file_menu.add_command(label="保存排行榜", command=self.save_config)
+        if self.config_manager.multiple_lists:
+            file_menu.add_command(label="打开排行榜...", command=self.open_tierlists)
+        file_menu.add_command(label="保存排行榜", command=self.save_config_now)
         file_menu.add_command(label="导出为图片", command=self.export_as_image)
+        file_menu.add_command(label=f"导出为高分辨率图片 ({HIDPI_SCALE}x)",
+                              command=lambda: self.export_as_image(HIDPI_SCALE))
+        file_menu.add_command(label="导出为排行榜包...", command=self.export_tierpack)
+        file_menu.add_command(label="打开排行榜包...", command=self.open_tierpack)
         file_menu.add_separator()
         file_menu.add_command(label="退出", command=self.on_closing)
         menubar.add_cascade(label="文件", menu=file_menu)
@@ -104,12 +361,32 @@ class TierMaker(TkinterDnDClass):
         # 编辑菜单
         edit_menu = tk.Menu(menubar, tearoff=0)
         edit_menu.add_command(label="添加图片到仓库", command=self.add_images)
+        edit_menu.add_command(label="从文件夹导入...", command=self.import_folder)
+        edit_menu.add_command(label="从压缩包导入...", command=self.import_archive)
         edit_menu.add_command(label="管理等级", command=self.manage_tiers)
         menubar.add_cascade(label="编辑", menu=edit_menu)
         
+        # 视图菜单：图片大小（缩略图从金字塔中最接近的一级缩放，不读取原图）
+        view_menu = tk.Menu(menubar, tearoff=0)
+        self.tile_edge_var = tk.IntVar(value=self.tile_size[0])
+        for edge in TILE_EDGES:
+            view_menu.add_radiobutton(label=f"{TILE_EDGE_LABELS[edge]} ({edge}px)", value=edge,
+                                      variable=self.tile_edge_var,
+                                      command=lambda e=edge: self.set_tile_size(e))
+        view_menu.add_separator()
+        view_menu.add_command(label="放大", accelerator="Ctrl++", command=lambda: self.zoom(1))
+        view_menu.add_command(label="缩小", accelerator="Ctrl+-", command=lambda: self.zoom(-1))
+        menubar.add_cascade(label="视图", menu=view_menu)
+        for sequence in ("<Control-plus>", "<Control-equal>", "<Control-KP_Add>"):
+            self.bind(sequence, lambda e: self.zoom(1))
+        for sequence in ("<Control-minus>", "<Control-KP_Subtract>"):
+            self.bind(sequence, lambda e: self.zoom(-1))
+        
         # 帮助菜单
         help_menu = tk.Menu(menubar, tearoff=0)
         help_menu.add_command(label="使用帮助", command=self.show_help)
+        if PERF.enabled:
+            help_menu.add_command(label="性能...", command=self.show_performance)
         help_menu.add_command(label="关于", command=self.show_about)
         menubar.add_cascade(label="帮助", menu=help_menu)
         
@@ -123,48 +400,98 @@ class TierMaker(TkinterDnDClass):
         self.main_paned = ttk.PanedWindow(self, orient=tk.HORIZONTAL)
         self.main_paned.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
-        # 左侧：等级区域
-        self.tier_frame = TierFrame(self.main_paned, self, self.tiers, 
-                                   self.config_manager.images_dir, TKDND_AVAILABLE, DND_FILES)
+        # 左侧：等级区域（设置 tier_renderer 或环境变量 TIERMAKER_RENDERER=canvas 时使用单画布绘制）
+        renderer = self.settings.get("tier_renderer") or os.environ.get("TIERMAKER_RENDERER")
+        tier_frame_class = CanvasTierFrame if renderer == "canvas" else TierFrame
+        self.tier_frame = tier_frame_class(self.main_paned, self, self.tiers, 
+                                   self.config_manager.images_dir, self.tkdnd_available, self.dnd_files)
         self.main_paned.add(self.tier_frame, weight=3)
         
-        # 右侧：图片仓库
-        self.repository_frame = RepositoryFrame(self.main_paned, self, 
-                                               self.repository_images, 
+        # 右侧：图片仓库（图片在首帧显示之后加载）
+        self.repository_frame = RepositoryFrame(self.main_paned, self, [],
                                                self.config_manager.images_dir,
-                                               TKDND_AVAILABLE, DND_FILES)
+                                               self.tkdnd_available, self.dnd_files)
         self.main_paned.add(self.repository_frame, weight=1)
     
-    def refresh_ui(self):
-        """刷新界面"""
-        self.tier_frame.refresh_tiers(self.tiers)
-        self.repository_frame.refresh_repository(self.repository_images)
-    
-    def move_image_to_tier(self, img_info, tier_index):
-        """将图片移动到指定等级"""
-        # 首先从原位置移除
-        # 检查是否在仓库中
-        if img_info in self.repository_images:
-            self.repository_images.remove(img_info)
-        else:
-            # 检查是否在某个等级中
-            for tier in self.tiers:
-                if img_info in tier.get("images", []):
-                    tier["images"].remove(img_info)
-                    break
-        
-        # 添加到新等级
-        if "images" not in self.tiers[tier_index]:
-            self.tiers[tier_index]["images"] = []
+    def zoom(self, step):
+        """按 TILE_EDGES 的顺序放大或缩小图片
         
-        self.tiers[tier_index]["images"].append(img_info)
-        
-        # 刷新界面
-        self.refresh_ui()
+        Args:
+            step: 1 为放大一级，-1 为缩小一级
+        """
+        index = TILE_EDGES.index(self.tile_size[0]) + step
+        if 0 <= index < len(TILE_EDGES):
+            self.set_tile_size(TILE_EDGES[index])
+    
+    def set_tile_size(self, edge):
+        """修改等级行和仓库中的图片大小并保存到设置
         
-        # 保存配置
+        Args:
+            edge: 图片边长（TILE_EDGES 之一）
+        """
+        size = tile_size(edge)
+        self.tile_edge_var.set(size[0])
+        if size == self.tile_size:
+            return
+        self.tile_size = size
+        self.settings["tile_size"] = size[0]
+        self.tier_frame.set_tile_size(size)
+        self.repository_frame.set_tile_size(size)
+        if self.image_processor is not None:
+            self.image_processor.tile_size = size
+            self.refresh_ui()
         self.save_config()
     
+    def refresh_ui(self):
+        """标记等级区域和仓库需要刷新（在事件循环空闲时统一刷新）"""
+        self.scheduler.invalidate("tiers", "repository")
+    
+    def refresh_tiers_view(self):
+        """刷新等级区域"""
+        if self.image_processor is None:
+            return  # 启动完成时会分批显示全部图片
+        with PERF.measure("refresh"):
+            if self._stream_id is not None:
+                # 启动时的分批加载还没完成：取消剩余批次，直接显示全部图片
+                self.after_cancel(self._stream_id)
+                self.stream_tier_images(None)
+            else:
+                self.tier_frame.refresh_tiers(self.tiers)
+    
+    def refresh_repository_view(self):
+        """刷新图片仓库"""
+        if self.image_processor is None:
+            return  # 启动完成时会刷新仓库
+        with PERF.measure("refresh"):
+            self.repository_frame.refresh_repository(self.repository_images)
+    
+    def move_image_to_tier(self, img_info, tier_index, position=None):
+        """将图片移动到指定等级
+        
+        Args:
+            img_info: 图片信息字典
+            tier_index: 目标等级索引
+            position: 在等级中的插入位置，为None时追加到末尾
+        """
+        # 通过位置索引从原位置移除并插入新等级，不需要遍历仓库和各等级
+        target = self.tiers[tier_index].setdefault("images", [])
+        source = self.locations.locate(img_info["id"])
+        if self.locations.move(img_info["id"], target, position) is None:
+            # 不在模型中的图片（例如刚导入的）直接加入
+            self.locations.insert(img_info, target, position)
+            op = {"op": "add", "tier": tier_index, "images": [img_info]}
+        else:
+            op = {"op": "move", "id": img_info["id"], "tier": tier_index}
+        # 记录实际的插入位置，重放时得到相同的顺序
+        op["pos"] = self.locations.locate(img_info["id"])[1]
+        self.record_change(op)
+        
+        # 刷新界面（只有从仓库移出时才需要刷新仓库）
+        if source is not None and source[0] is self.repository_images:
+            self.scheduler.invalidate("tiers", "repository")
+        else:
+            self.scheduler.invalidate("tiers")
+    
     def add_images(self):
         """添加图片到仓库"""
         from tkinter import filedialog
@@ -181,58 +508,289 @@ class TierMaker(TkinterDnDClass):
         if not filenames:
             return
         
-        for filename in filenames:
-            img_info = self.image_processor.add_image_from_path(filename)
-            if img_info and img_info not in self.repository_images:
-                self.repository_images.append(img_info)
+        self.import_paths(filenames)
+    
+    def import_folder(self):
+        """从文件夹（包括子文件夹）导入图片到仓库"""
+        from tkinter import filedialog
         
-        # 刷新仓库显示
-        self.repository_frame.refresh_repository(self.repository_images)
+        folder = filedialog.askdirectory(title="选择图片文件夹")
+        if folder:
+            self.import_paths([folder])
+    
+    def import_archive(self):
+        """从zip压缩包导入图片到仓库"""
+        from tkinter import filedialog
         
-        # 保存配置
-        self.save_config()
+        filenames = filedialog.askopenfilenames(
+            title="选择压缩包",
+            filetypes=[("ZIP压缩包", "*.zip")]
+        )
+        if filenames:
+            self.import_paths(filenames)
+    
+    def import_paths(self, paths, tier_index=None):
+        """批量导入文件、文件夹和压缩包中的图片
+        
+        导入在后台并行进行并显示进度，全部完成后一次性加入仓库（或指定等级）并保存。
+        
+        Args:
+            paths: 路径列表
+            tier_index: 目标等级索引，为None时导入到仓库
+        """
+        if self.defer_until_ready(lambda: self.import_paths(paths, tier_index)):
+            return
+        importer = self.image_processor.create_importer()
+        dialog = ImportProgressDialog(self, importer, paths)
+        self.wait_window(dialog)
+        
+        result = dialog.result
+        if result is None:
+            return
+        
+        if result.imported:
+            if tier_index is None:
+                target = self.repository_images
+            else:
+                target = self.tiers[tier_index].setdefault("images", [])
+            for img_info in result.imported:
+                self.locations.insert(img_info, target)
+                self.search_index.add(img_info)
+            self.record_change({"op": "add", "tier": tier_index, "images": result.imported})
+            
+            # 刷新界面
+            self.refresh_ui()
+            self.image_processor.flush_caches()
+        
+        if result.skipped:
+            details = "\n".join(f"{name}: {reason}" for name, reason in result.skipped[:10])
+            if len(result.skipped) > 10:
+                details += f"\n……共 {len(result.skipped)} 个文件"
+            messagebox.showwarning("部分文件未导入", f"以下文件未能导入：\n{details}")
     
     def manage_tiers(self):
         """管理等级"""
-        # 保存原始等级列表的副本，用于比较变化
-        original_tiers = [tier.copy() for tier in self.tiers]
-        original_tier_names = [tier['name'] for tier in original_tiers]
+        # 保存原始等级列表，用于找出被删除的等级
+        original_tiers = list(self.tiers)
         
         # 打开等级管理对话框
         tier_manager = TierManagerDialog(self, self.tiers)
         self.wait_window(tier_manager)
         
-        # 检查是否有等级被删除，将删除等级中的图片移回仓库
-        current_tier_names = [tier['name'] for tier in self.tiers]
+        # 检查是否有等级被删除（按等级对象判断，改名的等级不算删除），将删除等级中的图片移回仓库
+        current_tiers = {id(tier) for tier in self.tiers}
         for tier in original_tiers:
-            if tier['name'] not in current_tier_names:
-                # 将删除等级中的图片移回仓库
-                for img_info in tier.get('images', []):
-                    if img_info not in self.repository_images:
-                        self.repository_images.append(img_info)
+            if id(tier) not in current_tiers:
+                self.repository_images.extend(tier.get('images', []))
+                tier['images'] = []
+        
+        # 等级结构可能已改变，重建位置索引
+        self.locations.rebuild(self.repository_images, self.tiers)
+        
+        # 记录每个等级来自原来的哪个等级（新等级为None）
+        original_index = {id(tier): index for index, tier in enumerate(original_tiers)}
+        self.record_change({"op": "tiers", "tiers": [
+            {"name": tier["name"], "color": tier["color"], "from": original_index.get(id(tier))}
+            for tier in self.tiers]})
         
         # 刷新界面
         self.refresh_ui()
-        
-        # 保存配置
-        self.save_config()
     
     def new_tierlist(self):
         """创建新的排行榜"""
+        if self.defer_until_ready(self.new_tierlist):
+            return
+        if self.config_manager.multiple_lists:
+            # SQLite模式：新建一个排行榜并切换过去，当前排行榜保留在数据库中
+            from tkinter import simpledialog
+            name = simpledialog.askstring("新建排行榜", "排行榜名称:", parent=self)
+            if name:
+                self.switch_tierlist(self.config_manager.create_tierlist(name, DEFAULT_TIERS))
+            return
+        
+        if self.pack_busy("新建排行榜"):
+            return
         if messagebox.askyesno("新建排行榜", "确定要创建新的排行榜吗？这将清除当前的所有等级和图片。"):
-            # 清除所有等级中的图片（但保留等级）
+            # 清除所有等级中的图片（但保留等级），不再被引用的图片文件随之删除
             for tier in self.tiers:
+                for img_info in tier.get("images", []):
+                    self.search_index.remove(img_info)
+                self.image_processor.release_images(tier.get("images", []))
                 tier["images"] = []
+            self.image_processor.flush_caches()
+            self.locations.rebuild(self.repository_images, self.tiers)
+            self.record_change({"op": "clear"})
             
             # 刷新界面
             self.refresh_ui()
+    
+    def open_tierlists(self):
+        """打开排行榜列表对话框（SQLite模式）"""
+        if self.defer_until_ready(self.open_tierlists) or self.pack_busy("打开排行榜"):
+            return
+        dialog = TierListsDialog(self, self.config_manager)
+        self.wait_window(dialog)
+        if dialog.deleted_images:
+            self.image_processor.release_images(dialog.deleted_images)
+            self.image_processor.flush_caches()
+        if dialog.selected is not None and dialog.selected != self.config_manager.current_list:
+            self.switch_tierlist(dialog.selected)
+        elif dialog.renamed:
+            self.update_title()
+    
+    def switch_tierlist(self, list_id, config=None):
+        """保存当前排行榜并切换到另一个排行榜（SQLite模式）
+        
+        Args:
+            list_id: 排行榜ID
+            config: 使用该配置替换排行榜的内容（例如从排行榜包打开），默认使用数据库中的内容
+        """
+        self.save_config_now()
+        self.tiers = []
+        self.repository_images = []
+        loaded = self.config_manager.open_tierlist(list_id)
+        created = self.apply_config(config or loaded)
+        self.locations.rebuild(self.repository_images, self.tiers)
+        self.search_index.rebuild(self.all_images())
+        self.refresh_ui()
+        if created or config or self.config_manager.journal.corrupt:
+            self.save_config()
+    
+    def export_tierpack(self):
+        """导出当前排行榜为 .tierpack 文件"""
+        if self.defer_until_ready(self.export_tierpack):
+            return
+        self.image_processor.export_tierpack({'tiers': self.tiers,
+                                              'repository_images': self.repository_images})
+    
+    def pack_busy(self, title):
+        """排行榜包仍在后台导入时提示用户
+        
+        Args:
+            title: 提示框标题
             
-            # 保存配置
+        Returns:
+            bool: 是否正在导入
+        """
+        if self._pack_thread is None:
+            return False
+        messagebox.showinfo(title, "排行榜包仍在导入，请稍后再试。")
+        return True
+    
+    def open_tierpack(self):
+        """打开 .tierpack 文件
+        
+        界面先使用包中预生成的缩略图显示，原图和缩略图在后台加入存储，
+        不需要等待整个包提取完成。
+        """
+        from tkinter import filedialog
+        from tiermaker.image_store import new_image_id
+        from tiermaker.tierpack import pack_entries
+        
+        if self.defer_until_ready(self.open_tierpack) or self.pack_busy("打开排行榜包"):
+            return
+        
+        path = filedialog.askopenfilename(title="打开排行榜包", filetypes=[("排行榜包", "*.tierpack")])
+        if not path:
+            return
+        if not self.config_manager.multiple_lists and not messagebox.askyesno(
+                "打开排行榜包", "打开排行榜包将替换当前的排行榜和仓库，确定吗？"):
+            return
+        
+        try:
+            pack = self.image_processor.open_tierpack(path)
+            config = pack.config()
+        except Exception as e:
+            self.image_processor.close_tierpack()
+            messagebox.showerror("打开错误", f"无法打开排行榜包: {str(e)}")
+            return
+        
+        # 包中的图片作为新图片登记，重新分配ID
+        entries = pack_entries(config)
+        for img_info in entries:
+            img_info["id"] = new_image_id()
+        config = dict(config, settings=self.settings, version=CONFIG_VERSION)
+        
+        # 包中的图片加入存储之前配置不能写入磁盘（否则崩溃后配置引用存储中没有的图片），
+        # 提取完成后由 finish_tierpack 保存
+        self.save_config_now()
+        self.autosaver.hold()
+        if self.config_manager.multiple_lists:
+            # SQLite模式：作为新的排行榜打开，提取期间不能切换排行榜
+            name = os.path.splitext(os.path.basename(path))[0]
+            self.switch_tierlist(self.config_manager.create_tierlist(name, []), config)
+        else:
+            # 被替换的图片在新配置保存之后再释放，崩溃时旧配置中的图片仍然完整
+            self._pack_released = self.all_images()
+            self.tiers = []
+            self.repository_images = []
+            self.apply_config(config)
+            self.locations.rebuild(self.repository_images, self.tiers)
+            self.search_index.rebuild(self.all_images())
+            self.refresh_ui()
             self.save_config()
+        self._pack_list = self.config_manager.current_list
+        
+        def extract():
+            self._pack_result = self.image_processor.extract_tierpack(entries)
+        
+        self._pack_thread = threading.Thread(target=extract, daemon=True)
+        self._pack_thread.start()
+        self.after(200, self.poll_tierpack)
+    
+    def poll_tierpack(self):
+        """等待排行榜包在后台导入完成"""
+        if self._pack_thread.is_alive():
+            self.after(200, self.poll_tierpack)
+            return
+        self.finish_tierpack()
     
-    def export_as_image(self):
-        """导出为图片"""
-        self.image_processor.export_tierlist_as_image(self.tiers, self.tier_frame.tiers_canvas)
+    def finish_tierpack(self):
+        """排行榜包导入完成：关闭包，更新存储路径改变的图片后保存
+
+        图片存储的清单已在提取线程中写入，这里再保存配置，最后释放被替换的图片。
+        """
+        self._pack_thread.join()
+        self._pack_thread = None
+        self.image_processor.close_tierpack()
+        
+        missing, renamed = self._pack_result or ([], {})
+        self._pack_result = None
+        if renamed and self.config_manager.current_list != self._pack_list:
+            # 新路径属于包导入到的排行榜；它已不是当前排行榜时直接更新数据库中的图片信息
+            self.config_manager.rename_images(renamed)
+            renamed = {}
+        self._pack_list = None
+        if renamed:
+            # 图片信息字典可能正被保存线程共享，用新字典替换而不是原地修改；
+            # 控件发现绑定的字典被替换后按新文件名重新请求缩略图
+            for image_id, filename in renamed.items():
+                location = self.locations.locate(image_id)
+                if location is not None:
+                    container, position = location
+                    container[position] = dict(container[position], filename=filename)
+            self.locations.rebuild(self.repository_images, self.tiers)
+            self.search_index.rebuild(self.all_images())
+            self.refresh_ui()
+        self.autosaver.release()
+        self.save_config_now()
+        if self._pack_released:
+            self.image_processor.release_images(self._pack_released)
+            self._pack_released = []
+            self.image_processor.flush_caches()
+        
+        if missing:
+            messagebox.showwarning("部分图片缺失", f"排行榜包中缺少 {len(missing)} 张图片的原图。")
+    
+    def export_as_image(self, scale=1):
+        """导出为图片
+        
+        Args:
+            scale: 缩放倍数，HIDPI_SCALE 时导出高分辨率图片
+        """
+        if self.defer_until_ready(lambda: self.export_as_image(scale)):
+            return
+        self.image_processor.export_tierlist_as_image(self.tiers, self.tier_frame.tiers_canvas, scale)
     
     def show_help(self):
         """显示帮助信息"""
@@ -243,10 +801,17 @@ class TierMaker(TkinterDnDClass):
         2. 排序图片：将仓库中的图片拖放到相应的等级行中。
         3. 管理等级：点击"编辑"菜单中的"管理等级"，可以添加、删除或修改等级。
         4. 保存排行榜：点击"文件"菜单中的"保存排行榜"。
-        5. 导出为图片：点击"文件"菜单中的"导出为图片"，将排行榜保存为PNG图片。
+        5. 导出为图片：点击"文件"菜单中的"导出为图片"，将排行榜保存为PNG图片；"导出为高分辨率图片"输出两倍尺寸的图片。
+        6. 图片大小：在"视图"菜单中选择，或使用 Ctrl++ 和 Ctrl+- 缩放。
+        7. 搜索图片：在仓库顶部的搜索框中输入文件名或标签，按 Esc 清除。
         """
         messagebox.showinfo("使用帮助", help_text)
     
+    def show_performance(self):
+        """显示性能面板（启用性能记录时）"""
+        registry = self.image_processor.registry if self.image_processor is not None else None
+        PerformanceDialog(self, PERF, registry)
+    
     def show_about(self):
         """显示关于信息"""
         about_text = """
@@ -258,119 +823,57 @@ class TierMaker(TkinterDnDClass):
         """
         messagebox.showinfo("关于", about_text)
     
+    def defer_refinement(self):
+        """界面正在滚动：推迟缩略图细化（图片处理器创建之前忽略）"""
+        if self.image_processor is not None:
+            self.image_processor.registry.defer_refinement()
+    
     def start_drag(self, event, frame, img_info):
         """开始拖动图片"""
-        # 保存被拖动的图片信息
-        self._drag_data = {"frame": frame, "img_info": img_info, "start_x": event.x, "start_y": event.y}
-        
-        # 创建拖动时的视觉反馈
-        self._drag_icon = tk.Toplevel(self)
-        self._drag_icon.overrideredirect(True)  # 无边框窗口
-        self._drag_icon.attributes("-topmost", True)  # 置顶
-        self._drag_icon.attributes("-alpha", 0.7)  # 半透明
-        
-        # 在新窗口中显示图片
-        try:
-            from PIL import Image, ImageTk
-            img_path = os.path.join(self.config_manager.images_dir, img_info["filename"])
-            img = Image.open(img_path)
-            img = img.resize((50, 50), Image.LANCZOS)  # 减小拖动图标大小
-            photo = ImageTk.PhotoImage(img)
-            
-            lbl = tk.Label(self._drag_icon, image=photo)
-            lbl.image = photo  # 保持引用
-            lbl.pack()
-            
-            # 设置初始位置
-            x, y = self.winfo_pointerxy()
-            self._drag_icon.geometry(f"+{x-30}+{y-30}")
-            
-            # 绑定鼠标移动和释放事件
-            self.bind("<B1-Motion>", self.on_drag_motion)
-            self.bind("<ButtonRelease-1>", self.on_drag_release)
-        except Exception as e:
-            print(f"创建拖动图标错误: {str(e)}")
-            if hasattr(self, '_drag_icon') and self._drag_icon:
-                self._drag_icon.destroy()
-    
-    def on_drag_motion(self, event):
-        """拖动过程中更新图标位置"""
-        if hasattr(self, '_drag_icon') and self._drag_icon:
-            # 更新拖动图标位置
-            x, y = self.winfo_pointerxy()
-            self._drag_icon.geometry(f"+{x-30}+{y-30}")
-    
-    def on_drag_release(self, event):
-        """释放拖动，确定放置位置"""
-        if hasattr(self, '_drag_icon') and self._drag_icon:
-            self._drag_icon.destroy()
-            
-            # 确定鼠标位置
-            x, y = event.x_root, event.y_root
-            
-            # 获取等级区域的位置
-            tiers_canvas_x = self.tier_frame.tiers_canvas.winfo_rootx()
-            tiers_canvas_y = self.tier_frame.tiers_canvas.winfo_rooty()
-            tiers_canvas_width = self.tier_frame.tiers_canvas.winfo_width()
-            tiers_canvas_height = self.tier_frame.tiers_canvas.winfo_height()
-            
-            # 检查是否在等级区域内
-            if (tiers_canvas_x <= x < tiers_canvas_x + tiers_canvas_width and
-                tiers_canvas_y <= y < tiers_canvas_y + tiers_canvas_height):
-                
-                # 获取所有等级行的子部件
-                tier_widgets = self.tier_frame.tiers_container.winfo_children()
-                
-                # 计算相对于画布的位置
-                canvas_y = y - tiers_canvas_y + self.tier_frame.tiers_canvas.yview()[0] * self.tier_frame.tiers_container.winfo_height()
-                
-                # 查找对应的等级
-                for i, tier_widget in enumerate(tier_widgets):
-                    if i < len(self.tiers):  # 确保索引不超出范围
-                        tier_y = tier_widget.winfo_y()
-                        tier_height = tier_widget.winfo_height()
-                        
-                        if tier_y <= canvas_y < tier_y + tier_height:
-                            # 找到目标等级，移动图片
-                            self.move_image_to_tier(self._drag_data["img_info"], i)
-                            break
-                else:
-                    # 如果没有找到匹配的等级，尝试移动到最近的等级
-                    if tier_widgets and self._drag_data and "img_info" in self._drag_data:
-                        # 计算最近的等级
-                        closest_tier = 0
-                        min_distance = float('inf')
-                        
-                        for i, tier_widget in enumerate(tier_widgets):
-                            if i < len(self.tiers):
-                                tier_center = tier_widget.winfo_y() + tier_widget.winfo_height() / 2
-                                distance = abs(canvas_y - tier_center)
-                                
-                                if distance < min_distance:
-                                    min_distance = distance
-                                    closest_tier = i
-                        
-                        # 移动到最近的等级
-                        self.move_image_to_tier(self._drag_data["img_info"], closest_tier)
-            
-            # 解除绑定
-            self.unbind("<B1-Motion>")
-            self.unbind("<ButtonRelease-1>")
-            
-            # 清除拖动数据
-            self._drag_data = None
+        self.drag.start(event, img_info)
     
     def on_closing(self):
         """关闭应用前的操作"""
         if messagebox.askyesno("退出", "确定要退出吗？未保存的更改将丢失。"):
-            self.save_config()  # 自动保存当前状态
+            # 等待正在导入的排行榜包完成，保证配置中的图片都已在存储中
+            if self._pack_thread is not None:
+                self.finish_tierpack()
+            
+            # 写入尚未保存的修改并等待后台写入完成
+            self.scheduler.flush("config")
+            self.scheduler.cancel()
+            if not self.autosaver.shutdown():
+                self.config_manager.save_config(self.config_snapshot())
+            self.config_manager.close()
+            if self.image_processor is not None:
+                self.image_processor.shutdown()
             self.destroy()
 
 
-def main():
-    """程序入口点"""
+def main(argv=None):
+    """程序入口点
+    
+    Args:
+        argv: 命令行参数，默认为 sys.argv[1:]
+    """
+    parser = argparse.ArgumentParser(description="TierMaker - 排行榜制作工具")
+    parser.add_argument("--perf", action="store_true",
+                        help="启用性能记录（也可以设置环境变量 TIERMAKER_PERF=1）")
+    parser.add_argument("--perf-profile", metavar="操作", help="在该操作周围采集性能数据，如 refresh、save、export")
+    parser.add_argument("--perf-profiler", choices=PROFILERS, default="cprofile", help="采集方式")
+    parser.add_argument("--perf-report", metavar="文件", help="退出时把性能报告写入文件（.json 为JSON格式），默认打印")
+    args = parser.parse_args(argv)
+    
+    if args.perf or args.perf_profile:
+        PERF.enable(args.perf_profile, args.perf_profiler, args.perf_report)
+    else:
+        PERF.enable_from_env()
+    
     app = TierMaker()
-    app.mainloop()
+    try:
+        app.mainloop()
+    finally:
+        PERF.dump()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+图片元数据索引模块 - 持久保存存储中每个图片文件的大小、修改时间、尺寸和格式
+"""
+
+import os
+import json
+import threading
+from PIL import Image
+
+
+class MetadataIndex:
+    """图片元数据索引类
+
+    以存储中的相对路径为键记录 {"size", "mtime", "width", "height", "mode",
+    "format", "frames", "hash"}，保存在 metadata.json 中。导入时由图片存储写入，
+    第一次查询时用一次 os.scandir 遍历校验整个图片目录：大小或修改时间改变的
+    文件在下次查询时重新读取文件头，已删除的文件被移除，未登记的文件只记录大小
+    和修改时间。此后界面和导出只查询内存中的索引，不再逐个 stat 或打开文件。
+    可以在后台加载线程中并发使用。
+    """
+
+    def __init__(self, index_file, images_dir):
+        """初始化元数据索引
+
+        Args:
+            index_file: 索引文件路径
+            images_dir: 图片存储目录
+        """
+        self.index_file = index_file
+        self.images_dir = images_dir
+        self._files = self._load_index()
+        self._validated = False
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _load_index(self):
+        """加载元数据索引"""
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f).get("files", {})
+            except Exception as e:
+                print(f"加载元数据索引错误: {str(e)}")
+        return {}
+
+    def flush(self):
+        """把索引原子地写回磁盘（仅在有修改时）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"version": 1, "files": {path: dict(meta) for path, meta in self._files.items()}}
+            self._dirty = False
+        tmp_path = self.index_file + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_file)
+        except Exception as e:
+            print(f"保存元数据索引错误: {str(e)}")
+
+    def record(self, rel_path, content_hash=None):
+        """登记（或更新）一个文件的元数据，读取一次文件头（导入时调用）
+
+        Args:
+            rel_path: 相对于图片目录的路径
+            content_hash: 图片在存储中的内容哈希
+        """
+        try:
+            meta = self._read(rel_path)
+        except Exception as e:
+            print(f"读取图片元数据错误: {str(e)}")
+            return
+        meta["hash"] = content_hash
+        with self._lock:
+            self._files[rel_path] = meta
+            self._dirty = True
+
+    def discard(self, rel_path):
+        """移除一个文件（文件被删除后调用）"""
+        with self._lock:
+            if self._files.pop(rel_path, None) is not None:
+                self._dirty = True
+
+    def exists(self, rel_path):
+        """检查文件是否在图片目录中（只查询索引）"""
+        self.validate()
+        return rel_path in self._files
+
+    def get(self, rel_path, read_header=True):
+        """获取文件的元数据，缺少文件头字段时读取一次文件头
+
+        Args:
+            rel_path: 相对于图片目录的路径
+            read_header: 缺少文件头字段时是否读取，为False时只返回已记录的字段
+
+        Returns:
+            dict: 元数据副本，文件不存在时返回None
+        """
+        self.validate()
+        with self._lock:
+            meta = self._files.get(rel_path)
+        if meta is None:
+            return None
+        if read_header and meta.get("width") is None:
+            try:
+                fresh = self._read(rel_path)
+            except Exception as e:
+                print(f"读取图片元数据错误: {str(e)}")
+                return dict(meta)
+            fresh["hash"] = meta.get("hash")
+            with self._lock:
+                self._files[rel_path] = meta = fresh
+                self._dirty = True
+        return dict(meta)
+
+    def validate(self):
+        """用一次 os.scandir 遍历校验索引（只在第一次查询时执行）
+
+        Returns:
+            dict: 校验结果 {"unchanged", "changed", "added", "removed"}，已校验过时返回None
+        """
+        with self._lock:
+            if self._validated:
+                return None
+            self._validated = True
+            counts = {"unchanged": 0, "changed": 0, "added": 0, "removed": 0}
+            seen = set()
+            for rel_path, st in self._scan():
+                seen.add(rel_path)
+                meta = self._files.get(rel_path)
+                if meta is None:
+                    # 未登记的文件（例如旧版本导入的文件），文件头在查询时再读取
+                    self._files[rel_path] = {"size": st.st_size, "mtime": st.st_mtime_ns}
+                    counts["added"] += 1
+                elif meta.get("size") != st.st_size or meta.get("mtime") != st.st_mtime_ns:
+                    # 内容已改变，原来的哈希不再可信：调用方改为重新计算（例如 ThumbnailCache.content_hash）
+                    self._files[rel_path] = {"size": st.st_size, "mtime": st.st_mtime_ns, "hash": None}
+                    counts["changed"] += 1
+                else:
+                    counts["unchanged"] += 1
+            for rel_path in [path for path in self._files if path not in seen]:
+                del self._files[rel_path]
+                counts["removed"] += 1
+            if counts["changed"] or counts["added"] or counts["removed"]:
+                self._dirty = True
+        return counts
+
+    def _scan(self):
+        """遍历图片目录：顶层的旧格式文件和按哈希前两位命名的子目录中的文件
+
+        Yields:
+            tuple: (相对路径, stat结果)
+        """
+        try:
+            top = list(os.scandir(self.images_dir))
+        except OSError:
+            return
+        for entry in top:
+            if entry.is_dir(follow_symlinks=False):
+                if len(entry.name) != 2:
+                    continue  # originals 等其他目录不属于工作副本
+                with os.scandir(entry.path) as sub:
+                    for item in sub:
+                        if item.is_file(follow_symlinks=False) and not item.name.endswith(".tmp"):
+                            yield f"{entry.name}/{item.name}", item.stat()
+            elif entry.is_file(follow_symlinks=False) and not entry.name.startswith(".") \
+                    and not entry.name.endswith((".json", ".tmp")):
+                yield entry.name, entry.stat()
+
+    def _read(self, rel_path):
+        """读取文件的大小、修改时间和文件头信息（不解码像素）"""
+        path = os.path.join(self.images_dir, rel_path)
+        st = os.stat(path)
+        with Image.open(path) as img:
+            return {"size": st.st_size, "mtime": st.st_mtime_ns,
+                    "width": img.width, "height": img.height, "mode": img.mode,
+                    "format": img.format, "frames": getattr(img, "n_frames", 1)}
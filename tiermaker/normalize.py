@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+导入规范化模块 - 把导入的图片转换为尺寸受限的 RGBA 工作副本
+"""
+
+import os
+import threading
+from PIL import Image, ImageOps
+
+from tiermaker.instrumentation import PERF
+
+# 工作副本的默认最长边（像素），0 表示不限制
+DEFAULT_MAX_EDGE = 1024
+# 工作副本的格式和扩展名
+WORKING_FORMAT = "PNG"
+WORKING_EXT = ".png"
+# EXIF 方向标签
+EXIF_ORIENTATION = 0x0112
+
+
+class ImportNormalizer:
+    """导入规范化类
+
+    导入时把源图片转换为统一的工作副本：应用 EXIF 方向，转换为 RGBA，
+    最长边不超过 max_edge，保存为 PNG。JPEG 使用 draft() 在解码时按 1/2、1/4、1/8
+    缩小，其余格式由 thumbnail() 先用 reduce() 整数倍缩小再用 LANCZOS 精确缩放，
+    因此每张图片的解码开销和磁盘占用都与源文件大小无关。
+    已经是规范形式的图片（例如排行榜包中的工作副本）不会重新编码。
+    """
+
+    def __init__(self, max_edge=DEFAULT_MAX_EDGE):
+        """初始化导入规范化器
+
+        Args:
+            max_edge: 工作副本的最长边（像素），0 表示不缩小
+        """
+        self.max_edge = max(0, int(max_edge or 0))
+
+    def is_canonical(self, img):
+        """检查已打开的图片是否已经是规范的工作副本"""
+        if img.format != WORKING_FORMAT or img.mode != "RGBA":
+            return False
+        if self.max_edge and max(img.size) > self.max_edge:
+            return False
+        return img.getexif().get(EXIF_ORIENTATION, 1) == 1
+
+    def normalize(self, src_path, dest_path):
+        """把源图片转换为工作副本
+
+        Args:
+            src_path: 源图片路径
+            dest_path: 工作副本的保存路径
+
+        Returns:
+            bool: 是否写入了新文件；源图片已是规范形式时返回False，调用方可直接使用源文件
+
+        Raises:
+            OSError: 源文件无法解码
+        """
+        with PERF.measure("normalize"), Image.open(src_path) as img:
+            if self.is_canonical(img):
+                return False
+            if self.max_edge:
+                # JPEG 直接以缩小的比例解码，避免解码完整分辨率
+                img.draft(img.mode, (self.max_edge, self.max_edge))
+            img.load()
+            work = img
+            if self.max_edge and max(work.size) > self.max_edge:
+                work.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS, reducing_gap=2.0)
+            # 缩放后再旋转，只需处理缩小后的像素
+            work = ImageOps.exif_transpose(work)
+            if work.mode != "RGBA":
+                work = work.convert("RGBA")
+            # 先写入临时文件再重命名，避免留下不完整的工作副本
+            tmp_path = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                work.save(tmp_path, format=WORKING_FORMAT, compress_level=6)
+                os.replace(tmp_path, dest_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return True
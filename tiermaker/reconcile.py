@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+界面协调模块 - 计算新旧模型之间的最小差异
+"""
+
+from difflib import SequenceMatcher
+
+
+def diff_sequence(old, new):
+    """计算把 old 序列变为 new 序列所需的最少删除和插入操作
+
+    先去掉公共前缀和后缀，只对中间变化的部分做匹配，因此单次移动
+    （源行删除一项、目标行追加一项）只产生一个操作。
+
+    Args:
+        old: 旧的键序列
+        new: 新的键序列
+
+    Returns:
+        tuple: (removals, insertions)
+            removals 为需要删除的旧索引，按从大到小排列，依次删除不会影响其余索引；
+            insertions 为 (新索引, 键)，按从小到大排列，在删除之后依次插入即可得到 new。
+    """
+    if old == new:
+        return [], []
+
+    # 公共前缀
+    start = 0
+    limit = min(len(old), len(new))
+    while start < limit and old[start] == new[start]:
+        start += 1
+
+    # 公共后缀
+    old_end, new_end = len(old), len(new)
+    while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+
+    removals = []
+    insertions = []
+    matcher = SequenceMatcher(None, old[start:old_end], new[start:new_end], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "delete"):
+            removals.extend(range(start + i1, start + i2))
+        if tag in ("replace", "insert"):
+            insertions.extend((start + j, new[start + j]) for j in range(j1, j2))
+
+    removals.reverse()
+    return removals, insertions
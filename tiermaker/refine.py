@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+渐进渲染模块 - 先显示快速缩放的预览，空闲时再替换为高质量缩略图
+"""
+
+import time
+from collections import OrderedDict
+
+from tiermaker.instrumentation import PERF
+
+# 滚动停止后等待多久再继续细化（毫秒）
+QUIET_MS = 200
+# 同时在后台细化的图片数（其余的留给界面正在请求的图片）
+MAX_IN_FLIGHT = 2
+
+
+class RefineQueue:
+    """缩略图细化队列
+
+    注册表中以预览质量创建的图片会加入队列，事件循环空闲时在后台线程中
+    生成 LANCZOS 质量的缩略图，完成后交给 on_refined 原地替换（所有显示该
+    图片的控件随之更新）。最近加入的图片（通常就是当前可见的图片）最先细化；
+    拖动期间暂停，滚动时推迟到滚动停止 QUIET_MS 毫秒之后。
+    """
+
+    def __init__(self, root, async_loader, loader, on_refined,
+                 max_in_flight=MAX_IN_FLIGHT, quiet_ms=QUIET_MS):
+        """初始化细化队列
+
+        Args:
+            root: Tk根窗口，用于登记空闲回调
+            async_loader: AsyncImageLoader 后台加载器
+            loader: 高质量加载函数，接收 (img_info, size)，返回PIL图片或None（在工作线程中调用）
+            on_refined: 细化完成的回调，参数为 (键, PIL图片)（在主线程中调用）
+            max_in_flight: 同时在后台细化的图片数
+            quiet_ms: 滚动停止后等待的毫秒数
+        """
+        self.root = root
+        self.async_loader = async_loader
+        self.loader = loader
+        self.on_refined = on_refined
+        self.max_in_flight = max_in_flight
+        self.quiet_ms = quiet_ms
+        self.refined = 0
+        self._queue = OrderedDict()  # 键 -> 图片信息，键为 (图片标识, 大小)
+        self._in_flight = {}  # 键 -> 加载请求
+        self._holds = 0
+        self._quiet_until = 0.0
+        self._after_id = None
+
+    def __len__(self):
+        return len(self._queue) + len(self._in_flight)
+
+    def add(self, key, img_info):
+        """加入一张需要细化的图片
+
+        Args:
+            key: 注册表中的键 (图片标识, 大小)
+            img_info: 图片信息字典
+        """
+        if key in self._in_flight:
+            return
+        self._queue.pop(key, None)
+        self._queue[key] = img_info
+        self._schedule()
+
+    def discard(self, key):
+        """移除一张图片（例如已被注册表淘汰）"""
+        self._queue.pop(key, None)
+        ticket = self._in_flight.pop(key, None)
+        if ticket is not None:
+            self.async_loader.cancel(ticket)
+
+    def hold(self):
+        """暂停细化（例如开始拖动），与 release() 成对调用"""
+        self._holds += 1
+
+    def release(self):
+        """取消一次暂停，全部取消后继续细化"""
+        self._holds = max(0, self._holds - 1)
+        if not self._holds:
+            self._schedule()
+
+    def defer(self):
+        """推迟细化到现在之后 quiet_ms 毫秒（例如正在滚动）"""
+        self._quiet_until = time.monotonic() + self.quiet_ms / 1000
+        self._schedule()
+
+    def cancel(self):
+        """清空队列并取消后台任务（关闭前调用）"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        for ticket in self._in_flight.values():
+            self.async_loader.cancel(ticket)
+        self._in_flight.clear()
+        self._queue.clear()
+
+    def _schedule(self):
+        """安排下一次处理（滚动推迟期间延后到推迟结束）"""
+        if self._after_id is not None or not self._queue or self._holds:
+            return
+        remaining = int((self._quiet_until - time.monotonic()) * 1000)
+        if remaining > 0:
+            self._after_id = self.root.after(remaining, self._run)
+        else:
+            self._after_id = self.root.after_idle(self._run)
+
+    def _run(self):
+        """在空闲时提交细化任务，保持最多 max_in_flight 个在后台执行"""
+        self._after_id = None
+        if self._holds:
+            return
+        if time.monotonic() < self._quiet_until:
+            self._schedule()
+            return
+        while self._queue and len(self._in_flight) < self.max_in_flight:
+            key, img_info = self._queue.popitem(last=True)
+            self._in_flight[key] = self.async_loader.submit(
+                lambda img_info=img_info, size=key[1]: self.loader(img_info, size),
+                lambda img, error, key=key: self._on_done(key, img, error))
+
+    def _on_done(self, key, img, error):
+        """细化完成（主线程），替换图片后继续处理队列"""
+        if self._in_flight.pop(key, None) is None:
+            return
+        if error is not None:
+            print(f"细化图片错误: {str(error)}")
+        elif img is not None:
+            with PERF.measure("refine"):
+                self.on_refined(key, img)
+            self.refined += 1
+        self._schedule()
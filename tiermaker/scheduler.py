@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+刷新调度模块 - 合并同一轮事件循环中的多次修改，每个视图只刷新一次
+"""
+
+
+class RefreshScheduler:
+    """界面刷新调度类
+
+    修改模型的代码只调用 invalidate() 标记哪些视图（等级区域、仓库、配置保存）
+    需要更新；第一次标记时登记一个 after_idle 回调，事件循环空闲时按注册顺序
+    把被标记的视图各刷新一次。同一轮中无论发生多少次修改，每个视图都只刷新一次。
+    """
+
+    def __init__(self, root):
+        """初始化刷新调度器
+
+        Args:
+            root: Tk根窗口，用于登记空闲回调
+        """
+        self.root = root
+        self.flushes = 0
+        self._views = []  # (视图名, 刷新函数)，按注册顺序刷新
+        self._dirty = set()
+        self._idle_id = None
+
+    def register(self, name, refresh_fn):
+        """注册一个视图
+
+        Args:
+            name: 视图名
+            refresh_fn: 刷新函数（无参数，在主线程中调用）
+        """
+        self._views.append((name, refresh_fn))
+
+    def invalidate(self, *names):
+        """标记视图需要刷新，在事件循环空闲时统一刷新
+
+        Args:
+            names: 视图名
+        """
+        self._dirty.update(names)
+        if self._idle_id is None:
+            self._idle_id = self.root.after_idle(self.flush)
+
+    def flush(self, *names):
+        """立即刷新被标记的视图（也由空闲回调调用）
+
+        Args:
+            names: 只刷新这些视图（其余标记保留到下一次刷新），为空时刷新全部
+        """
+        if names:
+            dirty = self._dirty.intersection(names)
+            self._dirty.difference_update(dirty)
+        else:
+            if self._idle_id is not None:
+                self.root.after_cancel(self._idle_id)
+                self._idle_id = None
+            dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        self.flushes += 1
+        for name, refresh_fn in self._views:
+            if name in dirty:
+                try:
+                    refresh_fn()
+                except Exception as e:
+                    print(f"刷新 {name} 错误: {str(e)}")
+
+    def cancel(self):
+        """取消尚未执行的刷新（关闭窗口前调用）"""
+        if self._idle_id is not None:
+            self.root.after_cancel(self._idle_id)
+            self._idle_id = None
+        self._dirty.clear()
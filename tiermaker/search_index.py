@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+搜索索引模块 - 按原始文件名和标签搜索图片的内存倒排索引
+"""
+
+import os
+import re
+import unicodedata
+from bisect import bisect_left
+
+from tiermaker.instrumentation import PERF
+
+# 按字切分的文字：中日韩统一表意文字（含扩展A和兼容区）、假名、韩文音节
+_CJK = "㐀-䶿一-鿿豈-﫿぀-ヿ가-힯"
+# 词元：连续的中日韩文字，或连续的其他字母和数字（下划线、标点和空白都是分隔符）
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[^\\W_{_CJK}]+")
+_CJK_RE = re.compile(f"[{_CJK}]")
+
+
+def normalize_text(text):
+    """统一全角半角和大小写"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def tokenize(text):
+    """把文本切分为词元（已统一大小写）
+
+    Args:
+        text: 文本
+
+    Returns:
+        list: 词元列表，中日韩文字连续的部分作为一个词元
+    """
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+def is_cjk(token):
+    """词元是否由中日韩文字组成"""
+    return bool(_CJK_RE.match(token))
+
+
+def index_terms(token):
+    """一个词元在索引中对应的词项
+
+    字母数字词元直接作为词项（查询时按前缀匹配）；中日韩词元没有空格分词，
+    索引其中的每个字和每两个相邻字组成的二元组，任意长度的子串都可以由二元组查出。
+    """
+    if not is_cjk(token):
+        return [token]
+    return list(token) + [token[i:i + 2] for i in range(len(token) - 1)]
+
+
+def searchable_text(img_info):
+    """图片参与搜索的文本：去掉扩展名的原始文件名和所有标签"""
+    name = os.path.splitext(img_info.get("original_name") or "")[0]
+    return " ".join([name] + [str(tag) for tag in img_info.get("tags", [])])
+
+
+class SearchIndex:
+    """图片搜索索引类
+
+    维护 词项 -> 图片ID集合 的倒排索引，添加和移除图片时只更新该图片的词项。
+    查询时每个词元独立匹配后取交集：字母数字按前缀匹配（在排好序的词项列表中
+    二分查找，输入一半的单词也能找到），中日韩文字按二元组求交集后再用原文校验，
+    因此 "柴犬" 能匹配 "黑柴犬01"，输入时每次按键都可以重新查询。
+    """
+
+    def __init__(self):
+        """初始化搜索索引"""
+        self._postings = {}  # 词项 -> 图片ID集合
+        self._doc_terms = {}  # 图片ID -> 词项集合（移除时使用）
+        self._doc_text = {}  # 图片ID -> 统一大小写后的文本（校验中日韩子串）
+        self._sorted_terms = None  # 排好序的词项列表，词项增删后重新排序
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def rebuild(self, images):
+        """根据图片列表重建整个索引（切换或整体替换排行榜后调用）
+
+        Args:
+            images: 图片信息字典列表
+        """
+        self._postings = {}
+        self._doc_terms = {}
+        self._doc_text = {}
+        self._sorted_terms = None
+        for img_info in images:
+            self.add(img_info)
+
+    def add(self, img_info):
+        """加入（或更新）一张图片
+
+        Args:
+            img_info: 图片信息字典
+        """
+        image_id = img_info["id"]
+        if image_id in self._doc_terms:
+            self.remove(img_info)
+        text = searchable_text(img_info)
+        terms = set()
+        for token in tokenize(text):
+            terms.update(index_terms(token))
+        for term in terms:
+            ids = self._postings.get(term)
+            if ids is None:
+                ids = self._postings[term] = set()
+                self._sorted_terms = None
+            ids.add(image_id)
+        self._doc_terms[image_id] = terms
+        self._doc_text[image_id] = normalize_text(text)
+
+    def remove(self, img_info):
+        """移除一张图片
+
+        Args:
+            img_info: 图片信息字典
+        """
+        image_id = img_info["id"]
+        terms = self._doc_terms.pop(image_id, None)
+        if terms is None:
+            return
+        self._doc_text.pop(image_id, None)
+        for term in terms:
+            ids = self._postings.get(term)
+            if ids is None:
+                continue
+            ids.discard(image_id)
+            if not ids:
+                del self._postings[term]
+                self._sorted_terms = None
+
+    def search(self, query):
+        """查询匹配的图片ID
+
+        Args:
+            query: 查询文本，多个词元之间是"并且"的关系
+
+        Returns:
+            set: 匹配的图片ID集合，查询为空时返回None（表示不过滤）
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        # 先处理匹配图片少的词元，交集很快缩小
+        candidates = sorted((self._match(token) for token in tokens), key=len)
+        result = set(candidates[0])
+        for ids in candidates[1:]:
+            if not result:
+                break
+            result &= ids
+        # 二元组只说明每一对相邻字都出现过，用原文确认是连续的子串
+        for token in tokens:
+            if is_cjk(token) and len(token) > 2:
+                result = {image_id for image_id in result if token in self._doc_text[image_id]}
+        return result
+
+    def filter(self, images, query):
+        """按查询过滤图片列表，保持原来的顺序
+
+        Args:
+            images: 图片信息字典列表
+            query: 查询文本
+
+        Returns:
+            list: 匹配的图片（查询为空时返回原列表）
+        """
+        with PERF.measure("search"):
+            ids = self.search(query)
+            if ids is None:
+                return images
+            return [img_info for img_info in images if img_info["id"] in ids]
+
+    def _match(self, token):
+        """一个查询词元匹配的图片ID集合"""
+        if is_cjk(token):
+            if len(token) == 1:
+                return self._postings.get(token, set())
+            # 所有相邻二元组都出现的图片
+            grams = [token[i:i + 2] for i in range(len(token) - 1)]
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            return set.intersection(*postings)
+        # 字母数字按前缀匹配：在排好序的词项列表中找出所有以该词元开头的词项
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = self._sorted_terms
+        matched = set()
+        for index in range(bisect_left(terms, token), len(terms)):
+            term = terms[index]
+            if not term.startswith(token):
+                break
+            matched |= self._postings[term]
+        return matched
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+尺寸常量模块 - 界面中使用的缩略图尺寸（不依赖PIL，界面模块可以直接导入）
+"""
+
+TILE_SIZE = (70, 70)  # 等级行和仓库中的图片（默认大小）
+DRAG_ICON_SIZE = (50, 50)  # 拖动图标
+
+# 缩略图金字塔各级的边长：其他尺寸只从最接近的一级缩放，不再读取原图
+MIP_LEVELS = (32, 64, 128, 256)
+
+# 可选的图片大小（视图 > 图片大小），最大一级的两倍正好是金字塔的最高级
+TILE_EDGES = (48, 70, 96, 128)
+TILE_EDGE_LABELS = {48: "小", 70: "中", 96: "大", 128: "特大"}
+
+# 高分辨率导出的缩放倍数
+HIDPI_SCALE = 2
+
+
+def mip_level(edge):
+    """选择用于生成某个边长的缩略图的金字塔级别
+
+    Args:
+        edge: 目标边长（像素）
+
+    Returns:
+        int: 不小于目标边长的最小一级，目标比最高级还大时返回最高级
+    """
+    for level in MIP_LEVELS:
+        if level >= edge:
+            return level
+    return MIP_LEVELS[-1]
+
+
+def tile_size(edge):
+    """把设置中的图片边长转换为图片大小，无效的值使用默认大小
+
+    Args:
+        edge: 图片边长（像素）
+
+    Returns:
+        tuple: (宽, 高)
+    """
+    try:
+        edge = int(edge)
+    except (TypeError, ValueError):
+        return TILE_SIZE
+    if edge not in TILE_EDGES:
+        return TILE_SIZE
+    return (edge, edge)
@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+SQLite存储模块 - 在一个数据库中保存多个排行榜
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    journal_seq INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tiers (
+    id INTEGER PRIMARY KEY,
+    list_id INTEGER NOT NULL REFERENCES lists(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    color TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tiers_by_list ON tiers(list_id, position);
+CREATE TABLE IF NOT EXISTS images (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    original_name TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS memberships (
+    list_id INTEGER NOT NULL REFERENCES lists(id) ON DELETE CASCADE,
+    tier_id INTEGER REFERENCES tiers(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    image_id TEXT NOT NULL REFERENCES images(id),
+    PRIMARY KEY (list_id, image_id)
+);
+CREATE INDEX IF NOT EXISTS memberships_by_slot ON memberships(list_id, tier_id, position);
+CREATE INDEX IF NOT EXISTS memberships_by_image ON memberships(image_id);
+"""
+
+# 每页读取的成员数
+DEFAULT_PAGE_SIZE = 1000
+# images 表中单独成列的图片信息字段，其余字段（例如 tags）以JSON保存在 extra 列
+IMAGE_COLUMNS = ("id", "filename", "original_name")
+
+
+def image_row(img_info):
+    """把图片信息转换为 images 表的一行"""
+    extra = {key: value for key, value in img_info.items() if key not in IMAGE_COLUMNS}
+    return (img_info["id"], img_info["filename"], img_info.get("original_name"),
+            json.dumps(extra, ensure_ascii=False) if extra else None)
+
+
+def image_info(row):
+    """把 images 表的一行转换回图片信息"""
+    image_id, filename, original_name, extra = row
+    img_info = {"id": image_id, "filename": filename, "original_name": original_name}
+    if extra:
+        img_info.update(json.loads(extra))
+    return img_info
+
+
+class SQLiteStorage:
+    """SQLite排行榜存储类
+
+    表结构：lists（排行榜）、tiers（等级，按 position 排序）、images（图片信息）、
+    memberships（图片属于哪个排行榜的哪个等级及位置，tier_id 为 NULL 表示仓库）。
+    图片信息中除 id、filename、original_name 之外的字段保存在 images.extra 中，
+    与 config.json 一样完整保留。
+    所有查询都带 list_id 并走索引，打开一个排行榜的开销只与它自己的大小有关。
+    连接可以被主线程和后台保存线程共用，访问由锁串行化。
+    """
+
+    def __init__(self, db_path):
+        """初始化存储并创建表
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        # 自动提交模式，事务由 transaction() 显式管理
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """升级旧版本创建的数据库"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(images)")}
+        if "extra" not in columns:
+            self._conn.execute("ALTER TABLE images ADD COLUMN extra TEXT")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """批量更新的事务：全部成功后提交，出错时回滚
+
+        Yields:
+            sqlite3.Connection: 数据库连接
+        """
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_meta(self, key, default=None):
+        """读取一个全局设置值（JSON）"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value, conn=None):
+        """写入一个全局设置值（JSON）"""
+        with self._lock:
+            (conn or self._conn).execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                         (key, json.dumps(value, ensure_ascii=False)))
+
+    def list_tierlists(self):
+        """获取所有排行榜
+
+        Returns:
+            list: (排行榜ID, 名称, 图片数量)，按最近修改时间排列
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT l.id, l.name, (SELECT COUNT(*) FROM memberships m WHERE m.list_id = l.id) "
+                "FROM lists l ORDER BY l.updated DESC").fetchall()
+
+    def list_name(self, list_id):
+        """获取排行榜名称，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT name FROM lists WHERE id = ?", (list_id,)).fetchone()
+        return row[0] if row else None
+
+    def create_tierlist(self, name, tiers=()):
+        """创建排行榜
+
+        Args:
+            name: 排行榜名称
+            tiers: 初始等级（只使用 name 和 color）
+
+        Returns:
+            int: 新排行榜的ID
+        """
+        with self.transaction() as conn:
+            list_id = conn.execute("INSERT INTO lists (name, updated) VALUES (?, ?)",
+                                   (name, time.time())).lastrowid
+            conn.executemany("INSERT INTO tiers (list_id, position, name, color) VALUES (?, ?, ?, ?)",
+                             [(list_id, i, t["name"], t["color"]) for i, t in enumerate(tiers)])
+        return list_id
+
+    def rename_tierlist(self, list_id, name):
+        """重命名排行榜"""
+        with self.transaction() as conn:
+            conn.execute("UPDATE lists SET name = ? WHERE id = ?", (name, list_id))
+
+    def delete_tierlist(self, list_id):
+        """删除排行榜及其等级和成员关系
+
+        Returns:
+            list: 该排行榜中的图片信息（调用方负责从图片存储中释放）
+        """
+        images = [img_info for _, page in self.iter_memberships(list_id) for img_info in page]
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM lists WHERE id = ?", (list_id,))
+            self._delete_orphan_images(conn, [img_info["id"] for img_info in images])
+        return images
+
+    def rename_images(self, renamed):
+        """更新图片的存储路径
+
+        Args:
+            renamed: {图片ID: 新文件名}
+        """
+        with self.transaction() as conn:
+            conn.executemany("UPDATE images SET filename = ? WHERE id = ?",
+                             [(filename, image_id) for image_id, filename in renamed.items()])
+
+    def load_page(self, list_id, tier_id, start=0, limit=DEFAULT_PAGE_SIZE):
+        """读取一个容器中的一页图片
+
+        位置在保存时是连续编号的，因此按位置范围查询即可走 (list_id, tier_id, position) 索引，
+        读取任意一页都不需要跳过前面的行。
+
+        Args:
+            list_id: 排行榜ID
+            tier_id: 等级ID，None 表示仓库
+            start: 起始位置
+            limit: 最多读取的图片数
+
+        Returns:
+            list: 图片信息列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT i.id, i.filename, i.original_name, i.extra FROM memberships m "
+                "JOIN images i ON i.id = m.image_id "
+                "WHERE m.list_id = ? AND m.tier_id IS ? AND m.position >= ? AND m.position < ? "
+                "ORDER BY m.position",
+                (list_id, tier_id, start, start + limit)).fetchall()
+        return [image_info(row) for row in rows]
+
+    def tier_ids(self, list_id):
+        """获取排行榜的等级ID（按顺序）"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT id FROM tiers WHERE list_id = ? ORDER BY position", (list_id,))]
+
+    def iter_memberships(self, list_id, page_size=DEFAULT_PAGE_SIZE):
+        """按页读取排行榜中的图片（仓库在前，然后按等级顺序）
+
+        Args:
+            list_id: 排行榜ID
+            page_size: 每页的图片数
+
+        Yields:
+            tuple: (等级ID或None, 图片信息列表)
+        """
+        for tier_id in [None] + self.tier_ids(list_id):
+            start = 0
+            while True:
+                page = self.load_page(list_id, tier_id, start, page_size)
+                if page:
+                    yield tier_id, page
+                if len(page) < page_size:
+                    break
+                start += page_size
+
+    def load_tierlist(self, list_id, page_size=DEFAULT_PAGE_SIZE):
+        """加载排行榜为配置字典（与 config.json 的格式相同）
+
+        每个容器按位置范围分页查询，单次查询的大小有上限；但所有页都会读入配置，
+        因为位置索引、搜索索引和保存快照都需要完整的模型。界面只为可见的图片
+        创建控件（等级行由 stream_tier_images 分批显示），不随排行榜的大小一次性创建。
+
+        Returns:
+            dict: 配置，排行榜不存在时返回None
+        """
+        # 整个读取过程持有锁，避免后台保存线程在两次查询之间改写等级
+        with self._lock:
+            row = self._conn.execute("SELECT journal_seq FROM lists WHERE id = ?", (list_id,)).fetchone()
+            if row is None:
+                return None
+            tier_rows = self._conn.execute(
+                "SELECT id, name, color FROM tiers WHERE list_id = ? ORDER BY position", (list_id,)).fetchall()
+
+            tiers = []
+            containers = {None: []}
+            for tier_id, name, color in tier_rows:
+                tier = {"name": name, "color": color, "images": []}
+                tiers.append(tier)
+                containers[tier_id] = tier["images"]
+            for tier_id, page in self.iter_memberships(list_id, page_size):
+                containers[tier_id].extend(page)
+        return {"version": self.get_meta("version", 1), "tiers": tiers, "repository_images": containers[None],
+                "journal_seq": row[0], "settings": self.get_meta("settings", {})}
+
+    def save_tierlist(self, list_id, config):
+        """在一个事务中保存整个排行榜（只改写该排行榜中有变化的行）
+
+        与数据库中已保存的内容按图片ID比较：等级按位置对应，只更新名称或颜色变化的等级；
+        图片信息变化或新加入的图片才写入 images 表；容器或位置变化的成员关系才更新，
+        移出排行榜的图片删除成员关系。移动一张图片只改写源容器和目标容器中位置变化的行。
+
+        Args:
+            list_id: 排行榜ID
+            config: 配置字典（与 config.json 的格式相同）
+        """
+        with self.transaction() as conn:
+            conn.execute("UPDATE lists SET journal_seq = ?, updated = ? WHERE id = ?",
+                         (config.get("journal_seq", 0), time.time(), list_id))
+            # 已保存的图片：图片ID -> images 表的行；图片ID -> (等级ID, 位置)
+            saved_rows = {}
+            slots = {}
+            for row in conn.execute(
+                    "SELECT i.id, i.filename, i.original_name, i.extra, m.tier_id, m.position "
+                    "FROM memberships m JOIN images i ON i.id = m.image_id WHERE m.list_id = ?", (list_id,)):
+                saved_rows[row[0]] = row[:4]
+                slots[row[0]] = (row[4], row[5])
+            tier_ids, deleted_tiers = self._save_tiers(conn, list_id, config.get("tiers", []))
+            # 被删除的等级中的成员关系已级联删除，仍在排行榜中的图片按新加入处理
+            for image_id, slot in list(slots.items()):
+                if slot[0] in deleted_tiers:
+                    del slots[image_id]
+
+            containers = [(None, config.get("repository_images", []))]
+            containers.extend(zip(tier_ids, (tier.get("images", []) for tier in config.get("tiers", []))))
+            image_rows = []
+            moved = []
+            added = []
+            for tier_id, images in containers:
+                for position, img_info in enumerate(images):
+                    row = image_row(img_info)
+                    if saved_rows.pop(row[0], None) != row:
+                        image_rows.append(row)
+                    slot = slots.pop(row[0], None)
+                    if slot is None:
+                        added.append((list_id, tier_id, position, row[0]))
+                    elif slot != (tier_id, position):
+                        moved.append((tier_id, position, list_id, row[0]))
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO images (id, filename, original_name, extra) VALUES (?, ?, ?, ?)",
+                image_rows)
+            conn.executemany("UPDATE memberships SET tier_id = ?, position = ? WHERE list_id = ? AND image_id = ?",
+                             moved)
+            conn.executemany("INSERT INTO memberships (list_id, tier_id, position, image_id) VALUES (?, ?, ?, ?)",
+                             added)
+            # 剩下的是移出排行榜的图片（所在等级被删除的已没有成员关系，只需检查图片信息）
+            conn.executemany("DELETE FROM memberships WHERE list_id = ? AND image_id = ?",
+                             [(list_id, image_id) for image_id in slots])
+            for key in ("version", "settings"):
+                if key in config:
+                    self.set_meta(key, config[key], conn)
+            self._delete_orphan_images(conn, list(saved_rows))
+
+    @staticmethod
+    def _save_tiers(conn, list_id, tiers):
+        """按位置对应保存等级，只改写变化的等级
+
+        多出的旧等级被删除时，其中的成员关系由外键级联删除。
+
+        Returns:
+            tuple: (与 tiers 顺序对应的等级ID列表, 被删除的等级ID集合)
+        """
+        old_rows = conn.execute("SELECT id, name, color FROM tiers WHERE list_id = ? ORDER BY position",
+                                (list_id,)).fetchall()
+        tier_ids = []
+        for position, tier in enumerate(tiers):
+            if position < len(old_rows):
+                tier_id, name, color = old_rows[position]
+                if (name, color) != (tier["name"], tier["color"]):
+                    conn.execute("UPDATE tiers SET name = ?, color = ? WHERE id = ?",
+                                 (tier["name"], tier["color"], tier_id))
+            else:
+                tier_id = conn.execute(
+                    "INSERT INTO tiers (list_id, position, name, color) VALUES (?, ?, ?, ?)",
+                    (list_id, position, tier["name"], tier["color"])).lastrowid
+            tier_ids.append(tier_id)
+        deleted = {row[0] for row in old_rows[len(tiers):]}
+        conn.executemany("DELETE FROM tiers WHERE id = ?", [(tier_id,) for tier_id in deleted])
+        return tier_ids, deleted
+
+    @staticmethod
+    def _delete_orphan_images(conn, image_ids):
+        """删除给定图片中不再属于任何排行榜的图片信息（只检查这些图片，不扫描整个表）"""
+        conn.executemany("DELETE FROM images WHERE id = ? AND NOT EXISTS "
+                         "(SELECT 1 FROM memberships m WHERE m.image_id = ?)",
+                         [(image_id, image_id) for image_id in image_ids])
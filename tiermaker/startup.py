@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+启动计时模块 - 记录启动各阶段的耗时（包括首帧显示时间）
+"""
+
+import os
+import json
+import time
+
+# 本模块被导入的时刻，作为启动计时的起点（主模块最先导入本模块）
+STARTED = time.perf_counter()
+
+# 各阶段的显示名称
+PHASE_LABELS = {
+    "imports": "导入模块",
+    "window": "创建窗口",
+    "config": "读取配置",
+    "layout": "创建界面",
+    "first_paint": "等待显示",
+    "image_processor": "图片处理器",
+    "dnd": "拖放支持",
+    "repository": "仓库图片",
+    "tiles": "等级图片",
+}
+
+
+class StartupTimer:
+    """启动计时类
+
+    每次调用 mark() 记录从上一阶段结束到现在的耗时。设置环境变量
+    TIERMAKER_STARTUP_LOG 为文件路径时，report() 会把结果追加为一行JSON，
+    便于持续跟踪首帧时间等指标。
+    """
+
+    def __init__(self, start=STARTED):
+        """初始化计时器
+
+        Args:
+            start: 计时起点（time.perf_counter() 的值）
+        """
+        self.start = start
+        self._last = start
+        self.phases = []  # (阶段名, 耗时毫秒, 从起点到阶段结束的毫秒)
+        self.reported = False
+
+    def mark(self, phase):
+        """结束一个阶段
+
+        Args:
+            phase: 阶段名（见 PHASE_LABELS）
+
+        Returns:
+            float: 该阶段的耗时（毫秒）
+        """
+        now = time.perf_counter()
+        duration = (now - self._last) * 1000
+        self.phases.append((phase, duration, (now - self.start) * 1000))
+        self._last = now
+        return duration
+
+    def elapsed(self, phase):
+        """获取从起点到某个阶段结束的毫秒数，阶段未记录时返回None"""
+        for name, _, since_start in self.phases:
+            if name == phase:
+                return round(since_start, 2)
+        return None
+
+    def as_dict(self):
+        """以字典形式返回计时结果"""
+        return {
+            "phases": {name: round(duration, 2) for name, duration, _ in self.phases},
+            "first_paint_ms": self.elapsed("first_paint"),
+            "total_ms": round(self.phases[-1][2], 2) if self.phases else 0.0,
+        }
+
+    def report(self):
+        """打印各阶段耗时，需要时追加写入启动日志（只报告一次）"""
+        if self.reported:
+            return
+        self.reported = True
+        result = self.as_dict()
+        parts = [f"{PHASE_LABELS.get(name, name)} {duration:.1f}ms" for name, duration, _ in self.phases]
+        print(f"启动耗时: {', '.join(parts)}; 首帧 {result['first_paint_ms'] or 0:.1f}ms, "
+              f"合计 {result['total_ms']:.1f}ms")
+
+        log_path = os.environ.get("TIERMAKER_STARTUP_LOG")
+        if log_path:
+            try:
+                with open(log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(dict(result, time=time.time()), ensure_ascii=False) + "\n")
+            except Exception as e:
+                print(f"写入启动日志错误: {str(e)}")
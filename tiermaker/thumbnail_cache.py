@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+缩略图缓存模块 - 在磁盘上缓存预先缩放好的缩略图
+"""
+
+import os
+import json
+import hashlib
+import threading
+from PIL import Image
+
+from tiermaker.instrumentation import PERF
+from tiermaker.sizes import MIP_LEVELS, mip_level
+
+
+def file_hash(path):
+    """计算文件内容的哈希（sha1 十六进制）"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ThumbnailCache:
+    """缩略图缓存类，负责生成、读取和失效磁盘上的缩略图
+
+    每张源图片只解码一次，生成 "内容哈希_mip边长.png" 的缩略图金字塔
+    （MIP_LEVELS 各级）；界面和导出需要的其他尺寸以 "内容哈希_宽x高_滤镜.png"
+    命名，从最接近的一级缩放生成。文件名包含内容哈希，因此源文件内容改变后
+    会自动对应到新的缓存项。源文件的哈希按 (大小, 修改时间) 记忆在
+    index.json 中，避免每次都重新读取整个源文件。
+    已有的缩略图文件名在第一次查询时一次性读入内存。
+    可以在后台加载线程中并发使用。
+    """
+
+    def __init__(self, cache_dir):
+        """初始化缩略图缓存
+
+        Args:
+            cache_dir: 缩略图缓存目录
+        """
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, "index.json")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # 源文件路径 -> {"size": 字节数, "mtime": 修改时间(ns), "hash": 内容哈希}
+        self._index = self._load_index()
+        self._dirty = False
+        # 上次 flush() 或 take_updates() 之后新计算的哈希（导出工作进程交给主进程合并写入）
+        self._updates = {}
+        self._lock = threading.Lock()
+        # 缓存目录中已有的文件名，第一次查询时用一次 os.scandir 读取，之后不再逐个 stat
+        self._known = None
+        # 内容哈希 -> 该哈希的缓存文件名，删除某张图片的缩略图时不需要遍历目录
+        self._by_hash = {}
+
+    def _load_index(self):
+        """加载源文件哈希索引"""
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"加载缩略图索引错误: {str(e)}")
+        return {}
+
+    def flush(self):
+        """将哈希索引原子地写回磁盘（仅在有修改时）
+
+        先写入本进程和线程专用的临时文件再重命名，写入中途崩溃或多个进程
+        同时写入时，index.json 始终是某一次完整的写入。
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._index)
+            self._dirty = False
+            self._updates = {}
+        tmp_path = f"{self.index_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_file)
+        except Exception as e:
+            print(f"保存缩略图索引错误: {str(e)}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def content_hash(self, src_path):
+        """获取源文件的内容哈希，文件未变化时直接使用记忆的结果
+
+        Args:
+            src_path: 源图片路径
+
+        Returns:
+            str: 内容哈希（sha1 十六进制）
+        """
+        st = os.stat(src_path)
+        key = os.path.abspath(src_path)
+        with self._lock:
+            entry = self._index.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns:
+            return entry["hash"]
+
+        content_hash = file_hash(src_path)
+
+        # 源文件内容已改变，删除旧哈希对应的缩略图
+        if entry and entry["hash"] != content_hash:
+            self._remove_thumbnails(entry["hash"])
+
+        with self._lock:
+            self._index[key] = self._updates[key] = {"size": st.st_size, "mtime": st.st_mtime_ns,
+                                                     "hash": content_hash}
+            self._dirty = True
+        return content_hash
+
+    def take_updates(self):
+        """取出上次 flush() 或 take_updates() 之后新计算的哈希
+
+        多个进程共用一个缓存目录时，工作进程不写 index.json，
+        而是把新增的记录交给一个进程用 merge() 合并后统一写入。
+
+        Returns:
+            dict: 源文件路径 -> 哈希记录
+        """
+        with self._lock:
+            updates, self._updates = self._updates, {}
+        return updates
+
+    def merge(self, updates):
+        """合并其他进程计算的哈希记录（之后由 flush() 写入）
+
+        Args:
+            updates: take_updates() 的返回值
+        """
+        if not updates:
+            return
+        with self._lock:
+            self._index.update(updates)
+            self._dirty = True
+
+    def has_file(self, path):
+        """检查缓存目录中的文件是否存在（只查询内存中的文件名集合）"""
+        with self._lock:
+            self._load_known()
+            return os.path.basename(path) in self._known
+
+    def _load_known(self):
+        """第一次使用时读取缓存目录中的文件名（调用方持有锁）"""
+        if self._known is not None:
+            return
+        with os.scandir(self.cache_dir) as entries:
+            self._known = {entry.name for entry in entries if not entry.name.endswith(".tmp")}
+        self._by_hash = {}
+        for name in self._known:
+            self._by_hash.setdefault(name.split("_", 1)[0], set()).add(name)
+
+    def _forget(self, path):
+        """缓存文件被删除（或在外部丢失）后从文件名集合中移除"""
+        name = os.path.basename(path)
+        with self._lock:
+            if self._known is not None:
+                self._known.discard(name)
+                names = self._by_hash.get(name.split("_", 1)[0])
+                if names is not None:
+                    names.discard(name)
+
+    def thumbnail_path(self, content_hash, size, resample=Image.LANCZOS):
+        """计算缩略图在缓存中的路径"""
+        return os.path.join(self.cache_dir, f"{content_hash}_{size[0]}x{size[1]}_{int(resample)}.png")
+
+    def level_path(self, content_hash, level):
+        """计算缩略图金字塔某一级在缓存中的路径"""
+        return os.path.join(self.cache_dir, f"{content_hash}_mip{level}.png")
+
+    def cached_path(self, content_hash, size, resample=Image.LANCZOS):
+        """计算某个尺寸的缩略图实际使用的缓存路径
+
+        尺寸正好是金字塔的一级（并使用 LANCZOS）时就是该级的文件，否则是单独的缩略图文件。
+        """
+        size = tuple(size)
+        level = mip_level(max(size))
+        if size == (level, level) and resample == Image.LANCZOS:
+            return self.level_path(content_hash, level)
+        return self.thumbnail_path(content_hash, size, resample)
+
+    def ensure_pyramid(self, src_path, content_hash=None):
+        """确保缩略图金字塔（MIP_LEVELS 各级）存在，缺少时解码一次源文件生成
+
+        最高一级从源文件缩放，其余各级依次从上一级缩小一半，
+        之后任何尺寸的缩略图都只从金字塔中缩放，不再读取源文件。
+
+        Args:
+            src_path: 源图片路径
+            content_hash: 已知的内容哈希，为None时计算
+
+        Returns:
+            str: 内容哈希
+        """
+        if content_hash is None:
+            content_hash = self.content_hash(src_path)
+        paths = [self.level_path(content_hash, level) for level in MIP_LEVELS]
+        if all(self.has_file(path) for path in paths):
+            return content_hash
+        top = MIP_LEVELS[-1]
+        with PERF.measure("pyramid"):
+            with Image.open(src_path) as img:
+                # 未规范化的大尺寸 JPEG 直接以缩小的比例解码
+                img.draft(img.mode, (top, top))
+                level_img = self._normalize_mode(img).resize((top, top), Image.LANCZOS)
+            for level, path in zip(reversed(MIP_LEVELS), reversed(paths)):
+                if level_img.size != (level, level):
+                    level_img = level_img.resize((level, level), Image.LANCZOS)
+                if not self.has_file(path):
+                    self._write_png(level_img, path)
+        return content_hash
+
+    def ensure_thumbnail(self, src_path, size, resample=Image.LANCZOS, content_hash=None):
+        """确保缩略图存在，不存在时从最接近的金字塔级别缩放生成
+
+        Args:
+            src_path: 源图片路径
+            size: 缩略图大小
+            resample: 缩放滤镜
+            content_hash: 已知的内容哈希（例如按内容寻址存储的文件），为None时计算
+
+        Returns:
+            str: 缩略图路径（尺寸正好是金字塔的一级时为该级的路径）
+        """
+        if content_hash is None:
+            content_hash = self.content_hash(src_path)
+        size = tuple(size)
+        level_path = self.level_path(content_hash, mip_level(max(size)))
+        thumb_path = self.cached_path(content_hash, size, resample)
+        if thumb_path == level_path:
+            if not self.has_file(level_path):
+                self.ensure_pyramid(src_path, content_hash)
+            return level_path
+        if not self.has_file(thumb_path):
+            if not self.has_file(level_path):
+                self.ensure_pyramid(src_path, content_hash)
+            with PERF.measure("resize"), Image.open(level_path) as img:
+                thumb = img.resize(size, resample)
+            self._write_png(thumb, thumb_path)
+        return thumb_path
+
+    def _write_png(self, img, path):
+        """先写入临时文件再重命名，避免留下不完整的缩略图（并发生成时每个进程和线程各用各的临时文件）"""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, format="PNG", compress_level=1)
+        os.replace(tmp_path, path)
+        self._remember(path)
+
+    def _remember(self, path):
+        """新写入的缓存文件加入文件名集合"""
+        name = os.path.basename(path)
+        with self._lock:
+            if self._known is not None:
+                self._known.add(name)
+                self._by_hash.setdefault(name.split("_", 1)[0], set()).add(name)
+
+    def put_thumbnail(self, content_hash, size, data, resample=Image.LANCZOS):
+        """直接写入已经生成好的缩略图（例如排行榜包中预生成的PNG），已存在时跳过
+
+        Args:
+            content_hash: 源图片的内容哈希
+            size: 缩略图大小
+            data: PNG数据
+            resample: 生成缩略图时使用的滤镜
+        """
+        # 尺寸正好是金字塔的一级时写入该级，ensure_thumbnail 和 get_preview 直接使用
+        thumb_path = self.cached_path(content_hash, size, resample)
+        if self.has_file(thumb_path):
+            return
+        tmp_path = f"{thumb_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, thumb_path)
+        self._remember(thumb_path)
+
+    def get_thumbnail(self, src_path, size, resample=Image.LANCZOS, content_hash=None):
+        """读取缩略图（必要时生成）
+
+        Returns:
+            Image: 已加载到内存的缩略图
+        """
+        if content_hash is None:
+            content_hash = self.content_hash(src_path)
+        try:
+            thumb_path = self.ensure_thumbnail(src_path, size, resample, content_hash)
+            with PERF.measure("decode"):
+                thumb = Image.open(thumb_path)
+                thumb.load()  # 单帧图片加载后会自动关闭文件
+        except FileNotFoundError:
+            # 缓存文件在程序运行期间被删除：重新生成一次
+            self._forget_hash_files(content_hash)
+            thumb_path = self.ensure_thumbnail(src_path, size, resample, content_hash)
+            thumb = Image.open(thumb_path)
+            thumb.load()
+        return thumb
+
+    def get_preview(self, src_path, size, content_hash=None):
+        """快速获取缩略图：已缓存时读取缩略图，否则用低成本的滤镜生成预览
+
+        预览优先从已有的金字塔级别用 BILINEAR 缩放；连金字塔都没有时，
+        从源文件按比例解码（JPEG）并用 reduce() 整数倍缩小后再缩放，
+        不使用 LANCZOS，也不写入缓存。
+
+        Args:
+            src_path: 源图片路径
+            size: 缩略图大小
+            content_hash: 已知的内容哈希，为None时计算
+
+        Returns:
+            tuple: (图片, 是否为最终质量)
+        """
+        if content_hash is None:
+            content_hash = self.content_hash(src_path)
+        size = tuple(size)
+        level = mip_level(max(size))
+        exact_path = self.cached_path(content_hash, size)
+        if self.has_file(exact_path):
+            try:
+                with PERF.measure("decode"):
+                    thumb = Image.open(exact_path)
+                    thumb.load()
+                return thumb, True
+            except FileNotFoundError:
+                self._forget_hash_files(content_hash)
+
+        with PERF.measure("preview"):
+            # 先找最接近的一级，其次是更大的级别，最后是更小的级别
+            for other in sorted(MIP_LEVELS, key=lambda l: (l < level, abs(l - level))):
+                path = self.level_path(content_hash, other)
+                if self.has_file(path):
+                    with Image.open(path) as img:
+                        return img.resize(size, Image.BILINEAR), False
+            with Image.open(src_path) as img:
+                img.draft(img.mode, size)
+                factor = min(img.width // size[0], img.height // size[1])
+                img = self._normalize_mode(img)
+                if factor > 1:
+                    img = img.reduce(factor)
+                return img.resize(size, Image.BILINEAR), False
+
+    def _normalize_mode(self, img):
+        """将调色板等模式转换为可以高质量缩放的模式"""
+        if img.mode in ("RGB", "RGBA"):
+            return img
+        return img.convert("RGBA")
+
+    def discard(self, content_hash):
+        """删除某个内容哈希对应的所有缩略图（源文件被删除后调用）"""
+        self._remove_thumbnails(content_hash)
+
+    def _forget_hash_files(self, content_hash):
+        """缓存文件在外部丢失：忘记同一内容哈希的所有缓存文件，之后按需重新生成"""
+        with self._lock:
+            if self._known is not None:
+                self._known.difference_update(self._by_hash.pop(content_hash, ()))
+
+    def _remove_thumbnails(self, content_hash):
+        """删除某个内容哈希对应的所有缩略图（按内存中的文件名，不遍历目录）"""
+        with self._lock:
+            self._load_known()
+            names = self._by_hash.pop(content_hash, set())
+            self._known.difference_update(names)
+        for name in names:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TierMaker - 排行榜制作工具
+排行榜包模块 - 读写包含配置、原图和预生成缩略图的单文件 .tierpack
+"""
+
+import io
+import os
+import json
+import mmap
+import struct
+import zipfile
+import threading
+
+from PIL import Image
+
+PACK_VERSION = 1
+CONFIG_MEMBER = "tierlist.json"
+INDEX_MEMBER = "index.json"
+COMMENT_PREFIX = b"tierpack:"
+
+# zip 本地文件头：固定部分30字节，文件名长度和扩展字段长度位于偏移 26 和 28
+_LOCAL_HEADER = struct.Struct("<26xHH")
+_LOCAL_HEADER_SIZE = 30
+# zip 中央目录结束记录：固定部分22字节，注释最长65535字节
+_END_RECORD_SIGNATURE = b"PK\x05\x06"
+_END_RECORD_SIZE = 22
+
+
+def image_member(filename):
+    """原图在包中的成员名"""
+    return f"images/{filename}"
+
+
+def original_member(filename, ext):
+    """保留的原图在包中的成员名（扩展名是原图自己的扩展名）"""
+    return f"originals/{os.path.splitext(filename)[0]}{ext.lower()}"
+
+
+def thumbnail_member(filename, size):
+    """缩略图在包中的成员名"""
+    return f"thumbnails/{size[0]}x{size[1]}/{filename}.png"
+
+
+def pack_entries(config):
+    """获取配置中的所有图片信息（仓库在前，然后按等级顺序）"""
+    entries = list(config.get("repository_images", []))
+    for tier in config.get("tiers", []):
+        entries.extend(tier.get("images", []))
+    return entries
+
+
+def _data_offsets(path, members):
+    """读取成员数据在文件中的偏移和长度
+
+    包中的成员都不压缩，数据紧跟在本地文件头之后，
+    因此按偏移直接切片即可读取，不需要经过 zipfile。
+    """
+    offsets = {}
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+        for info in zf.infolist():
+            if info.filename not in members:
+                continue
+            f.seek(info.header_offset)
+            name_length, extra_length = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER_SIZE))
+            data_offset = info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length
+            offsets[info.filename] = [data_offset, info.file_size]
+    return offsets
+
+
+def write_tierpack(path, config, images_dir, thumbnail_file, sizes, source_file=None):
+    """把排行榜写成 .tierpack 文件
+
+    包是不压缩（ZIP_STORED）的zip：tierlist.json、images/ 下的工作副本（或
+    originals/ 下保留的原图）、thumbnails/宽x高/ 下的缩略图，最后是记录每个成员
+    数据偏移和每张图片来源成员的 index.json。
+    index.json 自身的偏移写在zip注释中，打开时只需读取文件末尾。
+
+    Args:
+        path: 输出文件路径
+        config: 配置字典（tiers 和 repository_images）
+        images_dir: 原图所在目录
+        thumbnail_file: 函数 (图片信息, 尺寸) -> 缩略图PNG文件路径
+        sizes: 要包含的缩略图尺寸
+        source_file: 函数 (图片信息) -> 要打包的文件路径（例如保留的原图），
+            返回None或未提供时打包 images_dir 中的工作副本
+
+    Returns:
+        int: 写入的图片文件数
+    """
+    tmp_path = path + ".tmp"
+    written = set()
+    members = {CONFIG_MEMBER}
+    sources = {}  # 存储中的文件名 -> 包中保存图片内容的成员
+    try:
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as zf:
+            zf.writestr(CONFIG_MEMBER, json.dumps(
+                {"version": PACK_VERSION, "tiers": config.get("tiers", []),
+                 "repository_images": config.get("repository_images", [])},
+                ensure_ascii=False, separators=(",", ":")))
+            for img_info in pack_entries(config):
+                filename = img_info["filename"]
+                work_path = os.path.join(images_dir, filename)
+                src_path = (source_file(img_info) if source_file is not None else None) or work_path
+                if filename in written or not os.path.exists(src_path):
+                    continue
+                written.add(filename)
+                if os.path.abspath(src_path) == os.path.abspath(work_path):
+                    member = image_member(filename)
+                else:
+                    member = original_member(filename, os.path.splitext(src_path)[1])
+                zf.write(src_path, member)
+                members.add(member)
+                sources[filename] = member
+                for size in sizes:
+                    zf.write(thumbnail_file(img_info, size), thumbnail_member(filename, size))
+                    members.add(thumbnail_member(filename, size))
+
+        index = {"version": PACK_VERSION, "sizes": [list(size) for size in sizes],
+                 "sources": sources, "members": _data_offsets(tmp_path, members)}
+        with zipfile.ZipFile(tmp_path, "a", zipfile.ZIP_STORED) as zf:
+            zf.writestr(INDEX_MEMBER, json.dumps(index, ensure_ascii=False, separators=(",", ":")))
+        index_offset, index_length = _data_offsets(tmp_path, {INDEX_MEMBER})[INDEX_MEMBER]
+        with zipfile.ZipFile(tmp_path, "a") as zf:
+            zf.comment = COMMENT_PREFIX + f"{index_offset}:{index_length}".encode("ascii")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(written)
+
+
+class TierPack:
+    """只读的 .tierpack 文件
+
+    文件被内存映射，打开时只读取末尾的zip注释和 index.json，
+    之后每张缩略图或原图都按索引中的偏移直接切片读取，不解压也不遍历整个包。
+    可以在后台加载线程中并发读取。
+    """
+
+    def __init__(self, path):
+        """打开排行榜包
+
+        Args:
+            path: .tierpack 文件路径
+
+        Raises:
+            ValueError: 不是有效的排行榜包
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._index = self._read_index()
+            self.members = self._index["members"]
+            self.sizes = [tuple(size) for size in self._index.get("sizes", [])]
+            # 旧版本的包没有 sources，图片内容都在 images/ 下
+            self.sources = self._index.get("sources", {})
+        except Exception:
+            self.close()
+            raise
+
+    def _read_index(self):
+        """读取成员索引，优先使用zip注释中记录的偏移"""
+        tail_start = max(0, len(self._mmap) - _END_RECORD_SIZE - 0xFFFF)
+        end = self._mmap.rfind(_END_RECORD_SIGNATURE, tail_start)
+        if end >= 0:
+            comment = bytes(self._mmap[end + _END_RECORD_SIZE:])
+            if comment.startswith(COMMENT_PREFIX):
+                offset, length = (int(x) for x in comment[len(COMMENT_PREFIX):].split(b":"))
+                return json.loads(bytes(self._mmap[offset:offset + length]))
+
+        # 没有注释（例如被其他工具重新打包过）：读取中央目录
+        try:
+            with zipfile.ZipFile(self._file) as zf:
+                if INDEX_MEMBER in zf.namelist():
+                    return json.loads(zf.read(INDEX_MEMBER))
+                names = set(zf.namelist())
+        except zipfile.BadZipFile:
+            raise ValueError("不是有效的排行榜包")
+        return {"version": PACK_VERSION, "members": _data_offsets(self.path, names)}
+
+    def read_member(self, name):
+        """读取成员的全部数据，不存在时返回None"""
+        location = self.members.get(name)
+        if location is None:
+            return None
+        offset, length = location
+        with self._lock:
+            if self._mmap is None:
+                return None
+            return self._mmap[offset:offset + length]
+
+    def config(self):
+        """读取包中的排行榜配置"""
+        data = self.read_member(CONFIG_MEMBER)
+        if data is None:
+            raise ValueError("排行榜包中缺少 tierlist.json")
+        return json.loads(data)
+
+    def thumbnail(self, filename, size):
+        """读取预生成的缩略图，包中没有该尺寸时从最接近的尺寸缩放
+
+        Returns:
+            Image: 缩略图，包中没有该图片的缩略图时返回None
+        """
+        size = tuple(size)
+        source = size
+        if size not in self.sizes and self.sizes:
+            # 优先使用不小于目标的最小尺寸，缩小的质量好于放大
+            larger = [s for s in self.sizes if s[0] >= size[0] and s[1] >= size[1]]
+            source = min(larger) if larger else max(self.sizes)
+        data = self.read_member(thumbnail_member(filename, source))
+        if data is None:
+            return None
+        thumb = Image.open(io.BytesIO(data))
+        thumb.load()
+        if thumb.size != size:
+            thumb = thumb.resize(size, Image.LANCZOS)
+        return thumb
+
+    def extract(self, entries, store, thumbnail_cache, cancel_event=None, progress=None):
+        """把包中的原图加入图片存储，预生成的缩略图写入缩略图缓存（可在后台线程中调用）
+
+        每项图片使用自己的ID登记到存储。存储中的文件名由内容哈希决定，与包中的
+        文件名不一定相同（例如规范化后的工作副本），新文件名通过返回值交给主线程，
+        这里不修改图片信息字典（它们可能正被界面和保存线程共享）。
+
+        Args:
+            entries: 图片信息列表（ID应已重新分配）
+            store: ImageStore 图片存储
+            thumbnail_cache: ThumbnailCache 缩略图缓存
+            cancel_event: 设置后停止提取
+            progress: 进度回调，参数为 (已完成数, 总数)
+
+        Returns:
+            tuple: (包中缺少原图的图片信息列表, 存储路径改变的图片 {图片ID: 新文件名})
+        """
+        missing = []
+        renamed = {}
+        for done, img_info in enumerate(entries, 1):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            filename = img_info["filename"]
+            member = self.sources.get(filename, image_member(filename))
+            data = self.read_member(member)
+            if data is None:
+                missing.append(img_info)
+                continue
+            # 包中是原图时由存储重新规范化（保留原图的设置下原图也随之保留）
+            stored = store.add_stream(io.BytesIO(data), os.path.splitext(member)[1],
+                                      img_info.get("original_name"), image_id=img_info["id"])
+            content_hash = store.content_hash(stored)
+            for size in self.sizes:
+                thumb = self.read_member(thumbnail_member(filename, size))
+                if thumb is not None:
+                    thumbnail_cache.put_thumbnail(content_hash, size, thumb)
+            if stored["filename"] != filename:
+                renamed[img_info["id"]] = stored["filename"]
+            if progress is not None:
+                progress(done, len(entries))
+        store.flush()
+        thumbnail_cache.flush()
+        return missing, renamed
+
+    def close(self):
+        """关闭内存映射和文件"""
+        with self._lock:
+            if getattr(self, "_mmap", None) is not None:
+                self._mmap.close()
+            self._mmap = None
+        self._file.close()
@@ -6,10 +6,63 @@ TierMaker - 排行榜制作工具
 UI组件模块 - 包含各种UI组件和对话框
 """
 
+import threading
+from bisect import bisect_right
 import tkinter as tk
 from tkinter import ttk
-import os
-from PIL import Image, ImageTk
+
+from tiermaker.reconcile import diff_sequence
+from tiermaker.instrumentation import PERF
+
+
+def create_image_tile(parent, app, img_info, size):
+    """创建一个可拖动的图片控件
+
+    控件先显示占位图片，缩略图在后台解码完成后再替换；
+    控件在加载完成前被销毁时会取消对应的后台请求。
+
+    Args:
+        parent: 父控件
+        app: 主应用
+        img_info: 图片信息字典
+        size: 图片大小
+
+    Returns:
+        Frame: 图片框架（调用方负责布局）
+    """
+    registry = app.image_processor.registry
+    
+    # 创建图片框架
+    img_frame = ttk.Frame(parent)
+    
+    # 显示占位图片
+    lbl = tk.Label(img_frame, image=registry.placeholder(size))
+    lbl.pack()
+    
+    state = {"request": None, "photo": None}
+    
+    def on_loaded(photo):
+        state["request"] = None
+        state["photo"] = photo
+        if photo:
+            lbl.configure(image=photo)
+        else:
+            # 图片无法加载时显示原始文件名，保持位置不变
+            lbl.configure(image="", text=img_info.get("original_name", "?"),
+                          width=9, height=4, wraplength=size[0], bg="#dddddd")
+    
+    def on_destroy(event):
+        # 未完成的请求直接取消，已加载的图片释放注册表中的引用
+        if not registry.cancel(state["request"]) and state["photo"]:
+            registry.release(img_info, size)
+    
+    # 从共享注册表获取图片，同一张图片在各处只解码一次
+    state["request"] = registry.request(img_info, size, on_loaded)
+    lbl.bind("<Destroy>", on_destroy)
+    
+    # 设置拖放功能
+    lbl.bind("<ButtonPress-1>", lambda e: app.start_drag(e, img_frame, img_info))
+    return img_frame
 
 
 class TierFrame(ttk.Frame):
@@ -22,16 +75,23 @@ class TierFrame(ttk.Frame):
         self.tkdnd_available = tkdnd_available
         self.dnd_files = dnd_files
         
+        # 当前的图片大小（视图 > 图片大小）
+        self.tile_size = app.tile_size
+        # 当前显示的等级行，与 self.tiers 一一对应
+        self._rows = []
+        # 各行顶部在容器中的y坐标（拖放命中测试用，布局改变时清空）
+        self._row_tops = None
+        
         self.setup_tiers_area()
     
     def setup_tiers_area(self):
         """设置等级区域"""
         # 创建一个画布和滚动条
         self.tiers_canvas = tk.Canvas(self, bg="white")
-        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tiers_canvas.yview)
-        self.tiers_canvas.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tiers_canvas.yview)
+        self.tiers_canvas.configure(yscrollcommand=self.on_tiers_yview)
         
-        scrollbar.pack(side="right", fill="y")
+        self.scrollbar.pack(side="right", fill="y")
         self.tiers_canvas.pack(side="left", fill="both", expand=True)
         
         # 创建一个框架来容纳所有等级行
@@ -42,92 +102,239 @@ class TierFrame(ttk.Frame):
         self.tiers_container.bind("<Configure>", self.on_tiers_container_configure)
         self.tiers_canvas.bind("<Configure>", self.on_tiers_canvas_configure)
         
-        # 加载等级
-        self.refresh_tiers(self.tiers)
+        # 先只创建等级行，图片由应用在首帧显示之后分批加载
+        self.refresh_tiers(self.tiers, limit=0)
+    
+    def on_tiers_yview(self, first, last):
+        """画布视图变化时同步滚动条，滚动期间推迟缩略图细化"""
+        self.scrollbar.set(first, last)
+        self.app.defer_refinement()
     
     def on_tiers_container_configure(self, event):
         """当等级容器大小改变时调整画布滚动区域"""
         self.tiers_canvas.configure(scrollregion=self.tiers_canvas.bbox("all"))
+        self._row_tops = None
     
     def on_tiers_canvas_configure(self, event):
         """当画布大小改变时调整内部窗口大小"""
         self.tiers_canvas.itemconfig(self.tiers_canvas_window, width=event.width)
     
-    def refresh_tiers(self, tiers):
-        """刷新等级区域"""
+    def refresh_tiers(self, tiers, limit=None):
+        """刷新等级区域
+
+        与上一次显示的模型做比较，只创建、销毁或移动发生变化的等级行和图片，
+        未变化的行和图片控件保持不动。
+
+        Args:
+            tiers: 等级列表
+            limit: 每个等级最多显示的图片数（启动时分批加载用），None 表示全部
+        """
+        with PERF.measure("refresh.tiers"):
+            self._refresh_tiers(tiers, limit)
+    
+    def _refresh_tiers(self, tiers, limit):
+        """刷新等级区域的实现"""
         self.tiers = tiers
         
-        # 清除现有内容
-        for widget in self.tiers_container.winfo_children():
-            widget.destroy()
-        
-        # 为每个等级创建一行
-        for i, tier in enumerate(self.tiers):
-            tier_frame = ttk.Frame(self.tiers_container)
-            tier_frame.pack(fill="x", pady=1)  # 减小行间距
-            
-            # 等级标签（左侧彩色部分）
-            label_frame = tk.Frame(tier_frame, width=50, bg=tier["color"])  # 减小宽度
-            label_frame.pack(side="left", fill="y")
-            
-            label = tk.Label(label_frame, text=tier["name"], bg=tier["color"], font=("Arial", 12, "bold"))  # 减小字体
-            label.pack(expand=True, fill="both")
-            
-            # 图片区域（右侧）
-            images_frame = ttk.Frame(tier_frame, height=80)  # 减小高度
-            images_frame.pack(side="left", fill="both", expand=True)
-            
-            # 使用Canvas来实现水平滚动
-            canvas = tk.Canvas(images_frame, height=80, bg="#f0f0f0")  # 减小高度
-            scrollbar = ttk.Scrollbar(images_frame, orient="horizontal", command=canvas.xview)
-            canvas.configure(xscrollcommand=scrollbar.set)
+        # 协调等级行：按等级对象区分，新增的行创建，删除的行销毁
+        old_keys = [id(row["tier"]) for row in self._rows]
+        new_keys = [id(tier) for tier in self.tiers]
+        if old_keys != new_keys:
+            old_rows = {id(row["tier"]): row for row in self._rows}
+            rows = []
+            for tier in self.tiers:
+                row = old_rows.pop(id(tier), None)
+                if row is None:
+                    row = self.create_tier_row(tier)
+                rows.append(row)
+            for row in old_rows.values():
+                row["frame"].destroy()
             
-            scrollbar.pack(side="bottom", fill="x")
-            canvas.pack(side="top", fill="both", expand=True)
-            
-            # 创建一个框架来容纳图片
-            images_container = ttk.Frame(canvas)
-            canvas_window = canvas.create_window((0, 0), window=images_container, anchor="nw")
-            
-            # 加载该等级的图片
-            self.load_tier_images(images_container, tier)
-            
-            # 绑定事件以调整画布大小
-            images_container.bind("<Configure>", lambda e, c=canvas: c.configure(scrollregion=c.bbox("all")))
-            canvas.bind("<Configure>", lambda e, c=canvas, w=canvas_window: c.itemconfig(w, width=e.width))
-            
-            # 设置为可放置区域
-            if self.tkdnd_available:
-                canvas.drop_target_register(self.dnd_files)
-                canvas.dnd_bind("<<Drop>>", lambda e, t=i: self.on_drop_to_tier(e, t))
-    
-    def load_tier_images(self, container, tier):
-        """加载等级中的图片"""
-        for img_info in tier.get("images", []):
-            try:
-                img_path = os.path.join(self.images_dir, img_info["filename"])
-                if os.path.exists(img_path):
-                    # 加载并调整图片大小
-                    img = Image.open(img_path)
-                    img = img.resize((70, 70), Image.LANCZOS)  # 减小图片大小
-                    photo = ImageTk.PhotoImage(img)
-                    
-                    # 创建图片框架
-                    img_frame = ttk.Frame(container)
-                    img_frame.pack(side="left", padx=2, pady=2)
-                    
-                    # 显示图片
-                    lbl = tk.Label(img_frame, image=photo)
-                    lbl.image = photo  # 保持引用
-                    lbl.pack()
-                    
-                    # 设置拖放功能
-                    lbl.bind("<ButtonPress-1>", lambda e, f=img_frame, i=img_info: self.app.start_drag(e, f, i))
-            except Exception as e:
-                print(f"加载图片错误: {str(e)}")
+            # 等级被添加或重新排序时按新顺序重新排列
+            for row in rows:
+                row["frame"].pack_forget()
+            for row in rows:
+                row["frame"].pack(fill="x", pady=1)  # 减小行间距
+            self._rows = rows
+            self._row_tops = None
+        
+        # 协调每一行中的图片
+        for row in self._rows:
+            header = (row["tier"]["name"], row["tier"]["color"])
+            if row["header"] != header:
+                row["header"] = header
+                row["label_frame"].configure(bg=header[1])
+                row["label"].configure(text=header[0], bg=header[1])
+            self.load_tier_images(row, limit)
+    
+    def create_tier_row(self, tier):
+        """创建一个等级行
+
+        Returns:
+            dict: 行记录，包含行控件和当前显示的图片
+        """
+        tier_frame = ttk.Frame(self.tiers_container)
+        
+        # 等级标签（左侧彩色部分）
+        label_frame = tk.Frame(tier_frame, width=50, bg=tier["color"])  # 减小宽度
+        label_frame.pack(side="left", fill="y")
+        
+        label = tk.Label(label_frame, text=tier["name"], bg=tier["color"], font=("Arial", 12, "bold"))  # 减小字体
+        label.pack(expand=True, fill="both")
+        
+        # 图片区域（右侧），高度随图片大小变化
+        row_height = self.tile_size[1] + 10
+        images_frame = ttk.Frame(tier_frame, height=row_height)
+        images_frame.pack(side="left", fill="both", expand=True)
+        
+        # 使用Canvas来实现水平滚动
+        canvas = tk.Canvas(images_frame, height=row_height, bg="#f0f0f0")
+        scrollbar = ttk.Scrollbar(images_frame, orient="horizontal", command=canvas.xview)
+        canvas.configure(xscrollcommand=scrollbar.set)
+        
+        scrollbar.pack(side="bottom", fill="x")
+        canvas.pack(side="top", fill="both", expand=True)
+        
+        # 创建一个框架来容纳图片
+        images_container = ttk.Frame(canvas)
+        canvas_window = canvas.create_window((0, 0), window=images_container, anchor="nw")
+        
+        # 绑定事件以调整画布大小
+        images_container.bind("<Configure>", lambda e, c=canvas: c.configure(scrollregion=c.bbox("all")))
+        canvas.bind("<Configure>", lambda e, c=canvas, w=canvas_window: c.itemconfig(w, width=e.width))
+        
+        row = {
+            "tier": tier,
+            "header": (tier["name"], tier["color"]),
+            "frame": tier_frame,
+            "label_frame": label_frame,
+            "label": label,
+            "canvas": canvas,
+            "container": images_container,
+            "keys": [],
+            "tiles": {},
+            "centers": None,  # 图片中心的x坐标（拖放命中测试用，图片改变时清空）
+        }
+        if self.tkdnd_available:
+            self.register_drop_target(row)
+        return row
+    
+    def register_drop_target(self, row):
+        """把等级行设置为可放置区域（等级可能被重新排序，放置时再计算索引）"""
+        row["canvas"].drop_target_register(self.dnd_files)
+        row["canvas"].dnd_bind("<<Drop>>", lambda e, t=row["tier"]: self.on_drop_to_tier(e, self.tier_index(t)))
+    
+    def enable_drop_targets(self, dnd_files):
+        """拖放支持加载完成后，把已有和以后创建的等级行设置为可放置区域
+        
+        Args:
+            dnd_files: tkinterdnd2 的文件拖放类型
+        """
+        self.tkdnd_available = True
+        self.dnd_files = dnd_files
+        for row in self._rows:
+            self.register_drop_target(row)
+    
+    def set_tile_size(self, size):
+        """图片大小改变后重建等级行（图片由之后的刷新按新尺寸重新创建）
+        
+        Args:
+            size: 新的图片大小
+        """
+        self.tile_size = tuple(size)
+        for row in self._rows:
+            row["frame"].destroy()
+        self._rows = []
+        self._row_tops = None
+        self.refresh_tiers(self.tiers, limit=0)
+    
+    def tier_index(self, tier):
+        """获取等级对象在当前等级列表中的索引"""
+        for i, t in enumerate(self.tiers):
+            if t is tier:
+                return i
+        return 0
+    
+    def load_tier_images(self, row, limit=None):
+        """协调等级行中的图片，只处理新增、删除和移动的图片
+        
+        Args:
+            row: 行记录
+            limit: 最多显示的图片数，None 表示全部
+        """
+        images = row["tier"].get("images", [])
+        if limit is not None:
+            images = images[:limit]
+        new_keys = [img_info["id"] for img_info in images]
+        removals, insertions = diff_sequence(row["keys"], new_keys)
+        if not removals and not insertions:
+            return
+        
+        keys = row["keys"]
+        tiles = row["tiles"]
+        row["centers"] = None
+        
+        # 先移出删除的图片；同一行内移动的图片稍后复用原控件
+        detached = {}
+        for index in removals:
+            key = keys.pop(index)
+            tile = tiles.pop(key)
+            tile.pack_forget()
+            detached[key] = tile
+        
+        for index, key in insertions:
+            tile = detached.pop(key, None)
+            if tile is None:
+                with PERF.measure("widget"):
+                    tile = create_image_tile(row["container"], self.app, images[index], self.tile_size)
+            if index < len(keys):
+                tile.pack(side="left", padx=2, pady=2, before=tiles[keys[index]])
+            else:
+                tile.pack(side="left", padx=2, pady=2)
+            keys.insert(index, key)
+            tiles[key] = tile
+        
+        for tile in detached.values():
+            tile.destroy()
+    
+    def drop_target(self, x_root, y_root):
+        """计算屏幕坐标处的放置目标
+        
+        行边界和行内图片位置只在布局改变后测量一次，之后用二分查找定位，
+        不需要逐行查询控件位置。鼠标在两行之间或所有行之外时使用最近的行。
+        
+        Args:
+            x_root: 屏幕x坐标
+            y_root: 屏幕y坐标
+        
+        Returns:
+            tuple: (等级索引, 插入位置)，不在等级区域内时返回None
+        """
+        canvas = self.tiers_canvas
+        left, top = canvas.winfo_rootx(), canvas.winfo_rooty()
+        if not self._rows or not (left <= x_root < left + canvas.winfo_width() and
+                                  top <= y_root < top + canvas.winfo_height()):
+            return None
+        
+        if self._row_tops is None:
+            self._row_tops = [row["frame"].winfo_y() for row in self._rows]
+        y = canvas.canvasy(y_root - top)
+        tier_index = max(0, bisect_right(self._row_tops, y) - 1)
+        return tier_index, self.insertion_position(self._rows[tier_index], x_root)
+    
+    def insertion_position(self, row, x_root):
+        """计算在等级行中的插入位置（鼠标左侧的图片数）"""
+        if not row["keys"]:
+            return 0
+        if row["centers"] is None:
+            tiles = row["tiles"]
+            row["centers"] = [tiles[key].winfo_x() + tiles[key].winfo_width() / 2 for key in row["keys"]]
+        canvas = row["canvas"]
+        x = canvas.canvasx(x_root - canvas.winfo_rootx())
+        return bisect_right(row["centers"], x)
     
     def on_drop_to_tier(self, event, tier_index):
-        """处理拖放到等级的事件（支持外部文件拖放）"""
+        """处理拖放到等级的事件（支持外部文件、文件夹和压缩包拖放）"""
         try:
             # 获取拖放的文件路径
             if isinstance(event.data, str):
@@ -137,17 +344,8 @@ class TierFrame(ttk.Frame):
             else:
                 files = event.data
             
-            # 处理每个文件
-            for file_path in files:
-                # 检查是否为图片文件
-                if self.app.image_processor.is_valid_image(file_path):
-                    # 添加到应用并移动到指定等级
-                    img_info = self.app.image_processor.add_image_from_path(file_path)
-                    if img_info:
-                        self.app.move_image_to_tier(img_info, tier_index)
-            
-            # 刷新界面
-            self.refresh_tiers(self.app.tiers)
+            # 批量导入并一次性放入指定等级
+            self.app.import_paths(files, tier_index)
         except Exception as e:
             print(f"处理拖放文件错误: {str(e)}")
             import traceback
@@ -155,34 +353,53 @@ class TierFrame(ttk.Frame):
 
 
 class RepositoryFrame(ttk.LabelFrame):
-    """图片仓库框架"""
+    """图片仓库框架
+
+    仓库使用虚拟滚动：只为可见区域内的图片创建控件，控件放在一个固定的
+    复用池中，滚动或刷新时根据画布的滚动位置重新绑定图片。
+    顶部的搜索框按文件名和标签过滤仓库，输入时立即更新。
+    """
+    max_cols = 3  # 每行最多显示的图片数
+    cell_padding = 14  # 格子比图片多出的部分（边框 + 间距）
+    
     def __init__(self, parent, app, repository_images, images_dir, tkdnd_available, dnd_files):
         super().__init__(parent, text="图片仓库")
         self.app = app
         self.repository_images = repository_images
+        # 当前显示的图片（搜索时为匹配的子集）
+        self.shown_images = repository_images
         self.images_dir = images_dir
         self.tkdnd_available = tkdnd_available
         self.dnd_files = dnd_files
         
+        # 可复用的图片控件池
+        self._pool = []
+        # 格子大小随图片大小变化
+        self.tile_size = app.tile_size
+        self.cell_width = self.cell_height = self.tile_size[0] + self.cell_padding
+        
         self.setup_repository_area()
     
     def setup_repository_area(self):
         """设置图片仓库区域"""
-        # 创建一个画布和滚动条
-        self.repo_canvas = tk.Canvas(self)
-        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.repo_canvas.yview)
-        self.repo_canvas.configure(yscrollcommand=scrollbar.set)
+        # 搜索框：每次输入都重新过滤
+        search_frame = ttk.Frame(self)
+        search_frame.pack(side="top", fill="x", padx=5, pady=3)
         
-        scrollbar.pack(side="right", fill="y")
-        self.repo_canvas.pack(side="left", fill="both", expand=True)
-        
-        # 创建一个框架来容纳所有图片
-        self.repo_container = ttk.Frame(self.repo_canvas)
-        self.repo_canvas_window = self.repo_canvas.create_window((0, 0), window=self.repo_container, anchor="nw")
+        ttk.Label(search_frame, text="搜索:").pack(side="left")
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", self.on_search_changed)
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        search_entry.pack(side="left", fill="x", expand=True, padx=5)
+        search_entry.bind("<Escape>", lambda event: self.search_var.set(""))
+        ttk.Button(search_frame, text="清除", width=4,
+                   command=lambda: self.search_var.set("")).pack(side="right")
         
-        # 绑定事件以调整画布大小
-        self.repo_container.bind("<Configure>", self.on_repo_container_configure)
-        self.repo_canvas.bind("<Configure>", self.on_repo_canvas_configure)
+        # 创建一个画布和滚动条
+        self.repo_canvas = tk.Canvas(self)
+        self.repo_scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.repo_canvas.yview)
+        # 任何视图变化（滚动条、滚动位置调整）都会经过这里，从而更新可见图片
+        self.repo_canvas.configure(yscrollcommand=self.on_repo_yview)
         
         # 添加按钮 - 使用更紧凑的样式
         add_btn_frame = ttk.Frame(self)
@@ -193,65 +410,182 @@ class RepositoryFrame(ttk.LabelFrame):
                           relief=tk.RAISED, padx=10, pady=3)
         add_btn.pack(side="right", padx=5)
         
+        self.repo_scrollbar.pack(side="right", fill="y")
+        self.repo_canvas.pack(side="left", fill="both", expand=True)
+        
+        # 绑定事件以在画布大小改变时更新可见区域
+        self.repo_canvas.bind("<Configure>", self.on_repo_canvas_configure)
+        
         # 加载仓库图片
         self.refresh_repository(self.repository_images)
         
         # 设置为可放置区域，支持外部文件拖放
         if self.tkdnd_available:
-            self.repo_canvas.drop_target_register(self.dnd_files)
-            self.repo_canvas.dnd_bind('<<Drop>>', self.on_drop_to_repository)
+            self.enable_drop_targets(self.dnd_files)
+    
+    def enable_drop_targets(self, dnd_files):
+        """把仓库设置为可放置区域（拖放支持加载完成后调用）
+        
+        Args:
+            dnd_files: tkinterdnd2 的文件拖放类型
+        """
+        self.tkdnd_available = True
+        self.dnd_files = dnd_files
+        self.repo_canvas.drop_target_register(self.dnd_files)
+        self.repo_canvas.dnd_bind('<<Drop>>', self.on_drop_to_repository)
     
-    def on_repo_container_configure(self, event):
-        """当仓库容器大小改变时调整画布滚动区域"""
-        self.repo_canvas.configure(scrollregion=self.repo_canvas.bbox("all"))
+    def set_tile_size(self, size):
+        """图片大小改变后清空控件池并调整格子大小（图片由之后的刷新按新尺寸重新绑定）
+        
+        Args:
+            size: 新的图片大小
+        """
+        for tile in self._pool:
+            self.unbind_tile(tile)
+            self.repo_canvas.delete(tile["window"])
+            tile["frame"].destroy()
+        self._pool = []
+        self.tile_size = tuple(size)
+        self.cell_width = self.cell_height = self.tile_size[0] + self.cell_padding
+    
+    def on_repo_yview(self, first, last):
+        """画布视图变化时同步滚动条并更新可见图片，滚动期间推迟缩略图细化"""
+        self.repo_scrollbar.set(first, last)
+        self.app.defer_refinement()
+        self.update_visible_tiles()
     
     def on_repo_canvas_configure(self, event):
-        """当画布大小改变时调整内部窗口大小"""
-        self.repo_canvas.itemconfig(self.repo_canvas_window, width=event.width)
+        """当画布大小改变时更新可见区域"""
+        self.update_visible_tiles()
+    
+    def on_search_changed(self, *args):
+        """搜索内容改变时过滤仓库并回到顶部"""
+        self.repo_canvas.yview_moveto(0)
+        self.refresh_repository(self.repository_images)
     
     def refresh_repository(self, repository_images):
-        """刷新图片仓库"""
+        """刷新图片仓库
+
+        只更新滚动区域并重新绑定可见范围内的图片，耗时与图片总数无关。
+        有搜索内容时只显示搜索索引匹配的图片。
+        """
         self.repository_images = repository_images
+        query = self.search_var.get().strip()
+        if query:
+            self.shown_images = self.app.search_index.filter(repository_images, query)
+            self.configure(text=f"图片仓库 ({len(self.shown_images)}/{len(repository_images)})")
+        else:
+            self.shown_images = repository_images
+            self.configure(text="图片仓库")
+        
+        with PERF.measure("refresh.repository"):
+            total_rows = (len(self.shown_images) + self.max_cols - 1) // self.max_cols
+            self.repo_canvas.configure(scrollregion=(0, 0, self.max_cols * self.cell_width,
+                                                     total_rows * self.cell_height))
+            self.update_visible_tiles()
+    
+    def visible_range(self):
+        """根据画布的滚动位置计算可见图片的索引范围
+
+        Returns:
+            tuple: (第一个可见索引, 最后一个可见索引 + 1)
+        """
+        top = max(0.0, self.repo_canvas.canvasy(0))
+        height = max(self.repo_canvas.winfo_height(), self.cell_height)
+        first_row = int(top // self.cell_height)
+        last_row = int((top + height) // self.cell_height)
+        first = first_row * self.max_cols
+        last = min(len(self.shown_images), (last_row + 1) * self.max_cols)
+        return first, max(first, last)
+    
+    def update_visible_tiles(self):
+        """把控件池中的控件分配给可见范围内的图片"""
+        images = self.shown_images
+        first, last = self.visible_range()
+        
+        # 仍然可见的图片保留原控件（只调整位置），其余控件回收
+        bound = {tile["img_info"]["id"]: tile for tile in self._pool if tile["img_info"] is not None}
+        pending = []
+        for index in range(first, last):
+            tile = bound.pop(images[index]["id"], None)
+            if tile is None:
+                pending.append(index)
+            else:
+                if tile["img_info"] is not images[index]:
+                    # 图片信息被替换（例如存储路径改变），按新的信息重新请求缩略图
+                    self.bind_tile(tile, images[index])
+                self.place_tile(tile, index)
+        
+        free = [tile for tile in self._pool if tile["img_info"] is None]
+        free.extend(bound.values())
+        for index in pending:
+            tile = free.pop() if free else self.create_pool_tile()
+            self.bind_tile(tile, images[index])
+            self.place_tile(tile, index)
+        
+        for tile in free:
+            self.unbind_tile(tile)
+    
+    def create_pool_tile(self):
+        """创建一个可复用的图片控件"""
+        with PERF.measure("widget"):
+            frame = ttk.Frame(self.repo_canvas)
+            lbl = tk.Label(frame, wraplength=self.tile_size[0])
+            lbl.pack()
+        tile = {"frame": frame, "label": lbl, "bg": lbl.cget("bg"),
+                "img_info": None, "photo": None, "request": None,
+                "window": self.repo_canvas.create_window(0, 0, window=frame, anchor="nw", state="hidden")}
+        
+        # 设置拖放功能（拖动的是控件当前绑定的图片）
+        lbl.bind("<ButtonPress-1>", lambda e: tile["img_info"] is not None and
+                 self.app.start_drag(e, frame, tile["img_info"]))
+        self._pool.append(tile)
+        return tile
+    
+    def bind_tile(self, tile, img_info):
+        """把图片绑定到控件上，先显示占位图片，后台加载完成后替换"""
+        registry = self.app.image_processor.registry
+        self.unbind_tile(tile)
         
-        # 清除现有内容
-        for widget in self.repo_container.winfo_children():
-            widget.destroy()
-        
-        # 创建网格布局
-        row, col = 0, 0
-        max_cols = 3  # 每行最多显示的图片数
-        
-        for img_info in self.repository_images:
-            try:
-                img_path = os.path.join(self.images_dir, img_info["filename"])
-                if os.path.exists(img_path):
-                    # 加载并调整图片大小
-                    img = Image.open(img_path)
-                    img = img.resize((70, 70), Image.LANCZOS)  # 减小图片大小
-                    photo = ImageTk.PhotoImage(img)
-                    
-                    # 创建图片框架
-                    img_frame = ttk.Frame(self.repo_container)
-                    img_frame.grid(row=row, column=col, padx=5, pady=5)
-                    
-                    # 显示图片
-                    lbl = tk.Label(img_frame, image=photo)
-                    lbl.image = photo  # 保持引用
-                    lbl.pack()
-                    
-                    # 设置拖放功能
-                    lbl.bind("<ButtonPress-1>", lambda e, f=img_frame, i=img_info: self.app.start_drag(e, f, i))
-                    
-                    # 更新行列位置
-                    col += 1
-                    if col >= max_cols:
-                        col = 0
-                        row += 1
-            except Exception as e:
-                print(f"加载仓库图片错误: {str(e)}")
+        tile["img_info"] = img_info
+        tile["label"].configure(image=registry.placeholder(self.tile_size), text="",
+                                width=0, height=0, bg=tile["bg"])
+        tile["request"] = registry.request(img_info, self.tile_size,
+                                           lambda photo: self.on_tile_loaded(tile, photo))
+    
+    def on_tile_loaded(self, tile, photo):
+        """控件的图片加载完成"""
+        tile["request"] = None
+        tile["photo"] = photo
+        if photo:
+            tile["label"].configure(image=photo)
+        else:
+            # 图片无法加载时显示原始文件名
+            tile["label"].configure(image="", text=tile["img_info"].get("original_name", "?"),
+                                    width=9, height=4, bg="#dddddd")
+    
+    def unbind_tile(self, tile):
+        """解除控件绑定的图片并隐藏控件，取消尚未完成的加载"""
+        if tile["img_info"] is None:
+            return
+        registry = self.app.image_processor.registry
+        tile["label"].configure(image="")
+        if not registry.cancel(tile["request"]) and tile["photo"]:
+            registry.release(tile["img_info"], self.tile_size)
+        tile["img_info"] = None
+        tile["photo"] = None
+        tile["request"] = None
+        self.repo_canvas.itemconfigure(tile["window"], state="hidden")
+    
+    def place_tile(self, tile, index):
+        """把控件移动到指定索引对应的格子"""
+        x = (index % self.max_cols) * self.cell_width + 5
+        y = (index // self.max_cols) * self.cell_height + 5
+        self.repo_canvas.coords(tile["window"], x, y)
+        self.repo_canvas.itemconfigure(tile["window"], state="normal")
     
     def on_drop_to_repository(self, event):
-        """处理拖放到仓库的事件（支持外部文件拖放）"""
+        """处理拖放到仓库的事件（支持外部文件、文件夹和压缩包拖放）"""
         try:
             # 获取拖放的文件路径
             if isinstance(event.data, str):
@@ -261,19 +595,253 @@ class RepositoryFrame(ttk.LabelFrame):
             else:
                 files = event.data
             
-            # 处理每个文件
-            for file_path in files:
-                # 检查是否为图片文件
-                if self.app.image_processor.is_valid_image(file_path):
-                    # 添加到仓库
-                    img_info = self.app.image_processor.add_image_from_path(file_path)
-                    if img_info and img_info not in self.app.repository_images:
-                        self.app.repository_images.append(img_info)
-            
-            # 刷新仓库显示
-            self.refresh_repository(self.app.repository_images)
-            
-            # 保存配置
-            self.app.save_config()
+            # 批量导入到仓库
+            self.app.import_paths(files)
         except Exception as e:
-            print(f"处理拖放文件错误: {str(e)}")
\ No newline at end of file
+            print(f"处理拖放文件错误: {str(e)}")
+
+
+class ImportProgressDialog(tk.Toplevel):
+    """批量导入进度对话框"""
+    def __init__(self, parent, importer, paths):
+        super().__init__(parent)
+        self.title("导入图片")
+        self.geometry("420x130")
+        self.resizable(False, False)
+        self.transient(parent)  # 设置为父窗口的临时窗口
+        self.grab_set()  # 模态对话框
+        
+        self.importer = importer
+        self.result = None  # 导入结果，完成后设置
+        self._result = None
+        
+        self.create_widgets()
+        
+        # 在后台线程中执行导入，界面只定时读取进度
+        self._thread = threading.Thread(target=self.run_import, args=(paths,), daemon=True)
+        self._thread.start()
+        self.after(100, self.poll_progress)
+    
+    def create_widgets(self):
+        """创建对话框控件"""
+        self.status_var = tk.StringVar(value="正在扫描文件...")
+        ttk.Label(self, textvariable=self.status_var).pack(fill="x", padx=15, pady=(15, 5))
+        
+        self.progress = ttk.Progressbar(self, mode="determinate", maximum=1)
+        self.progress.pack(fill="x", padx=15, pady=5)
+        
+        tk.Button(self, text="取消", command=self.on_cancel,
+                 bg="#f44336", fg="white", font=("Arial", 10),
+                 relief=tk.RAISED, padx=10, pady=3).pack(side="right", padx=15, pady=5)
+        
+        self.protocol("WM_DELETE_WINDOW", self.on_cancel)
+    
+    def run_import(self, paths):
+        """执行导入（后台线程）"""
+        self._result = self.importer.run(paths)
+    
+    def poll_progress(self):
+        """更新进度，导入完成后关闭对话框"""
+        total, done = self.importer.total, self.importer.done
+        if total:
+            self.progress.configure(maximum=total, value=done)
+            if not self.importer.cancel_event.is_set():
+                self.status_var.set(f"正在导入 {done}/{total}")
+        
+        if self._thread.is_alive():
+            self.after(100, self.poll_progress)
+        else:
+            self.result = self._result
+            self.destroy()
+    
+    def on_cancel(self):
+        """取消按钮事件"""
+        self.importer.cancel()
+        self.status_var.set("正在取消...")
+
+
+class TierListsDialog(tk.Toplevel):
+    """排行榜列表对话框（SQLite模式），可以打开、重命名和删除排行榜"""
+    def __init__(self, parent, config_manager):
+        super().__init__(parent)
+        self.title("打开排行榜")
+        self.geometry("360x320")
+        self.transient(parent)  # 设置为父窗口的临时窗口
+        self.grab_set()  # 模态对话框
+        
+        self.config_manager = config_manager
+        self.selected = None  # 要打开的排行榜ID
+        self.renamed = False
+        self.deleted_images = []  # 被删除排行榜中的图片，由调用方释放
+        self._list_ids = []
+        
+        self.create_widgets()
+        self.refresh_list()
+    
+    def create_widgets(self):
+        """创建对话框控件"""
+        list_frame = tk.Frame(self)
+        list_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        self.listbox = tk.Listbox(list_frame, font=("Arial", 11), activestyle="none")
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.listbox.yview)
+        self.listbox.configure(yscrollcommand=scrollbar.set)
+        self.listbox.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.listbox.bind("<Double-Button-1>", lambda e: self.on_open())
+        
+        button_frame = tk.Frame(self)
+        button_frame.pack(fill="x", padx=10, pady=(0, 10))
+        
+        tk.Button(button_frame, text="打开", command=self.on_open,
+                 bg="#4CAF50", fg="white", font=("Arial", 10),
+                 relief=tk.RAISED, padx=10, pady=3).pack(side="left", padx=(0, 5))
+        tk.Button(button_frame, text="重命名", command=self.on_rename,
+                 font=("Arial", 10), relief=tk.RAISED, padx=10, pady=3).pack(side="left", padx=5)
+        tk.Button(button_frame, text="删除", command=self.on_delete,
+                 bg="#f44336", fg="white", font=("Arial", 10),
+                 relief=tk.RAISED, padx=10, pady=3).pack(side="left", padx=5)
+        tk.Button(button_frame, text="关闭", command=self.destroy,
+                 font=("Arial", 10), relief=tk.RAISED, padx=10, pady=3).pack(side="right")
+    
+    def refresh_list(self):
+        """刷新排行榜列表"""
+        self.listbox.delete(0, tk.END)
+        self._list_ids = []
+        for list_id, name, count in self.config_manager.list_tierlists():
+            current = "（当前）" if list_id == self.config_manager.current_list else ""
+            self.listbox.insert(tk.END, f"{name}{current}  -  {count} 张图片")
+            self._list_ids.append(list_id)
+    
+    def selected_list(self):
+        """获取选中的排行榜ID，没有选中时返回None"""
+        selection = self.listbox.curselection()
+        if not selection:
+            return None
+        return self._list_ids[selection[0]]
+    
+    def on_open(self):
+        """打开选中的排行榜"""
+        list_id = self.selected_list()
+        if list_id is not None:
+            self.selected = list_id
+            self.destroy()
+    
+    def on_rename(self):
+        """重命名选中的排行榜"""
+        from tkinter import simpledialog
+        list_id = self.selected_list()
+        if list_id is None:
+            return
+        name = simpledialog.askstring("重命名排行榜", "新名称:", parent=self)
+        if name:
+            self.config_manager.rename_tierlist(list_id, name)
+            self.renamed = True
+            self.refresh_list()
+    
+    def on_delete(self):
+        """删除选中的排行榜"""
+        from tkinter import messagebox
+        list_id = self.selected_list()
+        if list_id is None:
+            return
+        if list_id == self.config_manager.current_list:
+            messagebox.showwarning("无法删除", "不能删除当前打开的排行榜。", parent=self)
+            return
+        if messagebox.askyesno("确认删除", "确定要删除这个排行榜吗？其中的图片也会被删除。", parent=self):
+            self.deleted_images.extend(self.config_manager.delete_tierlist(list_id))
+            self.refresh_list()
+
+
+class PerformanceDialog(tk.Toplevel):
+    """性能面板（启用性能记录时在帮助菜单中显示），每秒自动刷新"""
+    columns = (("count", "次数"), ("total_ms", "总计ms"), ("mean_ms", "平均"), ("p50_ms", "p50"),
+               ("p90_ms", "p90"), ("p99_ms", "p99"), ("max_ms", "最大"))
+    
+    def __init__(self, parent, perf, registry=None):
+        super().__init__(parent)
+        self.title("性能")
+        self.geometry("720x480")
+        self.transient(parent)  # 设置为父窗口的临时窗口
+        
+        self.perf = perf
+        self.registry = registry  # 共享图片注册表（显示图片内存占用）
+        
+        self.create_widgets()
+        self.refresh()
+    
+    def create_widgets(self):
+        """创建对话框控件"""
+        table_frame = tk.Frame(self)
+        table_frame.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        
+        self.table = ttk.Treeview(table_frame, columns=[key for key, _ in self.columns], height=10)
+        self.table.heading("#0", text="操作")
+        self.table.column("#0", width=150)
+        for key, title in self.columns:
+            self.table.heading(key, text=title)
+            self.table.column(key, width=70, anchor="e")
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.table.yview)
+        self.table.configure(yscrollcommand=scrollbar.set)
+        self.table.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        self.memory_var = tk.StringVar()
+        ttk.Label(self, textvariable=self.memory_var).pack(fill="x", padx=10)
+        
+        # 最近的 cProfile / tracemalloc 采集结果
+        self.captures_text = tk.Text(self, height=10, font=("Courier", 9), wrap="none")
+        self.captures_text.pack(fill="both", expand=True, padx=10, pady=5)
+        
+        button_frame = tk.Frame(self)
+        button_frame.pack(fill="x", padx=10, pady=(0, 10))
+        tk.Button(button_frame, text="重置", command=self.on_reset,
+                 font=("Arial", 10), relief=tk.RAISED, padx=10, pady=3).pack(side="left", padx=(0, 5))
+        tk.Button(button_frame, text="保存报告...", command=self.on_save,
+                 font=("Arial", 10), relief=tk.RAISED, padx=10, pady=3).pack(side="left", padx=5)
+        tk.Button(button_frame, text="关闭", command=self.destroy,
+                 font=("Arial", 10), relief=tk.RAISED, padx=10, pady=3).pack(side="right")
+    
+    def refresh(self):
+        """刷新统计表、内存占用和采集结果"""
+        self.table.delete(*self.table.get_children())
+        for op, stats in self.perf.summary().items():
+            self.table.insert("", "end", text=op, values=[stats[key] for key, _ in self.columns])
+        
+        parts = []
+        if self.registry is not None:
+            stats = self.registry.stats()
+            parts.append(f"图片缓存 {stats['bytes'] / 1048576:.1f}/{stats['budget'] / 1048576:.0f} MB, "
+                         f"{stats['entries']} 项, 命中 {stats['hits']}, 未命中 {stats['misses']}, "
+                         f"预览 {stats['previews']}, 待细化 {stats['refining']}")
+        memory = self.perf.memory()
+        if memory:
+            parts.append(f"tracemalloc 当前 {memory['current'] / 1048576:.1f} MB, 峰值 {memory['peak'] / 1048576:.1f} MB")
+        self.memory_var.set("；".join(parts))
+        
+        text = ("\n\n".join(f"== {op} ({elapsed:.1f} ms) ==\n{capture}" for op, elapsed, capture in self.perf.captures)
+                or "没有采集结果（设置 TIERMAKER_PERF_PROFILE 或 --perf-profile 指定操作）")
+        if self.captures_text.get("1.0", "end-1c") != text:
+            self.captures_text.delete("1.0", tk.END)
+            self.captures_text.insert("1.0", text)
+        
+        self._refresh_id = self.after(1000, self.refresh)
+    
+    def destroy(self):
+        """关闭对话框并停止自动刷新"""
+        if getattr(self, "_refresh_id", None) is not None:
+            self.after_cancel(self._refresh_id)
+            self._refresh_id = None
+        super().destroy()
+    
+    def on_reset(self):
+        """清空统计"""
+        self.perf.reset()
+    
+    def on_save(self):
+        """保存文本报告"""
+        from tkinter import filedialog
+        filename = filedialog.asksaveasfilename(title="保存性能报告", defaultextension=".txt",
+                                                filetypes=[("文本文件", "*.txt"), ("JSON", "*.json")], parent=self)
+        if filename:
+            self.perf.dump(filename)